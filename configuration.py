@@ -38,3 +38,21 @@ LOGGING = config['logging']
 DEFAULT_PORT = config['micropsi2']['port']
 
 DEFAULT_HOST = config['micropsi2']['host']
+
+# the WSGI server: "threaded" for a pool of worker threads, or "wsgiref" for bottle's single-threaded server
+DEFAULT_SERVER = config['micropsi2'].get('server', 'threaded')
+
+SERVER_WORKERS = int(config['micropsi2'].get('workers', 10))
+
+SERVER_SOCKET_TIMEOUT = float(config['micropsi2'].get('socket_timeout', 60))
+
+# the time between two autosaves of a nodenet in seconds (0 disables autosaving), and the number of autosaves kept;
+# these are the defaults until they are changed with set_autosave
+AUTOSAVE_INTERVAL = float(config['micropsi2'].get('autosave_interval', 0))
+
+AUTOSAVE_RETENTION = int(config['micropsi2'].get('autosave_retention', 5))
+
+# the response cache of the read-only RPCs: the maximum number of responses, and their maximum total size in megabytes
+RPC_CACHE_ENTRIES = int(config['micropsi2'].get('rpc_cache_entries', 512))
+
+RPC_CACHE_SIZE = int(float(config['micropsi2'].get('rpc_cache_size', 32)) * 1024 * 1024)
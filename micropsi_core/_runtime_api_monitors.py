@@ -7,27 +7,78 @@ Runtime API functionality for creating and maintaining activation monitors
 __author__ = 'dominik'
 __date__ = '11.12.12'
 
-from micropsi_core.nodenet.monitor import Monitor
+from micropsi_core.nodenet.monitor import Monitor, AggregateMonitor
 
 import micropsi_core
 
 
-def add_gate_monitor(nodenet_uid, node_uid, gate):
+def add_gate_monitor(nodenet_uid, node_uid, gate, retention=None, downsampling=None):
     """Adds a continuous monitor to the activation of a gate. The monitor will collect the activation
-    value in every simulation step."""
+    value in every simulation step.
+
+    Arguments:
+        retention (optional): the number of steps for which the exact activations are kept
+        downsampling (optional): a list of (interval, capacity) pairs: for older steps, the minimum, maximum and
+            mean activation of up to capacity intervals of the given number of steps are kept
+    """
     nodenet = micropsi_core.runtime.nodenets[nodenet_uid]
-    monitor = Monitor(nodenet, node_uid, 'gate', gate, node_name=nodenet.nodes[node_uid].name)
+    monitor = Monitor(nodenet, node_uid, 'gate', gate, node_name=nodenet.nodes[node_uid].name,
+                      retention=retention, downsampling=downsampling)
     nodenet.monitors[monitor.uid] = monitor
-    return monitor.data
+    return monitor.get_info()
 
 
-def add_slot_monitor(nodenet_uid, node_uid, slot):
+def add_slot_monitor(nodenet_uid, node_uid, slot, retention=None, downsampling=None):
     """Adds a continuous monitor to the activation of a slot. The monitor will collect the activation
-    value in every simulation step."""
+    value in every simulation step. See add_gate_monitor for the arguments."""
     nodenet = micropsi_core.runtime.nodenets[nodenet_uid]
-    monitor = Monitor(nodenet, node_uid, nodenet.nodes[node_uid].name, 'slot', slot, node_name=nodenet.nodes[node_uid].name)
+    monitor = Monitor(nodenet, node_uid, 'slot', slot, node_name=nodenet.nodes[node_uid].name,
+                      retention=retention, downsampling=downsampling)
     nodenet.monitors[monitor.uid] = monitor
-    return monitor.data
+    return monitor.get_info()
+
+
+def add_nodespace_monitor(nodenet_uid, nodespace_uid, gate='gen', threshold=0.0, retention=None,
+                          activation_retention=None):
+    """Adds a monitor to the activations of the given gate type of all nodes in the given nodespace. In every
+    simulation step, it records the activations of all these gates together with their mean, their maximum and the
+    number of activations above the threshold.
+
+    Arguments:
+        retention (optional): the number of steps for which the mean, maximum and count are kept
+        activation_retention (optional): the number of steps for which the activations of all gates are kept
+    """
+    nodenet = micropsi_core.runtime.nodenets[nodenet_uid]
+    if nodespace_uid not in nodenet.nodespaces:
+        raise KeyError("Nodespace %s not found" % nodespace_uid)
+    monitor = AggregateMonitor(nodenet, gate, nodespace=nodespace_uid, threshold=threshold, retention=retention,
+                               activation_retention=activation_retention)
+    nodenet.monitors[monitor.uid] = monitor
+    return monitor.get_info()
+
+
+def add_nodetype_monitor(nodenet_uid, nodetype, gate='gen', nodespace_uid=None, threshold=0.0, retention=None,
+                         activation_retention=None):
+    """Adds a monitor to the activations of the given gate type of all nodes of the given node type, optionally
+    only in the given nodespace. See add_nodespace_monitor for the arguments."""
+    nodenet = micropsi_core.runtime.nodenets[nodenet_uid]
+    if nodenet.get_nodetype(nodetype) is None:
+        raise KeyError("Node type %s not found" % nodetype)
+    monitor = AggregateMonitor(nodenet, gate, nodespace=nodespace_uid, nodetype=nodetype, threshold=threshold,
+                               retention=retention, activation_retention=activation_retention)
+    nodenet.monitors[monitor.uid] = monitor
+    return monitor.get_info()
+
+
+def get_monitor_activations(nodenet_uid, monitor_uid, from_step=None, to_step=None):
+    """Returns the uids of the nodes watched by the given nodespace or node type monitor, and the steps and rows of
+    gate activations it has recorded between from_step and to_step."""
+    nodenet = micropsi_core.runtime.nodenets[nodenet_uid]
+    monitor = nodenet.monitors[monitor_uid]
+    if not isinstance(monitor, AggregateMonitor):
+        raise ValueError("Monitor %s does not watch a nodespace or node type" % monitor_uid)
+    with nodenet.netlock:
+        return monitor.get_activations(from_step, to_step)
 
 
 def remove_monitor(nodenet_uid, monitor_uid):
@@ -39,33 +90,51 @@ def remove_monitor(nodenet_uid, monitor_uid):
 
 def clear_monitor(nodenet_uid, monitor_uid):
     """Leaves the monitor intact, but deletes the current list of stored values."""
-    micropsi_core.runtime.nodenets[nodenet_uid].monitors(monitor_uid).clear()
+    nodenet = micropsi_core.runtime.nodenets[nodenet_uid]
+    with nodenet.netlock:
+        nodenet.monitors[monitor_uid].clear()
     return True
 
 
 def export_monitor_data(nodenet_uid, monitor_uid=None):
     """Returns a string with all currently stored monitor data for the given nodenet."""
-    if monitor_uid is not None:
-        return micropsi_core.runtime.nodenets[nodenet_uid].state['monitors'][monitor_uid]
-    else:
-        return micropsi_core.runtime.nodenets[nodenet_uid].state.get('monitors', {})
+    nodenet = micropsi_core.runtime.nodenets[nodenet_uid]
+    with nodenet.netlock:
+        if monitor_uid is not None:
+            nodenet.monitors[monitor_uid].update_data()
+            return nodenet.state['monitors'][monitor_uid]
+        else:
+            for monitor in nodenet.monitors.values():
+                monitor.update_data()
+            return nodenet.state.get('monitors', {})
 
 
-def get_monitor_data(nodenet_uid, step=0):
+def get_monitor_data(nodenet_uid, step=0, from_step=None, to_step=None, resolution=None, since_step=None):
     """Returns monitor and nodenet data for drawing monitor plots for the current step,
-    if the current step is newer than the supplied simulation step."""
+    if the current step is newer than the supplied simulation step.
+
+    Only the activations between from_step and to_step are returned. If more than resolution values would be
+    returned, or the exact values are no longer kept for from_step, downsampled values are returned instead,
+    together with the minimum and maximum of every interval (see Monitor.get_values).
+
+    since_step can be a dict of monitor uids and the cursors returned by an earlier call. For these monitors, only
+    the activations recorded after the cursor step are returned, so the client can poll without receiving the same
+    values again. Every monitor in the result contains the new "cursor"."""
+    nodenet = micropsi_core.runtime.nodenets[nodenet_uid]
     data = {
-        'nodenet_running': micropsi_core.runtime.nodenets[nodenet_uid].is_active,
-        'current_step': micropsi_core.runtime.nodenets[nodenet_uid].current_step
+        'nodenet_running': nodenet.is_active,
+        'current_step': nodenet.current_step
     }
     if step > data['current_step']:
         return data
     else:
-        data['monitors'] = micropsi_core.runtime.export_monitor_data(nodenet_uid)
+        since_step = since_step or {}
+        data['monitors'] = {}
+        with nodenet.netlock:
+            for uid, monitor in nodenet.monitors.items():
+                data['monitors'][uid] = monitor.get_info()
+                if since_step.get(uid) is not None:
+                    data['monitors'][uid].update(monitor.get_values_since(since_step[uid]))
+                else:
+                    data['monitors'][uid].update(monitor.get_values(from_step, to_step, resolution))
         return data
-
-
-
-
-
-
@@ -0,0 +1,11 @@
+"""
+Benchmarks for the nodenet core loop
+
+Builds synthetic nodenets of configurable size and topology through the NetAPI, times the expensive runtime
+operations on them, and writes the results as JSON, so they can be compared between releases:
+
+    python -m micropsi_core.benchmarks --sizes 1000 10000 --output benchmark.json
+"""
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
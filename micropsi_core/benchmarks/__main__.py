@@ -0,0 +1,3 @@
+from micropsi_core.benchmarks.benchmark import main
+
+main()
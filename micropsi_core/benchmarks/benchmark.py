@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+"""
+Times the core nodenet operations on synthetic nodenets and reports the results as JSON.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def statistics(durations):
+    """Returns statistics about the given durations in seconds"""
+    return {
+        "runs": len(durations),
+        "total": sum(durations),
+        "mean": sum(durations) / len(durations),
+        "min": min(durations),
+        "max": max(durations)
+    }
+
+
+def timed(function, runs=1):
+    """Calls the function the given number of times and returns statistics about the durations"""
+    durations = []
+    for i in range(runs):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return statistics(durations)
+
+
+def time_initialize_nodenet(runtime, nodenet_uid):
+    """Loads a second instance of the stored nodenet and returns the time spent in initialize_nodenet"""
+    from micropsi_core.nodenet.nodenet import Nodenet
+
+    class TimedNodenet(Nodenet):
+        def initialize_nodenet(self):
+            start = time.perf_counter()
+            Nodenet.initialize_nodenet(self)
+            self.initialize_time = time.perf_counter() - start
+
+    nodenet = runtime.get_nodenet(nodenet_uid)
+    copy = TimedNodenet(nodenet.filename, name=nodenet.name, nodetypes=runtime.nodetypes,
+                        native_modules=runtime.native_modules)
+    return statistics([copy.initialize_time])
+
+
+def run_benchmark(runtime, topology, size, steps=10, deletions=10, engine="objects"):
+    """Builds a nodenet with the given topology and size, and times the core operations on it"""
+    from micropsi_core.benchmarks.topologies import TOPOLOGIES
+
+    success, uid = runtime.new_nodenet("Benchmark %s %d" % (topology, size), "Default", owner="Benchmark")
+    nodenet = runtime.get_nodenet(uid)
+    nodenet.engine = engine
+    timings = {}
+    try:
+        timings['build'] = timed(lambda: TOPOLOGIES[topology](nodenet.netapi, size))
+        timings['step'] = timed(nodenet.step, steps)
+        timings['get_nodenet_area'] = timed(lambda: runtime.get_nodenet_area(uid))
+        timings['get_nodenet_area_region'] = timed(lambda: runtime.get_nodenet_area(uid, x1=0, x2=1000, y1=0, y2=1000))
+        timings['save_nodenet'] = timed(lambda: runtime.save_nodenet(uid))
+        runtime.unload_nodenet(uid)
+        timings['load_nodenet'] = timed(lambda: runtime.load_nodenet(uid))
+        timings['initialize_nodenet'] = time_initialize_nodenet(runtime, uid)
+
+        nodenet = runtime.get_nodenet(uid)
+        node_count = len(nodenet.nodes)
+        link_count = len(nodenet.links)
+        if deletions:
+            node_uids = list(nodenet.nodes.keys())
+            doomed = node_uids[::max(1, node_count // deletions)][:deletions]
+            timings['delete_node'] = timed(lambda: runtime.delete_node(uid, doomed.pop()), len(doomed))
+    finally:
+        runtime.delete_nodenet(uid)
+
+    return {
+        "topology": topology,
+        "size": size,
+        "engine": engine,
+        "nodes": node_count,
+        "links": link_count,
+        "timings": timings
+    }
+
+
+def run_benchmarks(runtime, topologies, sizes, steps=10, deletions=10, engine="objects", memory=False):
+    """Runs the benchmark for all combinations of topologies and sizes, optionally measuring their memory, too"""
+    import configuration
+    from micropsi_core.benchmarks.memory import run_memory_benchmark
+    results = []
+    memory_results = []
+    for size in sizes:
+        for topology in topologies:
+            results.append(run_benchmark(runtime, topology, size, steps=steps, deletions=deletions, engine=engine))
+            if memory:
+                memory_results.append(run_memory_benchmark(runtime, topology, size))
+    data = {
+        "version": configuration.VERSION,
+        "python": platform.python_version(),
+        "date": datetime.now().isoformat(),
+        "results": results
+    }
+    if memory:
+        data['memory'] = memory_results
+    return data
+
+
+def main(argv=None):
+    from micropsi_core.benchmarks.topologies import TOPOLOGIES
+    from micropsi_core.nodenet.nodenet import ENGINES
+
+    parser = argparse.ArgumentParser(description="Benchmark the nodenet core loop")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="node counts of the nodenets")
+    parser.add_argument("--topologies", nargs="+", default=sorted(TOPOLOGIES.keys()), choices=sorted(TOPOLOGIES.keys()))
+    parser.add_argument("--steps", type=int, default=10, help="number of steps to time")
+    parser.add_argument("--deletions", type=int, default=10, help="number of nodes to delete")
+    parser.add_argument("--engine", default="objects", choices=ENGINES)
+    parser.add_argument("--memory", action="store_true", help="also measure the memory used by the nodenets")
+    parser.add_argument("--resource-path", help="directory for the benchmark nodenets (default: a temporary one)")
+    parser.add_argument("--output", help="file to write the JSON results to (default: stdout)")
+    args = parser.parse_args(argv)
+
+    # keep the benchmark nodenets away from the user's data
+    import configuration
+    configuration.RESOURCE_PATH = args.resource_path or tempfile.mkdtemp(prefix="micropsi_benchmark")
+    for directory in ["nodenets", "worlds"]:
+        if not os.path.isdir(os.path.join(configuration.RESOURCE_PATH, directory)):
+            os.makedirs(os.path.join(configuration.RESOURCE_PATH, directory))
+    from micropsi_core import runtime
+
+    results = run_benchmarks(runtime, args.topologies, args.sizes, steps=args.steps, deletions=args.deletions,
+                             engine=args.engine, memory=args.memory)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=4, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=4, sort_keys=True)
+        sys.stdout.write("\n")
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measures the memory used by synthetic nodenets.
+"""
+
+import gc
+import tracemalloc
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+
+def run_memory_benchmark(runtime, topology, size):
+    """Builds a nodenet with the given topology and size, and returns the memory allocated for it"""
+    from micropsi_core.benchmarks.topologies import TOPOLOGIES
+
+    success, uid = runtime.new_nodenet("Memory benchmark %s %d" % (topology, size), "Default", owner="Benchmark")
+    try:
+        nodenet = runtime.get_nodenet(uid)
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        TOPOLOGIES[topology](nodenet.netapi, size)
+        nodenet.step()
+        gc.collect()
+        used, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        node_count = len(nodenet.nodes)
+        link_count = len(nodenet.links)
+    finally:
+        runtime.delete_nodenet(uid)
+
+    return {
+        "topology": topology,
+        "size": size,
+        "nodes": node_count,
+        "links": link_count,
+        "bytes": used - before,
+        "peak": peak - before,
+        "bytes_per_node": (used - before) / node_count
+    }
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""
+Builders for synthetic nodenets.
+
+Every builder creates exactly `size` nodes in the Root nodespace of the given nodenet, including a self-activating
+source register that keeps the net busy, and returns the list of created nodes.
+"""
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+
+def create_source(netapi):
+    """Creates a register that keeps activating itself"""
+    source = netapi.create_node("Register", "Root", "Source")
+    netapi.link(source, "gen", source, "gen")
+    source.activation = 1
+    return source
+
+
+def build_chain(netapi, size):
+    """A single long chain of registers, activated at its start"""
+    source = create_source(netapi)
+    nodes = [source]
+    previous = source
+    for i in range(size - 1):
+        node = netapi.create_node("Register", "Root", "Chain%d" % i)
+        netapi.link(previous, "gen", node, "gen")
+        nodes.append(node)
+        previous = node
+    return nodes
+
+
+def build_clusters(netapi, size, cluster_size=5):
+    """Clusters of concepts that are fully linked with por/ret links, each activated by the source"""
+    source = create_source(netapi)
+    nodes = [source]
+    while len(nodes) < size:
+        cluster = [netapi.create_node("Concept", "Root", "Cluster%d" % len(nodes))
+                   for i in range(min(cluster_size, size - len(nodes)))]
+        netapi.link_full(cluster)
+        netapi.link(source, "gen", cluster[0], "gen")
+        nodes.extend(cluster)
+    return nodes
+
+
+def build_hierarchy(netapi, size, nodetype="Pipe", branching=3):
+    """A breadth-first tree of sub/sur linked nodes with por/ret linked siblings, requested by the source"""
+    source = create_source(netapi)
+    root = netapi.create_node(nodetype, "Root", "Hierarchy")
+    netapi.link(source, "gen", root, "sub")
+    nodes = [source, root]
+    parents = [root]
+    while len(nodes) < size:
+        parent = parents.pop(0)
+        previous = None
+        for i in range(min(branching, size - len(nodes))):
+            node = netapi.create_node(nodetype, "Root", "Hierarchy%d" % len(nodes))
+            netapi.link_with_reciprocal(parent, node, "subsur")
+            if previous is not None:
+                netapi.link_with_reciprocal(previous, node, "porret")
+            nodes.append(node)
+            parents.append(node)
+            previous = node
+    return nodes
+
+
+def build_script_hierarchy(netapi, size, branching=3):
+    """A hierarchy of script nodes"""
+    return build_hierarchy(netapi, size, nodetype="Script", branching=branching)
+
+
+def build_sheaf_fanout(netapi, size, fanout=10):
+    """Requested pipes with cat links to many pipes, so every head opens a sheaf for each of its categories"""
+    source = create_source(netapi)
+    nodes = [source]
+    while len(nodes) < size:
+        head = netapi.create_node("Pipe", "Root", "Head%d" % len(nodes))
+        netapi.link(source, "gen", head, "sub")
+        nodes.append(head)
+        for i in range(min(fanout, size - len(nodes))):
+            node = netapi.create_node("Pipe", "Root", "Category%d" % len(nodes))
+            netapi.link_with_reciprocal(head, node, "catexp")
+            nodes.append(node)
+    return nodes
+
+
+TOPOLOGIES = {
+    "chain": build_chain,
+    "clusters": build_clusters,
+    "pipe_hierarchy": build_hierarchy,
+    "script_hierarchy": build_script_hierarchy,
+    "sheaf_fanout": build_sheaf_fanout
+}
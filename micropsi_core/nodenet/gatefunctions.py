@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+Built-in gate functions
+
+Gate functions take the input activation x and the gate parameters rho (r) and theta (t). The built-in functions can
+be set as gate functions by their name, and are used as well if the source of a gate function is one of the sources
+listed in SOURCES. Every built-in function has a vectorized counterpart as its "vectorized" attribute, which takes
+numpy arrays of inputs, rhos and thetas, so the array engine can apply it to all gates of a group at once.
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+
+def identity(x, r, t):
+    return x
+
+
+def absolute(x, r, t):
+    return abs(x)
+
+
+def sigmoid(x, r, t):
+    """The logistic function of x, with theta as the slope"""
+    # 1 / (1 + exp(-z)) without overflowing for large values of z
+    return 0.5 * (1.0 + math.tanh(0.5 * t * x))
+
+
+def threshold(x, r, t):
+    """1 if x is above theta, 0 otherwise"""
+    return 1.0 if x > t else 0.0
+
+
+def _identity_vectorized(x, r, t):
+    return x.copy()
+
+
+def _absolute_vectorized(x, r, t):
+    return np.abs(x)
+
+
+def _sigmoid_vectorized(x, r, t):
+    return 0.5 * (1.0 + np.tanh(0.5 * t * x))
+
+
+def _threshold_vectorized(x, r, t):
+    return (x > t).astype(float)
+
+
+identity.vectorized = _identity_vectorized
+absolute.vectorized = _absolute_vectorized
+sigmoid.vectorized = _sigmoid_vectorized
+threshold.vectorized = _threshold_vectorized
+
+BUILTIN_GATEFUNCTIONS = {
+    'identity': identity,
+    'absolute': absolute,
+    'sigmoid': sigmoid,
+    'threshold': threshold
+}
+
+# gate function sources that are replaced by a built-in function
+SOURCES = {
+    'return x': 'identity',
+    'return abs(x)': 'absolute',
+    'return 1/(1+math.exp(-t*x))': 'sigmoid',
+    'return 1 if x > t else 0': 'threshold'
+}
+
+_NORMALIZED_SOURCES = dict((''.join(source.split()), name) for source, name in SOURCES.items())
+
+
+def get_builtin(source):
+    """Returns the built-in gate function with the given name or source, or None"""
+    name = source.strip()
+    if name in BUILTIN_GATEFUNCTIONS:
+        return BUILTIN_GATEFUNCTIONS[name]
+    name = _NORMALIZED_SOURCES.get(''.join(source.split()))
+    return BUILTIN_GATEFUNCTIONS.get(name)
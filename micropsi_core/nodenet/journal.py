@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Change journal of a nodenet
+
+Records which nodes, nodespaces and links have been created, changed or deleted in every step, so the editor can
+fetch only what has changed since the step it has last seen, instead of the whole visible area.
+"""
+
+from collections import OrderedDict
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+# the number of steps that are kept in the journal
+JOURNAL_LENGTH = 100
+
+# the smallest change of the activation of a node or gate that is recorded
+ACTIVATION_EPSILON = 0.001
+
+# the kinds of changes in every step of the journal
+CHANGE_KINDS = (
+    'nodes',                # created, moved or otherwise changed nodes
+    'activations',          # nodes whose activations have changed
+    'nodespaces',
+    'links',
+    'deleted_nodes',
+    'deleted_nodespaces',
+    'deleted_links'
+)
+
+
+class ChangeJournal(object):
+    """Keeps the uids of the entities that have changed, by the step in which they changed.
+
+    Structural changes are recorded by the setters of the entities as they happen. Activations are compared with the
+    last recorded activations when the changes are requested, so stepping the nodenet does not cost anything while
+    nobody is watching it.
+
+    Attributes:
+        nodenet: the nodenet of the journal
+        entries: an ordered dict of steps and the changes in every step
+        horizon: the latest step whose changes are not completely in the journal; changes since older steps can only
+            be answered with a full snapshot
+        activations: a dict of node uids and their last recorded node and gate activations, or None before the
+            activations have been recorded for the first time
+        version: a counter that is increased whenever a change is recorded
+    """
+
+    def __init__(self, nodenet, length=JOURNAL_LENGTH, epsilon=ACTIVATION_EPSILON):
+        self.nodenet = nodenet
+        self.length = length
+        self.epsilon = epsilon
+        self.version = 0
+        self.reset()
+
+    def reset(self):
+        """Empties the journal, e.g. after the nodenet has been loaded again"""
+        self.entries = OrderedDict()
+        self.horizon = self.nodenet.current_step or 0
+        self.activations = None
+        self.version += 1
+
+    def get_entry(self):
+        """Returns the changes of the current step"""
+        step = self.nodenet.current_step or 0
+        entry = self.entries.get(step)
+        if entry is None:
+            entry = self.entries[step] = dict((kind, set()) for kind in CHANGE_KINDS)
+            while len(self.entries) > self.length:
+                discarded, _ = self.entries.popitem(last=False)
+                self.horizon = max(self.horizon, discarded)
+        return entry
+
+    def entity_changed(self, entity):
+        if entity.entitytype == "nodes":
+            self.get_entry()['nodes'].add(entity.uid)
+            self.version += 1
+        elif entity.entitytype == "nodespaces":
+            self.get_entry()['nodespaces'].add(entity.uid)
+            self.version += 1
+
+    def entity_deleted(self, entitytype, uid):
+        if entitytype == "nodes":
+            self.get_entry()['deleted_nodes'].add(uid)
+            self.version += 1
+            if self.activations is not None:
+                self.activations.pop(uid, None)
+        elif entitytype == "nodespaces":
+            self.get_entry()['deleted_nodespaces'].add(uid)
+            self.version += 1
+
+    def link_changed(self, uid):
+        self.get_entry()['links'].add(uid)
+        self.version += 1
+
+    def link_deleted(self, uid):
+        self.get_entry()['deleted_links'].add(uid)
+        self.version += 1
+
+    def record_activations(self):
+        """Records the nodes whose node or gate activations have changed by more than epsilon since they were last
+        recorded"""
+        epsilon = self.epsilon
+        recorded = self.activations
+        if recorded is None:
+            recorded = self.activations = {}
+        changed = []
+        for uid, node in self.nodenet.nodes.items():
+            activations = (node.activation,) + tuple(gate.activation for gate in node.gates.values())
+            previous = recorded.get(uid)
+            if previous is None or len(previous) != len(activations) or \
+                    any(abs(a - b) > epsilon for a, b in zip(previous, activations)):
+                recorded[uid] = activations
+                changed.append(uid)
+        if changed:
+            self.get_entry()['activations'].update(changed)
+            self.version += 1
+
+    def get_changes(self, since_step):
+        """Returns the changes in all steps from the given one on, or None if they are not all in the journal.
+
+        The changes of the given step itself are included, because they may have happened after it was seen."""
+        if self.activations is None:
+            # activations before the first recording are unknown, so they can not be told apart from newer ones
+            self.record_activations()
+            self.horizon = max(self.horizon, self.nodenet.current_step or 0)
+        if since_step is None or since_step <= self.horizon:
+            return None
+        self.record_activations()
+        changes = dict((kind, set()) for kind in CHANGE_KINDS)
+        for step, entry in self.entries.items():
+            if step >= since_step:
+                for key, uids in entry.items():
+                    changes[key] |= uids
+        # entities may have been deleted and created again, so they are sorted by whether they exist now
+        for created, deleted, entities in (('nodes', 'deleted_nodes', self.nodenet.nodes),
+                                           ('nodespaces', 'deleted_nodespaces', self.nodenet.nodespaces),
+                                           ('links', 'deleted_links', self.nodenet.links)):
+            uids = changes[created] | changes[deleted]
+            changes[created] = set(uid for uid in uids if uid in entities)
+            changes[deleted] = uids - changes[created]
+        changes['activations'] -= changes['deleted_nodes']
+        return changes
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+Incremental reading and writing of large JSON objects
+
+The members of a JSON object are represented as a sequence of (section, key, value) tuples:
+    (None, key, value): a member of the object
+    (section, None, None): the start of a section, i.e. a member whose value is an object that is streamed, too
+    (section, key, value): a member of the current section
+
+This way, the nodes and links of a nodenet can be read and written one by one, without keeping the whole JSON
+document in memory.
+"""
+
+import codecs
+import json
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+WHITESPACE = ' \t\n\r'
+
+
+class _Reader(object):
+    """Reads JSON values from a file object, one at a time"""
+
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.text = ''
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+        self.unicode_decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def fill(self, size):
+        chunk = self.fp.read(size)
+        if not chunk:
+            self.eof = True
+        if isinstance(chunk, bytes):
+            chunk = self.unicode_decoder.decode(chunk, final=self.eof)
+        chunk = chunk or ''
+        self.text = self.text[self.position:] + chunk
+        self.position = 0
+
+    def peek(self):
+        """Skips whitespace and returns the next character, or an empty string at the end of the file"""
+        while True:
+            while self.position < len(self.text) and self.text[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.text) or self.eof:
+                return self.text[self.position:self.position + 1]
+            self.fill(self.chunk_size)
+
+    def expect(self, characters):
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError("Expected one of '%s' at '%s'" % (characters, self.text[self.position:self.position + 20]))
+        self.position += 1
+        return character
+
+    def value(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.position)
+                # a number at the end of the buffer might continue in the next chunk
+                if end < len(self.text) or self.eof:
+                    self.position = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self.fill(size)
+            size *= 2
+
+
+def iterate_members(fp, sections=(), chunk_size=65536):
+    """Parses the JSON object in the given file object incrementally, and yields its members as (section, key, value)
+    tuples. The members of the given sections are yielded one by one"""
+    reader = _Reader(fp, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key in sections and reader.peek() == '{':
+            reader.expect('{')
+            yield key, None, None
+            if reader.peek() == '}':
+                reader.expect('}')
+            else:
+                while True:
+                    uid = reader.value()
+                    reader.expect(':')
+                    yield key, uid, reader.value()
+                    if reader.expect(',}') == '}':
+                        break
+        else:
+            yield None, key, reader.value()
+        if reader.expect(',}') == '}':
+            break
+
+
+def dump_members(members, batch_size=1000, encoded=False):
+    """Serializes the given (section, key, value) tuples as a JSON object, and yields the result as a sequence of
+    strings that contain up to batch_size members each. If encoded is True, the values are JSON strings already"""
+    parts = ['{']
+    separator = ''
+    section = None
+    count = 0
+    for member_section, key, value in members:
+        if section is not None and member_section != section:
+            parts.append('}')
+            section = None
+            separator = ', '
+        if member_section is not None and key is None:
+            parts.append('%s%s: {' % (separator, json.dumps(member_section)))
+            section = member_section
+            separator = ''
+            continue
+        parts.append('%s%s: %s' % (separator, json.dumps(key), value if encoded else json.dumps(value, sort_keys=True)))
+        separator = ', '
+        count += 1
+        if count % batch_size == 0:
+            yield ''.join(parts)
+            parts = []
+    if section is not None:
+        parts.append('}')
+    parts.append('}')
+    yield ''.join(parts)
+
+
+def write_members(fp, members):
+    """Writes the given (section, key, value) tuples as a JSON object to the file object"""
+    for chunk in dump_members(members):
+        fp.write(chunk)
@@ -20,6 +20,8 @@ class Link(object):
     You may retrieve links either from the global dictionary (by uid), or from the gates of nodes themselves.
     """
 
+    __slots__ = ('nodenet', 'data')
+
     @property
     def uid(self):
         return self.data.get("uid")
@@ -31,6 +33,7 @@ class Link(object):
     @weight.setter
     def weight(self, value):
         self.data["weight"] = value
+        self.nodenet.journal.link_changed(self.data["uid"])
 
     @property
     def certainty(self):
@@ -39,6 +42,7 @@ class Link(object):
     @certainty.setter
     def certainty(self, value):
         self.data["certainty"] = value
+        self.nodenet.journal.link_changed(self.data["uid"])
 
     @property
     def source_node(self):
@@ -110,6 +114,8 @@ class Link(object):
         self.certainty = certainty
         self.source_gate.outgoing[self.uid] = self
         self.target_slot.incoming[self.uid] = self
+        self.nodenet.journal.link_changed(self.uid)
+        self.nodenet.structure_changed()
 
     def remove(self):
         """unplug the link from the node net
@@ -117,3 +123,5 @@ class Link(object):
         """
         del self.source_gate.outgoing[self.uid]
         del self.target_slot.incoming[self.uid]
+        self.nodenet.journal.link_deleted(self.uid)
+        self.nodenet.structure_changed()
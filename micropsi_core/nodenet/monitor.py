@@ -2,13 +2,184 @@
 
 """
 Monitor definition
+
+Monitors keep the most recent activations in a ring buffer of fixed capacity. Older history is kept in downsampling
+tiers, which store the minimum, maximum and mean activation of every interval of a given number of steps, again in
+ring buffers of fixed capacity. The memory used by a monitor therefore does not grow with the number of steps.
 """
 
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 import micropsi_core.tools
 
 __author__ = 'joscha'
 __date__ = '09.05.12'
 
+# the number of steps for which the exact activations are kept
+RETENTION = 1000
+
+# the number of steps for which aggregate monitors keep the activations of all watched gates
+ACTIVATION_RETENTION = 100
+
+# the downsampling tiers, as (interval, capacity) tuples: every tier keeps the minimum, maximum and mean activation
+# of up to capacity intervals of the given number of steps
+DOWNSAMPLING = [(10, 1000), (100, 1000)]
+
+
+class RingBuffer(object):
+    """A buffer of steps and float values with a fixed capacity. Once the buffer is full, every new entry replaces
+    the oldest one. Steps have to be appended in ascending order.
+
+    Attributes:
+        capacity: the maximum number of entries
+        discarded: True if entries have been replaced since the buffer was created or cleared
+        steps: an array of the steps of the entries
+        columns: a list of arrays of the values of the entries
+    """
+
+    def __init__(self, capacity, columns=1):
+        if capacity < 1:
+            raise ValueError("The capacity of a ring buffer needs to be at least 1")
+        self.capacity = capacity
+        self.steps = array('q', [0]) * capacity
+        self.columns = [array('d', [0.0]) * capacity for i in range(columns)]
+        self.start = 0
+        self.size = 0
+        self.discarded = False
+
+    def __len__(self):
+        return self.size
+
+    def append(self, step, *values):
+        """Appends an entry, and returns its position in the arrays"""
+        if self.size < self.capacity:
+            position = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            position = self.start
+            self.start = (self.start + 1) % self.capacity
+            self.discarded = True
+        self.steps[position] = step
+        for column, value in zip(self.columns, values):
+            column[position] = value
+        return position
+
+    def clear(self):
+        self.start = self.size = 0
+        self.discarded = False
+
+    @property
+    def first_step(self):
+        """The step of the oldest entry, or None if the buffer is empty"""
+        return self.steps[self.start] if self.size else None
+
+    @property
+    def last_step(self):
+        """The step of the newest entry, or None if the buffer is empty"""
+        return self.steps[(self.start + self.size - 1) % self.capacity] if self.size else None
+
+    def bisect(self, step):
+        """Returns the index of the first entry whose step is not smaller than the given step"""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.steps[(self.start + middle) % self.capacity] < step:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get_range(self, from_step=None, to_step=None):
+        """Returns a list of the steps and one list per column of the values of the entries between from_step and
+        to_step (both inclusive, None means unbounded)"""
+        first = 0 if from_step is None else self.bisect(from_step)
+        last = self.size if to_step is None else self.bisect(to_step + 1)
+        start, end = self.start + first, self.start + max(first, last)
+        if end <= self.capacity:
+            slices = [slice(start, end)]
+        elif start >= self.capacity:
+            slices = [slice(start - self.capacity, end - self.capacity)]
+        else:
+            slices = [slice(start, self.capacity), slice(0, end - self.capacity)]
+        result = []
+        for values in [self.steps] + self.columns:
+            result.append([value for part in slices for value in values[part]])
+        return result
+
+
+class DownsamplingTier(object):
+    """Keeps the minimum, maximum and mean of the values of every interval of the given number of steps.
+
+    Intervals start at multiples of the interval length. The interval that is still being recorded is kept separately
+    and only moved into the ring buffer once a value for a later interval arrives.
+    """
+
+    def __init__(self, interval, capacity):
+        self.interval = interval
+        self.buffer = RingBuffer(capacity, 3)
+        self.pending = None
+
+    def add(self, step, value):
+        start = step - step % self.interval
+        pending = self.pending
+        if pending is not None and pending[0] == start:
+            pending[1] = min(pending[1], value)
+            pending[2] = max(pending[2], value)
+            pending[3] += value
+            pending[4] += 1
+        else:
+            self.flush()
+            self.pending = [start, value, value, value, 1]
+
+    def flush(self):
+        if self.pending is not None:
+            start, minimum, maximum, total, count = self.pending
+            self.buffer.append(start, minimum, maximum, total / count)
+            self.pending = None
+
+    def clear(self):
+        self.buffer.clear()
+        self.pending = None
+
+    @property
+    def discarded(self):
+        return self.buffer.discarded
+
+    @property
+    def first_step(self):
+        if len(self.buffer):
+            return self.buffer.first_step
+        return self.pending[0] if self.pending is not None else None
+
+    def get_range(self, from_step=None, to_step=None):
+        """Returns lists of the start steps, minimums, maximums and means of the intervals that start between
+        from_step and to_step, including the interval that is still being recorded"""
+        if from_step is not None:
+            from_step -= from_step % self.interval
+        result = self.buffer.get_range(from_step, to_step)
+        pending = self.pending
+        if pending is not None and (from_step is None or pending[0] >= from_step) and \
+                (to_step is None or pending[0] <= to_step):
+            for values, value in zip(result, [pending[0], pending[1], pending[2], pending[3] / pending[4]]):
+                values.append(value)
+        return result
+
+    def get_data(self):
+        steps, minimums, maximums, means = self.buffer.get_range()
+        return {'interval': self.interval, 'steps': steps, 'min': minimums, 'max': maximums, 'mean': means,
+                'pending': self.pending}
+
+    def set_data(self, data):
+        for values in zip(data['steps'], data['min'], data['max'], data['mean']):
+            self.buffer.append(*values)
+        if data.get('pending') is not None:
+            self.pending = list(data['pending'])
+
 
 class Monitor(object):
     """A gate or slot monitor watching the activation of the given slot or gate over time
@@ -18,25 +189,272 @@ class Monitor(object):
         node: the parent Node
         type: either "slot" or "gate"
         target: the name of the observerd Slot or Gate
+        retention: the number of steps for which the exact activations are kept
+        downsampling: a list of (interval, capacity) tuples that define the downsampling tiers
     """
 
-    def __init__(self, nodenet, node_uid, type, target, node_name='', uid=None, **_):
+    def __init__(self, nodenet, node_uid, type, target, node_name='', uid=None, values=None, history=None,
+                 retention=None, downsampling=None, **_):
         if 'monitors' not in nodenet.state:
             nodenet.state['monitors'] = {}
         self.uid = uid or micropsi_core.tools.generate_uid()
         self.data = {'uid': self.uid}
         self.nodenet = nodenet
         nodenet.state['monitors'][self.uid] = self.data
-        self.data['values'] = self.values = {}
         self.data['node_uid'] = self.node_uid = node_uid
         self.data['node_name'] = self.node_name = node_name
         self.data['type'] = self.type = type
         self.data['target'] = self.target = target
+        self.version = None
+        self.source = None
+        self.set_retention(RETENTION if retention is None else retention,
+                           DOWNSAMPLING if downsampling is None else downsampling)
+
+        if values:
+            steps = sorted(int(step) for step in values)
+            if history is None:
+                # files from before the downsampling only contain the exact values
+                for step in steps:
+                    self.record(step, values.get(step, values.get(str(step))))
+            else:
+                for step in steps:
+                    self.buffer.append(step, values.get(step, values.get(str(step))))
+        for tier_data in history or []:
+            for tier in self.tiers:
+                if tier.interval == tier_data['interval']:
+                    tier.set_data(tier_data)
+        # full buffers have most likely discarded values before they were saved
+        for buffer in [self.buffer] + [tier.buffer for tier in self.tiers]:
+            buffer.discarded = buffer.discarded or len(buffer) == buffer.capacity
+
+    def set_retention(self, retention, downsampling):
+        """Sets the capacity of the ring buffers. Recorded values are discarded."""
+        self.retention = self.data['retention'] = retention
+        self.downsampling = self.data['downsampling'] = [list(tier) for tier in downsampling]
+        self.buffer = RingBuffer(retention)
+        self.tiers = [DownsamplingTier(interval, capacity) for interval, capacity in downsampling]
+
+    def step(self, step):
+        if self.version != self.nodenet.structure_version:
+            # look up the watched gate or slot only when the structure of the nodenet has changed
+            self.version = self.nodenet.structure_version
+            node = self.nodenet.nodes.get(self.node_uid)
+            self.source = getattr(node, self.type + 's').get(self.target) if node is not None else None
+        if self.source is not None:
+            self.record(step, self.source.sheaves['default'].activation)
+
+    def record(self, step, value):
+        self.buffer.append(step, value)
+        for tier in self.tiers:
+            tier.add(step, value)
+
+    def clear(self):
+        self.buffer.clear()
+        for tier in self.tiers:
+            tier.clear()
+        self.update_data()
+
+    def get_values(self, from_step=None, to_step=None, resolution=None):
+        """Returns the activations between from_step and to_step (both inclusive, None means unbounded).
+
+        The exact activations are returned if they are still kept for the whole window and there are not more of
+        them than the given resolution. Otherwise, the finest downsampling tier that satisfies these conditions is
+        used (or the coarsest one), and the result contains the minimum and maximum as well as the mean of every
+        interval.
+
+        Returns:
+            a dict with the interval length, dicts of steps and values for "values" (and "min" and "max"), and the
+            step of the newest activation as "cursor" for get_values_since
+        """
+        if from_step is None and resolution is None:
+            candidates = [(1, self.buffer)]
+        else:
+            candidates = [(1, self.buffer)] + [(tier.interval, tier) for tier in self.tiers]
+        chosen = None
+        for interval, source in candidates:
+            if source.first_step is None:
+                continue
+            chosen = interval, source
+            # a source that has discarded values may be missing the beginning of the window
+            covers = from_step is None or not source.discarded or source.first_step <= from_step - from_step % interval
+            if covers and (resolution is None or len(source.get_range(from_step, to_step)[0]) <= resolution):
+                break
+        if chosen is None:
+            return {'interval': 1, 'values': {}, 'cursor': self.buffer.last_step}
+        interval, source = chosen
+        columns = source.get_range(from_step, to_step)
+        if interval == 1:
+            return {'interval': 1, 'values': dict(zip(*columns)), 'cursor': self.buffer.last_step}
+        steps, minimums, maximums, means = columns
+        return {
+            'interval': interval,
+            'values': dict(zip(steps, means)),
+            'min': dict(zip(steps, minimums)),
+            'max': dict(zip(steps, maximums)),
+            'cursor': self.buffer.last_step
+        }
+
+    def get_values_since(self, cursor):
+        """Returns the exact activations that have been recorded after the step given as cursor, and the step of the
+        newest activation as the new cursor. Activations that are no longer kept are skipped."""
+        steps, values = self.buffer.get_range(cursor + 1)
+        return {'interval': 1, 'values': dict(zip(steps, values)), 'cursor': steps[-1] if steps else cursor}
+
+    def get_info(self):
+        """Returns the data of the monitor without the recorded values"""
+        return dict((key, value) for key, value in self.data.items() if key not in ('values', 'history'))
+
+    def update_data(self):
+        """Writes the recorded values into the persistent data of the monitor, before it is saved or exported"""
+        steps, values = self.buffer.get_range()
+        self.data['values'] = dict(zip(steps, values))
+        self.data['history'] = [tier.get_data() for tier in self.tiers]
+
+
+class AggregateMonitor(object):
+    """A monitor watching one gate type of all nodes in a nodespace, or of all nodes of a node type, or both.
+
+    In every step, the activations of all watched gates are recorded as one row of a two-dimensional buffer,
+    and their mean, their maximum and the number of activations above the threshold are kept as a summary.
+    The watched gates are only looked up again when the structure of the nodenet changes. If the array engine
+    calculates the nodenet, the activations are taken from its arrays directly.
+
+    Attributes:
+        nodenet: the parent Nodenet
+        target: the name of the watched gate type
+        nodespace: the uid of the watched nodespace, or None
+        nodetype: the name of the watched node type, or None
+        threshold: activations above the threshold are counted
+        node_uids: the uids of the nodes whose gates are currently watched, in the order of the recorded rows
+        retention: the number of steps for which the summaries are kept
+        activation_retention: the number of steps for which all activations are kept
+    """
+
+    def __init__(self, nodenet, target, nodespace=None, nodetype=None, threshold=0.0, uid=None, summaries=None,
+                 retention=None, activation_retention=None, **_):
+        if nodespace is None and nodetype is None:
+            raise ValueError("An aggregate monitor needs a nodespace or a node type")
+        if 'monitors' not in nodenet.state:
+            nodenet.state['monitors'] = {}
+        self.uid = uid or micropsi_core.tools.generate_uid()
+        self.data = {'uid': self.uid, 'type': 'aggregate'}
+        self.nodenet = nodenet
+        nodenet.state['monitors'][self.uid] = self.data
+        self.data['target'] = self.target = target
+        self.data['nodespace'] = self.nodespace = nodespace
+        self.data['nodetype'] = self.nodetype = nodetype
+        self.data['threshold'] = self.threshold = threshold
+        self.data['node_name'] = " ".join(
+            ["%s %s" % (key, value) for key, value in (("nodespace", nodespace), ("nodetype", nodetype)) if value])
+        self.data['retention'] = self.retention = RETENTION if retention is None else retention
+        self.data['activation_retention'] = self.activation_retention = \
+            ACTIVATION_RETENTION if activation_retention is None else activation_retention
+        self.summaries = RingBuffer(self.retention, 3)
+        self.version = None
+        self.node_uids = []
+        self.gates = []
+        self.indices = None
+        self.activations = RingBuffer(self.activation_retention, 0)
+        self.rows = array('d')
+        for row in zip(*[summaries[key] for key in ('steps', 'mean', 'max', 'count')]) if summaries else []:
+            self.summaries.append(*row)
+
+    def update_members(self):
+        """Looks up the watched gates, and starts a new activation buffer if they have changed"""
+        self.version = self.nodenet.structure_version
+        nodes = self.nodenet.node_index.query(
+            nodespace=self.nodespace, types=[self.nodetype] if self.nodetype is not None else None)
+        node_uids = [uid for uid, node in nodes.items() if self.target in node.gates]
+        if node_uids != self.node_uids:
+            self.node_uids = node_uids
+            self.activations.clear()
+            self.rows = array('d', [0.0]) * (len(node_uids) * self.activation_retention)
+        self.gates = [nodes[uid].gates[self.target] for uid in node_uids]
+        self.indices = None
+
+    def index_gates(self, engine):
+        """Looks up the positions of the watched gates in the arrays of the array engine. The gates of activators
+        are not kept up to date by the engine, so they are read from the gate objects."""
+        synced = set(id(gate) for node in engine.vectorized_nodes + engine.fallback_nodes +
+                     list(engine.nativemodules.values()) for gate in node.gates.values())
+        indices = np.array([engine.gate_index[id(gate)] for gate in self.gates], dtype=np.int64)
+        others = [(position, gate) for position, gate in enumerate(self.gates) if id(gate) not in synced]
+        self.indices = engine, indices, others
 
     def step(self, step):
-        if self.node_uid in self.nodenet.nodes:
-            if self.target in getattr(self.nodenet.nodes[self.node_uid], self.type + 's'):
-                self.values[step] = getattr(self.nodenet.nodes[self.node_uid], self.type + 's')[self.target].sheaves['default'].activation
+        if self.version != self.nodenet.structure_version:
+            self.update_members()
+        engine = self.nodenet.step_engine
+        if np is not None and hasattr(engine, 'gate_activations') and engine.version == self.version:
+            if self.indices is None or self.indices[0] is not engine:
+                self.index_gates(engine)
+            values = engine.gate_activations[self.indices[1]]
+            for position, gate in self.indices[2]:
+                values[position] = gate.sheaves['default'].activation
+            if len(values):
+                summary = float(values.mean()), float(values.max()), int(np.count_nonzero(values > self.threshold))
+            else:
+                summary = 0.0, 0.0, 0
+            values = values.tolist()
+        else:
+            values = [gate.sheaves['default'].activation for gate in self.gates]
+            if values:
+                summary = sum(values) / len(values), max(values), sum(1 for value in values if value > self.threshold)
+            else:
+                summary = 0.0, 0.0, 0
+        self.summaries.append(step, *summary)
+        width = len(values)
+        if width:
+            row = self.activations.append(step)
+            self.rows[row * width:(row + 1) * width] = array('d', values)
 
     def clear(self):
-        self.data['values'] = {}
+        self.summaries.clear()
+        self.activations.clear()
+        self.update_data()
+
+    def _summaries(self, steps, means, maximums, counts):
+        return {
+            'interval': 1,
+            'values': dict(zip(steps, means)),
+            'mean': dict(zip(steps, means)),
+            'max': dict(zip(steps, maximums)),
+            'count': dict(zip(steps, counts)),
+            'cursor': self.summaries.last_step
+        }
+
+    def get_values(self, from_step=None, to_step=None, resolution=None):
+        """Returns the summaries between from_step and to_step (both inclusive, None means unbounded) as dicts of
+        steps and values for "mean", "max" and "count". "values" contains the means, too. Summaries are not
+        downsampled, so resolution is ignored."""
+        return self._summaries(*self.summaries.get_range(from_step, to_step))
+
+    def get_values_since(self, cursor):
+        """Returns the summaries that have been recorded after the step given as cursor, and the new cursor"""
+        result = self._summaries(*self.summaries.get_range(cursor + 1))
+        if result['cursor'] is None or result['cursor'] < cursor:
+            result['cursor'] = cursor
+        return result
+
+    def get_activations(self, from_step=None, to_step=None):
+        """Returns the uids of the watched nodes, and the steps and rows of activations between from_step and to_step
+        that are still kept"""
+        buffer = self.activations
+        width = len(self.node_uids)
+        first = 0 if from_step is None else buffer.bisect(from_step)
+        last = len(buffer) if to_step is None else buffer.bisect(to_step + 1)
+        steps, rows = [], []
+        for index in range(first, last):
+            row = (buffer.start + index) % buffer.capacity
+            steps.append(buffer.steps[row])
+            rows.append(self.rows[row * width:(row + 1) * width].tolist())
+        return {'node_uids': list(self.node_uids), 'steps': steps, 'activations': rows}
+
+    def get_info(self):
+        """Returns the data of the monitor without the recorded values"""
+        return dict((key, value) for key, value in self.data.items() if key != 'summaries')
+
+    def update_data(self):
+        """Writes the recorded summaries into the persistent data of the monitor, before it is saved or exported"""
+        steps, means, maximums, counts = self.summaries.get_range()
+        self.data['summaries'] = {'steps': steps, 'mean': means, 'max': maximums, 'count': counts}
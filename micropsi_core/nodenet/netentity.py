@@ -4,6 +4,8 @@
 Netentity definition
 """
 
+from collections import OrderedDict
+
 import micropsi_core.tools
 
 __author__ = 'joscha'
@@ -37,6 +39,8 @@ class NetEntity(object):
     @name.setter
     def name(self, string):
         self.data["name"] = string
+        self.nodenet.node_index.update(self)
+        self.nodenet.journal.entity_changed(self)
 
     @property
     def position(self):
@@ -45,6 +49,8 @@ class NetEntity(object):
     @position.setter
     def position(self, pos):
         self.data["position"] = pos
+        self.nodenet.node_index.update(self)
+        self.nodenet.journal.entity_changed(self)
 
     @property
     def parent_nodespace(self):
@@ -54,17 +60,20 @@ class NetEntity(object):
     def parent_nodespace(self, uid):
         nodespace = self.nodenet.nodespaces[uid]
         if self.entitytype not in nodespace.netentities:
-            nodespace.netentities[self.entitytype] = []
+            nodespace.netentities[self.entitytype] = OrderedDict()
         if self.uid not in nodespace.netentities[self.entitytype]:
-            nodespace.netentities[self.entitytype].append(self.uid)
+            nodespace.netentities[self.entitytype][self.uid] = None
             #if uid in self.nodenet.state["nodespaces"][uid][self.entitytype]:
             #    self.nodenet.state["nodespaces"][uid][self.entitytype] = self.uid
             # tell my old parent that I move out
             if "parent_nodespace" in self.data:
                 old_parent = self.nodenet.nodespaces.get(self.data["parent_nodespace"])
-                if old_parent and old_parent.uid != uid and self.uid in old_parent.netentities.get(self.entitytype, []):
-                    old_parent.netentities[self.entitytype].remove(self.uid)
+                if old_parent and old_parent.uid != uid:
+                    old_parent.netentities.get(self.entitytype, {}).pop(self.uid, None)
         self.data['parent_nodespace'] = uid
+        self.nodenet.node_index.update(self)
+        self.nodenet.journal.entity_changed(self)
+        self.nodenet.structure_changed()
 
     def __init__(self, nodenet, parent_nodespace, position, name="", entitytype="abstract_entities",
                  uid=None, index=None):
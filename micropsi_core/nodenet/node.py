@@ -20,7 +20,9 @@ __author__ = 'joscha'
 __date__ = '09.05.12'
 
 
-class SheafElement:
+class SheafElement(object):
+    __slots__ = ('uid', 'name', 'activation')
+
     def __init__(self, uid="default", name="default", activation=0):
         self.uid = uid
         self.name = name
@@ -30,6 +32,66 @@ class SheafElement:
         return SheafElement(uid=self.uid, name=self.name)
 
 
+# the sheaf that is calculated for nodes without incoming sheaves; it must not be changed
+DEFAULT_SHEAF = SheafElement()
+
+
+def add_sheaf(sheaves, pool, uid, name):
+    """Adds the sheaf element for the given sheaf uid to the sheaves, with an activation of 0. The elements are
+    kept in the pool, so the same sheaf element is reused in every step"""
+    sheaf = pool.get(uid)
+    if sheaf is None:
+        sheaf = pool[uid] = SheafElement(uid=uid, name=name)
+    else:
+        sheaf.name = name
+        sheaf.activation = 0
+    sheaves[uid] = sheaf
+    return sheaf
+
+
+class SheafTable(object):
+    """Interns the uids of the sheaves of a nodenet.
+
+    Every sheaf uid is mapped to a small integer id. A node opens a sheaf with the uid <outer sheaf uid>-<node uid>
+    within another sheaf; for every sheaf, the table keeps the uids of the sheaves opened within it, and the outer
+    sheaf that its activation returns to at a given node. This way, neither the uids of opened sheaves nor the
+    return path of their activation have to be computed from strings in every step.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.uids = []
+        self.children = []
+        self.upsheaves = []
+
+    def intern(self, uid):
+        """Returns the id of the given sheaf uid"""
+        id = self.ids.get(uid)
+        if id is None:
+            id = self.ids[uid] = len(self.uids)
+            self.uids.append(uid)
+            self.children.append({})
+            self.upsheaves.append({})
+        return id
+
+    def get_child(self, uid, node_uid):
+        """Returns the uid of the sheaf that the given node opens within the given sheaf"""
+        children = self.children[self.intern(uid)]
+        child = children.get(node_uid)
+        if child is None:
+            child = children[node_uid] = uid + "-" + node_uid
+            self.upsheaves[self.intern(child)][node_uid] = uid
+        return child
+
+    def get_upsheaf(self, uid, node_uid):
+        """Returns the uid of the sheaf that the activation of the given sheaf returns to at the given node, or None
+        if the sheaf has not been opened by that node"""
+        upsheaves = self.upsheaves[self.intern(uid)]
+        if node_uid not in upsheaves:
+            upsheaves[node_uid] = uid[:-(len(node_uid) + 1)] if uid.endswith(node_uid) else None
+        return upsheaves[node_uid]
+
+
 class Node(NetEntity):
     """A net entity with slots and gates and a node function.
 
@@ -53,16 +115,12 @@ class Node(NetEntity):
         self.set_sheaf_activation(activation)
 
     def set_sheaf_activation(self, activation, sheaf="default"):
-        sheaves_to_calculate = self.get_sheaves_to_calculate()
-        if sheaf not in sheaves_to_calculate:
+        if sheaf != "default" and not any(sheaf in slot.sheaves for slot in self.slots.values()):
             raise "Sheaf " + sheaf + " can not be set as it hasn't been propagated to any slot"
 
         if activation is None: activation = 0
 
         self.sheaves[sheaf].activation = float(activation)
-        if 'sheaves' not in self.data:
-            self.data['sheaves'] = {}
-        self.data['sheaves'][sheaf] = {"uid": sheaf, "name": sheaves_to_calculate[sheaf].name, "activation": activation}
         if len(self.nodetype.gatetypes):
             self.set_gate_activation(self.nodetype.gatetypes[0], activation, sheaf)
 
@@ -79,6 +137,8 @@ class Node(NetEntity):
         if self.data["type"] == "Native":
             self.nodetype.parameters = list(dictionary.keys())
         self.data["parameters"] = dictionary
+        self.nodenet.node_index.update(self)
+        self.nodenet.journal.entity_changed(self)
 
     @property
     def state(self):
@@ -87,6 +147,7 @@ class Node(NetEntity):
     @state.setter
     def state(self, state):
         self.data['state'] = state
+        self.nodenet.journal.entity_changed(self)
 
     def __init__(self, nodenet, parent_nodespace, position, state=None, activation=0,
                  name="", type="Concept", uid=None, index=None, parameters=None, gate_parameters=None, gate_activations=None, **_):
@@ -114,7 +175,7 @@ class Node(NetEntity):
                 sheaves_to_use = None
             else:
                 sheaves_to_use = gate_activations[gate]
-            self.gates[gate] = Gate(gate, self, sheaves=sheaves_to_use, gate_function=None, parameters=gate_parameters.get(gate), gate_defaults=self.nodetype.gate_defaults[gate])
+            self.gates[gate] = Gate(gate, self, sheaves=sheaves_to_use, parameters=gate_parameters.get(gate), gate_defaults=self.nodetype.gate_defaults[gate])
             self.data['gate_parameters'][gate] = self.gates[gate].parameters
         for slot in self.nodetype.slottypes:
             self.slots[slot] = Slot(slot, self)
@@ -122,7 +183,11 @@ class Node(NetEntity):
             self.state = state
             # TODO: @doik: before, you explicitly added the state to nodenet.nodes[uid], too (in Runtime). Any reason?
         nodenet.nodes[self.uid] = self
+        nodenet.node_index.add(self)
         self.sheaves = {"default": SheafElement(activation=activation)}
+        self.sheaf_pool = dict(self.sheaves)
+        self.update_data()
+        nodenet.structure_changed()
 
     def get_gate_parameters(self):
         """Looks into the gates and returns gate parameters if these are defined"""
@@ -136,11 +201,12 @@ class Node(NetEntity):
             return None
 
     def set_gate_activation(self, gate, activation, sheaf="default"):
-        """ sets the activation of the given gate, and calls `report_gate_activation`"""
+        """ sets the activation of the given gate"""
         activation = float(activation)
         if gate in self.gates:
             self.gates[gate].sheaves[sheaf].activation = activation
-            self.report_gate_activation(gate, self.gates[gate].sheaves[sheaf])
+            if self.nodenet.step_engine is not None:
+                self.nodenet.step_engine.touched.add(self.gates[gate])
 
     def node_function(self):
         """Called whenever the node is activated or active.
@@ -160,38 +226,32 @@ class Node(NetEntity):
             sheaves_to_calculate = self.get_sheaves_to_calculate()
 
             # find node activation to carry over
-            node_activation_to_carry_over= {}
-            for id in self.sheaves.keys():
+            node_activation_to_carry_over = {}
+            for id, sheaf in self.sheaves.items():
                 if id in sheaves_to_calculate:
-                    node_activation_to_carry_over[id] = self.sheaves[id]
+                    node_activation_to_carry_over[id] = sheaf.activation
 
-            # clear activation states
-            for gatename in self.gates:
-                gate = self.get_gate(gatename)
-                gate.sheaves = {}
-                self.data['gate_activations'][gatename] = {}
-            self.sheaves = {}
-            self.data['sheaves'] = {}
+            # clear activation states; the sheaf elements are kept in the pools and reused
+            for gate in self.gates.values():
+                gate.sheaves.clear()
+            self.sheaves.clear()
 
             # calculate activation states for all open sheaves
-            for sheaf_id in sheaves_to_calculate.keys():
+            for sheaf_id, sheaf in sheaves_to_calculate.items():
 
                 # prepare sheaves
-                for gatename in self.gates:
-                    gate = self.get_gate(gatename)
-                    gate.sheaves[sheaf_id] = sheaves_to_calculate[sheaf_id].copy()
-                    gate.node.report_gate_activation(gate.type, gate.sheaves[sheaf_id])
-                if sheaf_id in node_activation_to_carry_over:
-                    self.sheaves[sheaf_id] = node_activation_to_carry_over[sheaf_id].copy()
-                    self.set_sheaf_activation(node_activation_to_carry_over[sheaf_id].activation, sheaf_id)
-                else:
-                    self.sheaves[sheaf_id] = sheaves_to_calculate[sheaf_id].copy()
-                    self.set_sheaf_activation(0, sheaf_id)
+                for gate in self.gates.values():
+                    add_sheaf(gate.sheaves, gate.pool, sheaf_id, sheaf.name)
+                add_sheaf(self.sheaves, self.sheaf_pool, sheaf_id, sheaf.name)
+                self.set_sheaf_activation(node_activation_to_carry_over.get(sheaf_id, 0), sheaf_id)
 
 
                 # and actually calculate new values for them
                 try:
-                    self.nodetype.nodefunction(netapi=self.nodenet.netapi, node=self, sheaf=sheaf_id, **self.parameters)
+                    if self.type in self.nodenet.native_modules:
+                        self.nodenet.sandbox.call(self, sheaf_id)
+                    else:
+                        self.nodetype.nodefunction(netapi=self.nodenet.netapi, node=self, sheaf=sheaf_id, **self.parameters)
                 except Exception as err:
                     self.nodenet.is_active = False
                     self.data["activation"] = -1
@@ -228,13 +288,13 @@ class Node(NetEntity):
         return nodes
 
     def get_sheaves_to_calculate(self):
+        """Returns a dict of the uids and sheaf elements of all sheaves in the slots of the node. The sheaf elements
+        belong to the slots and must not be changed"""
         sheaves_to_calculate = {}
-        for slotname in self.slots:
-            slot = self.get_slot(slotname)
-            for uid in slot.sheaves.keys():
-                sheaves_to_calculate[uid] = slot.sheaves[uid].copy()
-        if 'default' not in sheaves_to_calculate.keys():
-            sheaves_to_calculate['default'] = SheafElement()
+        for slot in self.slots.values():
+            sheaves_to_calculate.update(slot.sheaves)
+        if 'default' not in sheaves_to_calculate:
+            sheaves_to_calculate['default'] = DEFAULT_SHEAF
         return sheaves_to_calculate
 
     def set_gate_parameters(self, gate_type, parameters):
@@ -246,21 +306,29 @@ class Node(NetEntity):
                     value = float(value)
                 except:
                     raise Exception("Standard gate parameters must be numeric")
-            self.data['gate_parameters'][gate_type][parameter] = value
+            if self.gates[gate_type].parameters is self.nodetype.gate_defaults[gate_type]:
+                # stop sharing the defaults of the node type
+                self.gates[gate_type].parameters = self.gates[gate_type].parameters.copy()
+                self.data['gate_parameters'][gate_type] = self.gates[gate_type].parameters
             self.gates[gate_type].parameters[parameter] = value
+        self.nodenet.journal.entity_changed(self)
+        self.nodenet.structure_changed()
+
+    def update_data(self):
+        """Writes the current sheaf and gate activations into the persistent data of the node.
 
-    def report_gate_activation(self, gate_type, sheafelement):
-        if 'gate_activations' not in self.data:
-            self.data['gate_activations'] = {}
-        if gate_type not in self.data['gate_activations']:
-            self.data['gate_activations'][gate_type] = {}
-        if sheafelement.uid not in self.data['gate_activations'][gate_type]:
-            self.data['gate_activations'][gate_type][sheafelement.uid] = {}
-        self.data['gate_activations'][gate_type][sheafelement.uid] = {"uid": sheafelement.uid, "name": sheafelement.name, "activation": sheafelement.activation}
+        Activations are only kept in the sheaf elements while the nodenet is running, so this needs to be called
+        before the data is saved, exported or sent to the UI."""
+        self.data['sheaves'] = dict((uid, {"uid": uid, "name": sheaf.name, "activation": sheaf.activation})
+                                    for uid, sheaf in self.sheaves.items())
+        self.data['gate_activations'] = dict(
+            (gate_type, dict((uid, {"uid": uid, "name": sheaf.name, "activation": sheaf.activation})
+                             for uid, sheaf in gate.sheaves.items()))
+            for gate_type, gate in self.gates.items())
 
     def reset_slots(self):
-        for slot in self.slots.keys():
-            self.slots[slot].sheaves = {"default": SheafElement()}
+        for slot in self.slots.values():
+            slot.reset()
 
     def get_parameter(self, parameter):
         if parameter in self.parameters:
@@ -270,6 +338,8 @@ class Node(NetEntity):
 
     def set_parameter(self, parameter, value):
         self.parameters[parameter] = value
+        self.nodenet.node_index.update(self)
+        self.nodenet.journal.entity_changed(self)
 
     def get_state(self, state_element):
         if state_element in self.state:
@@ -281,6 +351,7 @@ class Node(NetEntity):
         if 'state' not in self.data:
             self.data['state'] = {}
         self.data['state'][state_element] = value
+        self.nodenet.journal.entity_changed(self)
 
 
 class Gate(object):  # todo: take care of gate functions at the level of nodespaces, handle gate params
@@ -290,16 +361,21 @@ class Gate(object):  # todo: take care of gate functions at the level of nodespa
         type: a string that determines the type of the gate
         node: the parent node of the gate
         activation: a numerical value which is calculated at every step by the gate function
-        parameters: a dictionary of values used by the gate function
-        gate_function: called by the node function, updates the activation
+        parameters: a dictionary of values used by the gate function. Gates without individual parameters share
+            the gate defaults of their node type
         outgoing: the set of links originating at the gate
+        pool: the sheaf elements that have been used by the gate, to be reused in later steps
+        resolved: the structure version, the activators of the parent nodespace and the gate function of the
+            nodespace that were last looked up for the gate, or None
     """
 
+    __slots__ = ('type', 'node', 'sheaves', 'pool', 'outgoing', 'parameters', 'monitor', 'resolved')
+
     @property
     def activation(self):
         return self.sheaves['default'].activation
 
-    def __init__(self, type, node, sheaves=None, gate_function=None, parameters=None, gate_defaults=None):
+    def __init__(self, type, node, sheaves=None, parameters=None, gate_defaults=None):
         """create a gate.
 
         Parameters:
@@ -315,9 +391,8 @@ class Gate(object):  # todo: take care of gate functions at the level of nodespa
             self.sheaves = {}
             for key in sheaves:
                 self.sheaves[key] = SheafElement(uid=sheaves[key]['uid'], name=sheaves[key]['name'], activation=sheaves[key]['activation'])
-        self.node.report_gate_activation(self.type, self.sheaves['default'])
+        self.pool = dict(self.sheaves)
         self.outgoing = {}
-        self.gate_function = gate_function or self.gate_function
         self.parameters = {}
         if gate_defaults is not None:
             self.parameters = gate_defaults.copy()
@@ -331,7 +406,10 @@ class Gate(object):  # todo: take care of gate functions at the level of nodespa
                         self.parameters[key] = Nodetype.GATE_DEFAULTS.get(key, 0)
                 else:
                     self.parameters[key] = float(parameters[key])
+        if self.parameters == gate_defaults:
+            self.parameters = gate_defaults
         self.monitor = None
+        self.resolved = None
 
     def gate_function(self, input_activation, sheaf="default"):
         """This function sets the activation of the gate.
@@ -342,20 +420,21 @@ class Gate(object):  # todo: take care of gate functions at the level of nodespa
         """
         if input_activation is None: input_activation = 0
 
+        # the nodespace and its gate function only need to be looked up again after the structure has changed
+        nodenet = self.node.nodenet
+        resolved = self.resolved
+        if resolved is None or resolved[0] != nodenet.structure_version:
+            nodespace = nodenet.nodespaces[self.node.parent_nodespace]
+            resolved = self.resolved = (nodenet.structure_version, nodespace.activators,
+                                        nodespace.get_gatefunction(self.node.type, self.type))
+        _, activators, gatefunction = resolved
 
         # check if the current node space has an activator that would prevent the activity of this gate
-        nodespace = self.node.nodenet.nodespaces[self.node.parent_nodespace]
-        if self.type in nodespace.activators:
-            gate_factor = nodespace.activators[self.type]
-        else:
-            gate_factor = 1.0
+        gate_factor = activators.get(self.type, 1.0)
         if gate_factor == 0.0:
             self.sheaves[sheaf].activation = 0
-            self.node.report_gate_activation(self.type, self.sheaves[sheaf])
             return  # if the gate is closed, we don't need to execute the gate function
             # simple linear threshold function; you might want to use a sigmoid for neural learning
-        gatefunction = self.node.nodenet.nodespaces[self.node.parent_nodespace].get_gatefunction(self.node.type,
-            self.type)
         if gatefunction:
             activation = gatefunction(input_activation, self.parameters.get('rho', 0), self.parameters.get('theta', 0))
         else:
@@ -373,22 +452,18 @@ class Gate(object):  # todo: take care of gate functions at the level of nodespa
         #         activation = max(activation, self.activation * (1 - self.parameters["decay"]))
 
         self.sheaves[sheaf].activation = min(self.parameters["maximum"], max(self.parameters["minimum"], activation))
-        self.node.report_gate_activation(self.type, self.sheaves[sheaf])
 
     def open_sheaf(self, input_activation, sheaf="default"):
         """This function opens a new sheaf and calls the gate function for the newly opened sheaf
         """
-        if sheaf is "default":
-            sheaf_uid_prefix = "default" + "-"
-            sheaf_name_prefix = ""
+        if sheaf == "default":
+            name = self.node.name
         else:
-            sheaf_uid_prefix = sheaf + "-"
-            sheaf_name_prefix = self.sheaves[sheaf].name + "-"
-
-        new_sheaf = SheafElement(uid=sheaf_uid_prefix + self.node.uid, name=sheaf_name_prefix + self.node.name)
-        self.sheaves[new_sheaf.uid] = new_sheaf
+            name = self.sheaves[sheaf].name + "-" + self.node.name
+        uid = self.node.nodenet.sheaf_table.get_child(sheaf, self.node.uid)
+        add_sheaf(self.sheaves, self.pool, uid, name)
 
-        self.gate_function(input_activation, new_sheaf.uid)
+        self.gate_function(input_activation, uid)
 
 
 class Slot(object):
@@ -400,8 +475,11 @@ class Slot(object):
         activation: a numerical value which is the sum of all incoming activations
         current_step: the simulation step when the slot last received activation
         incoming: a dictionary of incoming links together with the respective activation received by them
+        pool: the sheaf elements that have been used by the slot, to be reused in later steps
     """
 
+    __slots__ = ('type', 'node', 'incoming', 'current_step', 'sheaves', 'pool')
+
     def __init__(self, type, node):
         """create a slot.
 
@@ -414,6 +492,19 @@ class Slot(object):
         self.incoming = {}
         self.current_step = -1
         self.sheaves = {"default": SheafElement()}
+        self.pool = dict(self.sheaves)
+
+    def reset(self):
+        """Closes all sheaves but the default sheaf, and sets the activation of the default sheaf to 0"""
+        default = self.pool['default']
+        if len(self.sheaves) != 1 or self.sheaves.get('default') is not default:
+            self.sheaves.clear()
+            self.sheaves['default'] = default
+        default.activation = 0
+
+    def add_sheaf(self, uid, name):
+        """Opens the given sheaf in the slot, with an activation of 0"""
+        return add_sheaf(self.sheaves, self.pool, uid, name)
 
     @property
     def activation(self):
@@ -634,13 +725,19 @@ class Nodetype(object):
             # self.nodefunction = micropsi_core.tools.create_function("""node.activation = 'Syntax error'""",
             #     parameters="nodenet, node")
 
+    @property
+    def signature(self):
+        """The parts of the definition that the slots, gates and parameters of the nodes depend on. Nodes have to be
+        rebuilt if the signature of their type changes, while the node function can be swapped in place."""
+        return (tuple(self.slottypes or ()), tuple(self.gatetypes or ()), tuple(self.parameters),
+                sorted((gate, sorted(values.items())) for gate, values in self.gate_defaults.items()))
+
     def reload_nodefunction(self):
-        from micropsi_core.nodenet import nodefunctions
-        if self.nodefunction_name and not self.nodefunction_definition and not hasattr(nodefunctions, self.nodefunction_name):
-            import nodefunctions as custom_nodefunctions
-            from imp import reload
-            reload(custom_nodefunctions)
-            self.nodefunction = getattr(custom_nodefunctions, self.nodefunction_name)
+        """Binds the node function again, from the user's nodefunctions module as it is currently imported"""
+        if self.nodefunction_definition:
+            self.nodefunction_definition = self.nodefunction_definition
+        elif self.nodefunction_name:
+            self.nodefunction_name = self.nodefunction_name
 
     def __init__(self, name, nodenet, slottypes=None, gatetypes=None, states=None, parameters=None,
                  nodefunction_definition=None, nodefunction_name=None, parameter_values=None, gate_defaults=None,
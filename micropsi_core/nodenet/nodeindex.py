@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+"""
+Secondary indexes over the nodes of a nodenet
+"""
+
+from bisect import bisect_left, insort
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+# the edge length of the cells of the spatial grid
+GRID_SIZE = 100
+
+
+def get_cell(position):
+    """Returns the grid cell of the given position, as the coordinates of its upper left corner"""
+    return int(position[0] - (position[0] % GRID_SIZE)), int(position[1] - (position[1] % GRID_SIZE))
+
+
+class NodeIndex(object):
+    """Keeps the nodes of a nodenet indexed by parent nodespace, node type, datasource and datatarget, keeps a
+    sorted list of node names for prefix queries, and sorts the nodes of every nodespace into a grid of cells.
+
+    Nodes are added when they are created and removed when they are deleted. Whenever the name, the parent nodespace,
+    the position or the parameters of an indexed node change, update() has to be called; the setters of Node and
+    NetEntity do this, so parameters should be changed with Node.set_parameter rather than in place.
+
+    Attributes:
+        nodes: a dict of the uids and nodes in the index
+        by_nodespace, by_type, by_datasource, by_datatarget: dicts of keys and dicts of the uids and nodes with that key
+        names: a sorted list of (name, uid) tuples
+        grid: a dict of nodespace uids and dicts of grid cells and the uids and nodes within the cell
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.by_nodespace = {}
+        self.by_type = {}
+        self.by_datasource = {}
+        self.by_datatarget = {}
+        self.names = []
+        self.grid = {}
+        self.columns = {}
+        self.rows = {}
+        self.max_cell = None
+        self.keys = {}
+        self.order = {}
+        self.counter = 0
+
+    @staticmethod
+    def get_keys(node):
+        parameters = node.parameters
+        return (node.parent_nodespace, node.type, node.name, parameters.get('datasource'),
+                parameters.get('datatarget'), get_cell(node.position))
+
+    def add(self, node):
+        """Adds the node to the index"""
+        if node.uid in self.keys:
+            self.remove(node)
+        self.counter += 1
+        self.order[node.uid] = self.counter
+        self.nodes[node.uid] = node
+        self._insert(node, self.get_keys(node))
+
+    def remove(self, node):
+        """Removes the node from the index"""
+        keys = self.keys.get(node.uid)
+        if keys is not None:
+            self._delete(node.uid, keys)
+            del self.nodes[node.uid]
+            del self.order[node.uid]
+
+    def update(self, node):
+        """Re-indexes the node after its name, parent nodespace, position or parameters have changed"""
+        keys = self.keys.get(node.uid)
+        if keys is None or self.nodes[node.uid] is not node:
+            return
+        new_keys = self.get_keys(node)
+        if new_keys != keys:
+            self._delete(node.uid, keys)
+            self._insert(node, new_keys)
+
+    def _buckets(self, keys):
+        return zip((self.by_nodespace, self.by_type, self.by_datasource, self.by_datatarget),
+                   (keys[0], keys[1], keys[3], keys[4]))
+
+    def _insert(self, node, keys):
+        self.keys[node.uid] = keys
+        for index, key in self._buckets(keys):
+            if key is not None:
+                index.setdefault(key, {})[node.uid] = node
+        insort(self.names, (keys[2], node.uid))
+        x, y = cell = keys[5]
+        self.grid.setdefault(keys[0], {}).setdefault(cell, {})[node.uid] = node
+        self.columns[x] = self.columns.get(x, 0) + 1
+        self.rows[y] = self.rows.get(y, 0) + 1
+        if self.max_cell is not None:
+            self.max_cell = max(self.max_cell[0], x), max(self.max_cell[1], y)
+
+    def _delete(self, uid, keys):
+        del self.keys[uid]
+        for index, key in self._buckets(keys):
+            if key is not None:
+                del index[key][uid]
+                if not index[key]:
+                    del index[key]
+        position = bisect_left(self.names, (keys[2], uid))
+        del self.names[position]
+        x, y = cell = keys[5]
+        cells = self.grid[keys[0]]
+        del cells[cell][uid]
+        if not cells[cell]:
+            del cells[cell]
+            if not cells:
+                del self.grid[keys[0]]
+        for counts, value, i in ((self.columns, x, 0), (self.rows, y, 1)):
+            counts[value] -= 1
+            if not counts[value]:
+                del counts[value]
+                if self.max_cell is not None and self.max_cell[i] == value:
+                    self.max_cell = None
+
+    @property
+    def max_coords(self):
+        """The largest coordinates of the cells that contain nodes, but at least 0"""
+        if self.max_cell is None:
+            self.max_cell = max(self.columns, default=0), max(self.rows, default=0)
+        return {'x': max(self.max_cell[0], 0), 'y': max(self.max_cell[1], 0)}
+
+    def get_area(self, nodespace, x1, x2, y1, y2):
+        """Returns a dict of the uids and nodes in the given nodespace that lie within the grid cells overlapping
+        the given rectangle"""
+        result = {}
+        cells = self.grid.get(nodespace)
+        if not cells:
+            return result
+        left, top = get_cell((x1, y1))
+        right, bottom = get_cell((x2, y2))
+        if (right - left + GRID_SIZE) * (bottom - top + GRID_SIZE) // (GRID_SIZE * GRID_SIZE) < len(cells):
+            candidates = ((x, y) for x in range(left, right + 1, GRID_SIZE) for y in range(top, bottom + 1, GRID_SIZE))
+        else:
+            candidates = (cell for cell in cells if left <= cell[0] <= right and top <= cell[1] <= bottom)
+        for cell in candidates:
+            if cell in cells:
+                result.update(cells[cell])
+        return result
+
+    def get_by_name_prefix(self, prefix):
+        """Returns a dict of the uids and nodes whose names start with the given prefix"""
+        result = {}
+        position = bisect_left(self.names, (prefix,))
+        names = self.names
+        while position < len(names) and names[position][0].startswith(prefix):
+            uid = names[position][1]
+            result[uid] = self.nodes[uid]
+            position += 1
+        return result
+
+    def query(self, nodespace=None, types=None, datasource=None, datatarget=None, name_prefix=None):
+        """Returns a dict of the uids and nodes that match all of the given criteria, in the order of their creation.
+        types is a list of node types, the other criteria are single values; None matches everything"""
+        candidates = []
+        if nodespace is not None:
+            candidates.append(self.by_nodespace.get(nodespace, {}))
+        if types is not None:
+            if len(types) == 1:
+                candidates.append(self.by_type.get(types[0], {}))
+            else:
+                nodes = {}
+                for type in types:
+                    nodes.update(self.by_type.get(type, {}))
+                candidates.append(nodes)
+        if datasource is not None:
+            candidates.append(self.by_datasource.get(datasource, {}))
+        if datatarget is not None:
+            candidates.append(self.by_datatarget.get(datatarget, {}))
+        if name_prefix is not None:
+            candidates.append(self.get_by_name_prefix(name_prefix))
+        if not candidates:
+            return dict(self.nodes)
+
+        candidates.sort(key=len)
+        smallest, others = candidates[0], candidates[1:]
+        uids = [uid for uid in smallest if all(uid in nodes for nodes in others)]
+        uids.sort(key=self.order.__getitem__)
+        return dict((uid, smallest[uid]) for uid in uids)
@@ -3,6 +3,7 @@
 """
 Nodenet definition
 """
+from collections import OrderedDict
 from copy import deepcopy
 
 import micropsi_core.tools
@@ -10,18 +11,37 @@ import json
 import os
 
 import warnings
-from .node import Node, Nodetype, SheafElement, STANDARD_NODETYPES
+from .node import Node, Nodetype, SheafTable, STANDARD_NODETYPES
 from threading import Lock
 import logging
 from .nodespace import Nodespace
 from .link import Link
-from .monitor import Monitor
+from .monitor import Monitor, AggregateMonitor
+from .sandbox import NativeModuleSandbox
+from .journal import ChangeJournal
+from .nodeindex import NodeIndex
+from . import snapshot
 
 __author__ = 'joscha'
 __date__ = '09.05.12'
 
 NODENET_VERSION = 1
 
+ENGINES = ["objects", "arrays", "sparse"]
+
+FILE_FORMATS = ["json", "snapshot"]
+
+# the parts of the nodenet state that are exported and imported entity by entity
+EXPORT_SECTIONS = ["nodespaces", "nodes", "links", "monitors"]
+
+# the gate types of reciprocal links, and the gate type of the link that goes back
+RECIPROCAL_LINKTYPES = {
+    "subsur": ("sub", "sur"),
+    "porret": ("por", "ret"),
+    "catexp": ("cat", "exp"),
+    "symref": ("sym", "ref")
+}
+
 class NodenetLockException(Exception):
     pass
 
@@ -37,6 +57,9 @@ class Nodenet(object):
         filename: the path and file name to the file storing the persisted net data
         nodespaces: a dictionary of node space UIDs and respective node spaces
         nodes: a dictionary of node UIDs and respective nodes
+        node_index: secondary indexes of the nodes by nodespace, type, datasource, datatarget, name and position
+        sheaf_table: the interned uids of the sheaves that have been opened in the nodenet
+        max_coords: the largest x and y coordinates of the grid cells that contain nodes
         links: a dictionary of link UIDs and respective links
         gate_types: a dictionary of gate type names and the individual types of gates
         slot_types: a dictionary of slot type names and the individual types of slots
@@ -45,6 +68,13 @@ class Nodenet(object):
         worldadapter: an actual world adapter object residing in a world implementation, provides interface
         owner: an id of the user who created the node net
         step: the current simulation step of the node net
+        engine: the engine used to calculate the node net, one of "objects", "arrays" or "sparse"
+        structure_version: a counter that is increased whenever nodes, links or gate parameters change
+        runner_timestep: the timestep in ms if the nodenet runner simulates this nodenet in its own worker, or None
+            to use the timestep of the runner
+        profiler: records the timing of every step while profiling is enabled, None otherwise
+        file_format: the format the nodenet is saved in, either "json" or the binary "snapshot" format
+        journal: records which nodes, nodespaces and links change in every step, so the editor can fetch only those
     """
 
     @property
@@ -101,6 +131,35 @@ class Nodenet(object):
     def is_active(self, is_active):
         self.state['is_active'] = is_active
 
+    @property
+    def runner_timestep(self):
+        return self.state.get("runner_timestep")
+
+    @runner_timestep.setter
+    def runner_timestep(self, timestep):
+        self.state['runner_timestep'] = timestep
+
+    @property
+    def engine(self):
+        return self.state.get("engine", "objects")
+
+    @engine.setter
+    def engine(self, engine):
+        if engine not in ENGINES:
+            raise ValueError("Unknown nodenet engine: %s" % engine)
+        self.state['engine'] = engine
+        self.step_engine = None
+
+    @property
+    def file_format(self):
+        return self.state.get("file_format", "json")
+
+    @file_format.setter
+    def file_format(self, file_format):
+        if file_format not in FILE_FORMATS:
+            raise ValueError("Unknown nodenet file format: %s" % file_format)
+        self.state['file_format'] = file_format
+
     def __init__(self, filename, name="", worldadapter="Default", world=None, owner="", uid=None, nodetypes={}, native_modules={}):
         """Create a new MicroPsi agent.
 
@@ -133,15 +192,20 @@ class Nodenet(object):
             self.worldadapter = worldadapter
 
         self.nodes = {}
+        self.node_index = NodeIndex()
+        self.sheaf_table = SheafTable()
         self.links = {}
         self.nodetypes = nodetypes
         self.native_modules = native_modules
         self.nodespaces = {}
         self.monitors = {}
         self.locks = {}
-        self.nodes_by_coords = {}
-        self.max_coords = {'x': 0, 'y': 0}
         self.netapi = NetAPI(self)
+        self.structure_version = 0
+        self.step_engine = None
+        self.profiler = None
+        self.sandbox = NativeModuleSandbox(self)
+        self.journal = ChangeJournal(self)
 
         self.netlock = Lock()
 
@@ -164,8 +228,12 @@ class Nodenet(object):
             else:
                 try:
                     self.logger.info("Loading nodenet %s from file %s", self.name, self.filename)
-                    with open(self.filename) as file:
-                        self.state.update(json.load(file))
+                    with open(self.filename, 'rb') as file:
+                        data = file.read()
+                    if snapshot.is_snapshot(data):
+                        self.state.update(snapshot.loads(data))
+                    else:
+                        self.state.update(json.loads(data.decode('utf-8')))
                 except ValueError:
                     warnings.warn("Could not read nodenet data")
                     return False
@@ -225,18 +293,6 @@ class Nodenet(object):
             data = self.state['nodes'][uid]
             if data['type'] in nodetypes or data['type'] in native_modules:
                 self.nodes[uid] = Node(self, **data)
-                pos = self.nodes[uid].position
-                xpos = int(pos[0] - (pos[0] % 100))
-                ypos = int(pos[1] - (pos[1] % 100))
-                if xpos not in self.nodes_by_coords:
-                    self.nodes_by_coords[xpos] = {}
-                    if xpos > self.max_coords['x']:
-                        self.max_coords['x'] = xpos
-                if ypos not in self.nodes_by_coords[xpos]:
-                    self.nodes_by_coords[xpos][ypos] = []
-                    if ypos > self.max_coords['y']:
-                        self.max_coords['y'] = ypos
-                self.nodes_by_coords[xpos][ypos].append(uid)
             else:
                 warnings.warn("Invalid nodetype %s for node %s" % (data['type'], uid))
             # set up links
@@ -254,7 +310,13 @@ class Nodenet(object):
             else:
                 warnings.warn("Slot or gatetype for link %s invalid" % uid)
         for uid in self.state.get('monitors', {}):
-            self.monitors[uid] = Monitor(self, **self.state['monitors'][uid])
+            data = self.state['monitors'][uid]
+            if data.get('type') == 'aggregate':
+                self.monitors[uid] = AggregateMonitor(self, **data)
+            else:
+                self.monitors[uid] = Monitor(self, **data)
+        self.journal.reset()
+        self.structure_changed()
 
             # TODO: check if data sources and data targets match
 
@@ -265,9 +327,87 @@ class Nodenet(object):
         else:
             return self.native_modules.get(type)
 
+    def reload_native_modules(self, native_modules):
+        """Applies new native module definitions without reinitializing the nodenet.
+
+        Types whose slots, gates and parameters are unchanged keep their nodes, and only get their node function
+        bound again. The nodes of types whose signature has changed are rebuilt, together with their links.
+
+        Arguments:
+            native_modules: a dict of native module types and their definitions
+
+        Returns a dict with the added and rebound types, and the number of rebuilt nodes of every changed type."""
+        report = {'added': [], 'rebound': [], 'rebuilt': {}}
+        for type, definition in sorted(native_modules.items()):
+            nodetype = Nodetype(nodenet=self, **definition)
+            old = self.native_modules.get(type)
+            if old is None:
+                self.native_modules[type] = nodetype
+                report['added'].append(type)
+            elif old.signature == nodetype.signature:
+                # gates share the gate defaults of their type, so the type itself is kept
+                old.data = nodetype.data
+                old.parameter_values = nodetype.parameter_values
+                old.nodefunction = nodetype.nodefunction
+                report['rebound'].append(type)
+            else:
+                report['rebuilt'][type] = self.rebuild_nodes(old, nodetype)
+            # the new code gets a new chance, if the old one has overrun its time budget
+            self.sandbox.enable(type)
+        self.structure_changed()
+        return report
+
+    def rebuild_nodes(self, old, nodetype):
+        """Replaces the given native module type, and creates its nodes again with the slots and gates of the new
+        type. Links to gates and slots that still exist are kept. Returns the number of rebuilt nodes."""
+        nodes = []
+        links = {}
+        for node in list(self.nodes.values()):
+            if node.nodetype is not old:
+                continue
+            node.update_data()
+            gate_parameters = dict((name, dict(gate.parameters)) for name, gate in node.gates.items()
+                                   if name in nodetype.gatetypes and gate.parameters is not old.gate_defaults[name])
+            nodes.append({
+                'uid': node.uid,
+                'type': node.type,
+                'name': node.name,
+                'parent_nodespace': node.parent_nodespace,
+                'position': node.position,
+                'index': node.index,
+                'state': node.state,
+                'activation': node.activation,
+                'parameters': dict((key, value) for key, value in node.parameters.items()
+                                   if key in nodetype.parameters),
+                'gate_parameters': gate_parameters
+            })
+            for gate in node.gates.values():
+                links.update(gate.outgoing)
+            for slot in node.slots.values():
+                links.update(slot.incoming)
+        links = [{
+            'uid': uid,
+            'source_node_uid': link.source_node.uid,
+            'gate_type': link.source_gate.type,
+            'target_node_uid': link.target_node.uid,
+            'slot_type': link.target_slot.type,
+            'weight': link.weight,
+            'certainty': link.certainty
+        } for uid, link in links.items()]
+
+        self.delete_nodes([data['uid'] for data in nodes])
+        self.native_modules[nodetype.name] = nodetype
+        self.create_nodes(nodes)
+        self.create_links([data for data in links if
+                           data['gate_type'] in self.nodes[data['source_node_uid']].gates and
+                           data['slot_type'] in self.nodes[data['target_node_uid']].slots])
+        return len(nodes)
+
+    @property
+    def max_coords(self):
+        return self.node_index.max_coords
+
     def get_nodespace_area(self, nodespace, x1, x2, y1, y2):
-        x_range = (x1 - (x1 % 100), 100 + x2 - (x2 % 100), 100)
-        y_range = (y1 - (y1 % 100), 100 + y2 - (y2 % 100), 100)
         data = {
             'links': {},
             'nodes': {},
@@ -282,51 +422,112 @@ class Nodenet(object):
         }
         links = []
         followupnodes = []
-        for x in range(*x_range):
-            if x in self.nodes_by_coords:
-                for y in range(*y_range):
-                    if y in self.nodes_by_coords[x]:
-                        for uid in self.nodes_by_coords[x][y]:
-                            if self.nodes[uid].parent_nodespace == nodespace:  # maybe sort directly by nodespace??
-                                data['nodes'][uid] = self.state['nodes'][uid]
-                                links.extend(self.nodes[uid].get_associated_link_ids())
-                                followupnodes.extend(self.nodes[uid].get_associated_node_ids())
+        for uid, node in self.node_index.get_area(nodespace, x1, x2, y1, y2).items():
+            node.update_data()
+            data['nodes'][uid] = self.state['nodes'][uid]
+            links.extend(node.get_associated_link_ids())
+            followupnodes.extend(node.get_associated_node_ids())
         for uid in links:
             data['links'][uid] = self.state['links'][uid]
         for uid in followupnodes:
             if uid not in data['nodes']:
+                self.nodes[uid].update_data()
                 data['nodes'][uid] = self.state['nodes'][uid]
         return data
 
+    def get_nodespace_changes(self, nodespace, since_step, x1=0, x2=-1, y1=0, y2=-1):
+        """Returns the nodes and links in the given area of the nodespace that have changed since the given step,
+        or None if the journal does not reach back to that step. Without an area, the whole nodespace is used.
+
+        Nodes and links that have been deleted or are no longer shown are listed in deleted_nodes and deleted_links.
+        Nodes that have been created or moved come with their links, like in get_nodespace_area."""
+        changes = self.journal.get_changes(since_step)
+        if changes is None:
+            return None
+        if x2 < 0 or y2 < 0:
+            visible = self.node_index.query(nodespace=nodespace)
+        else:
+            visible = self.node_index.get_area(nodespace, x1, x2, y1, y2)
+        data = {
+            'links': {},
+            'nodes': {},
+            'deleted_nodes': list(changes['deleted_nodes']),
+            'deleted_links': list(changes['deleted_links']),
+            'deleted_nodespaces': list(changes['deleted_nodespaces']),
+            'max_coords': self.max_coords,
+            'is_active': self.is_active,
+            'step': self.current_step,
+            'nodespaces': {}
+        }
+        for uid in changes['nodespaces']:
+            if self.state['nodespaces'][uid]["parent_nodespace"] == nodespace:
+                data['nodespaces'][uid] = self.state['nodespaces'][uid]
+            else:
+                data['deleted_nodespaces'].append(uid)
+        link_uids = set(changes['links'])
+        for uid in changes['nodes'] | changes['activations']:
+            node = self.nodes[uid]
+            if uid in visible:
+                if uid in changes['nodes']:
+                    link_uids.update(node.get_associated_link_ids())
+            elif not any(other in visible for other in node.get_associated_node_ids()):
+                if uid in changes['nodes']:
+                    data['deleted_nodes'].append(uid)
+                continue
+            node.update_data()
+            data['nodes'][uid] = self.state['nodes'][uid]
+        for uid in link_uids:
+            link = self.links[uid]
+            source_uid, target_uid = link.data['source_node_uid'], link.data['target_node_uid']
+            if source_uid in visible or target_uid in visible:
+                data['links'][uid] = self.state['links'][uid]
+                for node_uid in (source_uid, target_uid):
+                    if node_uid not in data['nodes']:
+                        self.nodes[node_uid].update_data()
+                        data['nodes'][node_uid] = self.state['nodes'][node_uid]
+            else:
+                data['deleted_links'].append(uid)
+        return data
+
+    def update_state(self):
+        """Writes the current activations of all nodes into the nodenet state, before it is saved or exported"""
+        for node in self.nodes.values():
+            node.update_data()
+        for monitor in self.monitors.values():
+            monitor.update_data()
+
+    def copy_state(self):
+        """Returns a copy of the current state that can be serialized without holding the netlock.
+
+        Only the entities and the dicts they contain are copied. The sheaves and gate activations of the nodes are
+        replaced by update_data instead of being changed, so the copy can share them with the state."""
+        self.update_state()
+        state = self.state.copy()
+        for section in EXPORT_SECTIONS:
+            if section in state:
+                state[section] = dict(
+                    (uid, {key: value.copy() if value.__class__ is dict else value for key, value in entity.items()})
+                    for uid, entity in state[section].items())
+        return state
+
     def update_node_positions(self):
-        """ recalculates the position hash """
-        self.nodes_by_coords = {}
-        self.max_coords = {'x': 0, 'y': 0}
-        for uid in self.nodes:
-            pos = self.nodes[uid].position
-            xpos = int(pos[0] - (pos[0] % 100))
-            ypos = int(pos[1] - (pos[1] % 100))
-            if xpos not in self.nodes_by_coords:
-                self.nodes_by_coords[xpos] = {}
-                if xpos > self.max_coords['x']:
-                    self.max_coords['x'] = xpos
-            if ypos not in self.nodes_by_coords[xpos]:
-                self.nodes_by_coords[xpos][ypos] = []
-                if ypos > self.max_coords['y']:
-                    self.max_coords['y'] = ypos
-            self.nodes_by_coords[xpos][ypos].append(uid)
+        """Re-indexes all nodes. Only needed if positions or parameters have been changed in place; the setters
+        of the nodes keep the index up to date"""
+        for node in self.nodes.values():
+            self.node_index.update(node)
 
     def delete_node(self, node_uid):
         if node_uid in self.nodespaces:
             affected_entities = self.nodespaces[node_uid].get_contents()
             for key in affected_entities:
-                for uid in affected_entities[key][:]:
+                for uid in list(affected_entities[key]):
                     self.delete_node(uid)
             parent_nodespace = self.nodespaces.get(self.nodespaces[node_uid].parent_nodespace)
-            if parent_nodespace and node_uid in parent_nodespace.netentities["nodespaces"]:
-                parent_nodespace.netentities["nodespaces"].remove(node_uid)
+            if parent_nodespace:
+                parent_nodespace.netentities.get("nodespaces", {}).pop(node_uid, None)
             del self.nodespaces[node_uid]
             del self.state['nodespaces'][node_uid]
+            self.journal.entity_deleted("nodespaces", node_uid)
         else:
             link_uids = []
             for key, gate in self.nodes[node_uid].gates.items():
@@ -340,24 +541,62 @@ class Nodenet(object):
                 if uid in self.state['links']:
                     del self.state['links'][uid]
             parent_nodespace = self.nodespaces.get(self.nodes[node_uid].parent_nodespace)
-            parent_nodespace.netentities["nodes"].remove(node_uid)
+            del parent_nodespace.netentities["nodes"][node_uid]
             if self.nodes[node_uid].type == "Activator":
                 parent_nodespace.activators.pop(self.nodes[node_uid].parameters["type"], None)
+            self.node_index.remove(self.nodes[node_uid])
             del self.nodes[node_uid]
             del self.state['nodes'][node_uid]
-            self.update_node_positions()
+            self.journal.entity_deleted("nodes", node_uid)
+        self.structure_changed()
+
+    def create_nodes(self, nodes):
+        """Creates many nodes at once.
+
+        Arguments:
+            nodes: a list of dicts with the arguments of Node: type, parent_nodespace, position and optionally name,
+                uid, parameters and state
+
+        All nodes are checked before the first one is created. Returns the list of the new nodes."""
+        uids = set()
+        for data in nodes:
+            if self.get_nodetype(data.get('type')) is None:
+                raise KeyError("Node type %s not found" % data.get('type'))
+            if data.get('parent_nodespace') not in self.nodespaces:
+                raise KeyError("Nodespace %s not found" % data.get('parent_nodespace'))
+            uid = data.get('uid')
+            if uid is not None:
+                if uid in self.nodes or uid in uids:
+                    raise KeyError("Node %s already exists" % uid)
+                uids.add(uid)
+        return [Node(self, **data) for data in nodes]
+
+    def delete_nodes(self, node_uids):
+        """Deletes many nodes or nodespaces at once, together with the links connected to them.
+        All uids are checked before the first entity is deleted."""
+        node_uids = list(OrderedDict.fromkeys(node_uids))
+        for uid in node_uids:
+            if uid not in self.nodes and uid not in self.nodespaces:
+                raise KeyError("Node %s not found" % uid)
+        for uid in node_uids:
+            # nodes may have been deleted together with their nodespace already
+            if uid in self.nodes or uid in self.nodespaces:
+                self.delete_node(uid)
 
     def get_nodespace(self, nodespace_uid, max_nodes):
         """returns the nodes and links in a given nodespace"""
         data = {'nodes': {}, 'links': {}, 'nodespaces': {}}
         for key in self.state:
-            if key in ['uid', 'links', 'nodespaces', 'monitors']:
+            if key in ['uid', 'links', 'nodespaces']:
                 data[key] = self.state[key]
+            elif key == "monitors":
+                data[key] = dict((uid, monitor.get_info()) for uid, monitor in self.monitors.items())
             elif key == "nodes":
                 i = 0
                 data[key] = {}
                 for id in self.state[key]:
                     i += 1
+                    self.nodes[id].update_data()
                     data[key][id] = self.state[key][id]
                     if max_nodes and i > max_nodes:
                         break
@@ -365,19 +604,43 @@ class Nodenet(object):
 
     def clear(self):
         self.nodes = {}
+        self.node_index = NodeIndex()
         self.links = {}
         self.monitors = {}
 
-        self.nodes_by_coords = {}
-        self.max_coords = {'x': 0, 'y': 0}
-
         self.nodespaces = {}
         Nodespace(self, None, (0, 0), "Root", "Root")
+        self.journal.reset()
+        self.structure_changed()
 
     # add functions for exporting and importing node nets
-    def export_data(self):
-        """serializes and returns the nodenet state for export to a end user"""
-        pass
+    def export_data(self, batch_size=1000):
+        """serializes the nodenet state for export to a end user, and yields its members as (section, key, value)
+        tuples with JSON encoded values (see jsonstream).
+
+        Nodespaces, nodes, links and monitors are serialized in batches, and the netlock is only held while a batch
+        is serialized, so a running nodenet keeps stepping during the export."""
+        with self.netlock:
+            header = [(None, key, json.dumps(value, sort_keys=True)) for key, value in self.state.items()
+                      if key not in EXPORT_SECTIONS]
+            uids = [(section, list(self.state[section].keys())) for section in EXPORT_SECTIONS if section in self.state]
+        for member in header:
+            yield member
+        for section, section_uids in uids:
+            yield section, None, None
+            for start in range(0, len(section_uids), batch_size):
+                batch = []
+                with self.netlock:
+                    entities = self.state.get(section, {})
+                    for uid in section_uids[start:start + batch_size]:
+                        if uid in entities:
+                            if section == "nodes" and uid in self.nodes:
+                                self.nodes[uid].update_data()
+                            elif section == "monitors" and uid in self.monitors:
+                                self.monitors[uid].update_data()
+                            batch.append((section, uid, json.dumps(entities[uid], sort_keys=True)))
+                for member in batch:
+                    yield member
 
     def import_data(self, nodenet_data):
         """imports nodenet state as the current node net"""
@@ -488,34 +751,88 @@ class Nodenet(object):
 
     def step(self):
         """perform a simulation step"""
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start_step()
 
         if self.world is not None and self.world.agents is not None and self.uid in self.world.agents:
             self.world.agents[self.uid].snapshot()      # world adapter snapshot
                                                         # TODO: Not really sure why we don't just know our world adapter,
                                                         # but instead the world object itself
+        if profiler is not None:
+            profiler.mark("snapshot")
 
         with self.netlock:
-            self.propagate_link_activation(self.nodes.copy())
-
-            self.timeout_locks()
-
             activators = self.get_activators()
-            nativemodules = self.get_nativemodules()
-            everythingelse = self.nodes.copy()
-            for key in nativemodules.keys():
-                del everythingelse[key]
-
-            self.calculate_node_functions(activators)       # activators go first
-            self.calculate_node_functions(nativemodules)    # then native modules, so API sees a deterministic state
-            self.calculate_node_functions(everythingelse)   # then all the peasant nodes get calculated
+            step_engine = self.get_step_engine()
+            if step_engine is not None:
+                step_engine.step(activators)
+                if profiler is not None:
+                    profiler.mark("engine")
+            else:
+                self.propagate_link_activation(self.nodes.copy())
+                if profiler is not None:
+                    profiler.mark("propagation")
+
+                self.timeout_locks()
+
+                nativemodules = self.get_nativemodules()
+                everythingelse = self.nodes.copy()
+                for key in nativemodules.keys():
+                    del everythingelse[key]
+
+                self.calculate_node_functions(activators)       # activators go first
+                if profiler is not None:
+                    profiler.mark("activators")
+                self.calculate_node_functions(nativemodules)    # then native modules, so API sees a deterministic state
+                if profiler is not None:
+                    profiler.mark("nativemodules")
+                self.calculate_node_functions(everythingelse)   # then all the peasant nodes get calculated
+                if profiler is not None:
+                    profiler.mark("nodes")
 
             self.netapi._step()
 
             self.state["step"] += 1
             for uid in self.monitors:
                 self.monitors[uid].step(self.state["step"])
+            if profiler is not None:
+                profiler.mark("monitors")
             for uid, node in activators.items():
                 node.activation = self.nodespaces[node.parent_nodespace].activators[node.parameters['type']]
+            if profiler is not None:
+                profiler.mark("activators")
+
+    def set_profiling(self, enabled):
+        """Starts recording the timing of every step with a fresh profiler, or stops recording"""
+        if enabled:
+            from .profiler import StepProfiler
+            self.profiler = StepProfiler(self)
+        else:
+            self.profiler = None
+
+    def get_step_engine(self):
+        """Returns the engine calculating this nodenet, or None if every node is calculated on every step.
+        Falls back to the object engine if numpy is not available for the array engine"""
+        if self.engine == "objects":
+            return None
+        if self.step_engine is None:
+            if self.engine == "sparse":
+                from .sparse import SparseEngine
+                self.step_engine = SparseEngine(self)
+            else:
+                try:
+                    from .vectorized import ArrayEngine
+                except ImportError as err:
+                    self.logger.warning("Array engine not available, using object engine: %s" % err)
+                    self.state['engine'] = "objects"
+                    return None
+                self.step_engine = ArrayEngine(self)
+        return self.step_engine
+
+    def structure_changed(self):
+        """Called whenever nodes, links, or the parameters of their gates change"""
+        self.structure_version += 1
 
     def propagate_link_activation(self, nodes, limit_gatetypes=None):
         """ the linkfunction
@@ -536,11 +853,11 @@ class Nodenet(object):
                 gates = node.gates.items()
             for type, gate in gates:
                 if gate.parameters['spreadsheaves'] is True:
-                    for sheaf in gate.sheaves.keys():
+                    for sheaf_id, sheaf in gate.sheaves.items():
                         for uid, link in gate.outgoing.items():
-                            for slotname in link.target_node.slots.keys():
-                                if sheaf not in link.target_node.get_slot(slotname).sheaves:
-                                    link.target_node.get_slot(slotname).sheaves[sheaf] = SheafElement(uid=gate.sheaves[sheaf].uid, name=gate.sheaves[sheaf].name)
+                            for slot in link.target_node.slots.values():
+                                if sheaf_id not in slot.sheaves:
+                                    slot.add_sheaf(sheaf_id, sheaf.name)
 
         # propagate activation
         for uid, node in nodes.items():
@@ -551,12 +868,20 @@ class Nodenet(object):
 
             for type, gate in gates:
                 for uid, link in gate.outgoing.items():
-                    for sheaf in gate.sheaves.keys():
-                        if sheaf in link.target_slot.sheaves:
-                            link.target_slot.sheaves[sheaf].activation += float(gate.sheaves[sheaf].activation) * float(link.weight)  # TODO: where's the string coming from?
-                        elif sheaf.endswith(link.target_node.uid):
-                            upsheaf = sheaf[:-(len(link.target_node.uid)+1)]
-                            link.target_slot.sheaves[upsheaf].activation += float(gate.sheaves[sheaf].activation) * float(link.weight)  # TODO: where's the string coming from?
+                    self.propagate_sheaves(gate, link)
+
+    def propagate_sheaves(self, gate, link):
+        """Adds the activation of all sheaves of the gate to the target slot of the link. Activation in a sheaf that
+        has been opened by the target node returns to the sheaf it has been opened from"""
+        target_sheaves = link.target_slot.sheaves
+        weight = float(link.weight)
+        for sheaf_id, sheaf in gate.sheaves.items():
+            if sheaf_id in target_sheaves:
+                target_sheaves[sheaf_id].activation += float(sheaf.activation) * weight  # TODO: where's the string coming from?
+            else:
+                upsheaf = self.sheaf_table.get_upsheaf(sheaf_id, link.data['target_node_uid'])
+                if upsheaf is not None:
+                    target_sheaves[upsheaf].activation += float(sheaf.activation) * weight
 
     def timeout_locks(self):
         """
@@ -575,45 +900,30 @@ class Nodenet(object):
            Arguments:
                nodes: the dict of nodes to consider
         """
+        if self.profiler is not None:
+            return self.profiler.calculate_node_functions(nodes)
         for uid, node in nodes.copy().items():
             node.node_function()
 
     def get_nativemodules(self, nodespace=None):
         """Returns a dict of native modules. Optionally filtered by the given nodespace"""
-        nodes = self.nodes if nodespace is None else self.nodespaces[nodespace].netentities['nodes']
-        nativemodules = {}
-        for uid in nodes:
-            if self.nodes[uid].type not in STANDARD_NODETYPES.keys():
-                nativemodules.update({uid: self.nodes[uid]})
-        return nativemodules
+        types = [type for type in self.node_index.by_type if type not in STANDARD_NODETYPES]
+        return self.node_index.query(nodespace=nodespace, types=types)
 
     def get_activators(self, nodespace=None, type=None):
         """Returns a dict of activator nodes. OPtionally filtered by the given nodespace and the given type"""
-        nodes = self.nodes if nodespace is None else self.nodespaces[nodespace].netentities['nodes']
-        activators = {}
-        for uid in nodes:
-            if self.nodes[uid].type == 'Activator':
-                if type is None or type == self.nodes[uid].parameters['type']:
-                    activators.update({uid: self.nodes[uid]})
+        activators = self.node_index.query(nodespace=nodespace, types=['Activator'])
+        if type is not None:
+            activators = dict((uid, node) for uid, node in activators.items() if node.parameters['type'] == type)
         return activators
 
-    def get_sensors(self, nodespace=None):
-        """Returns a dict of all sensor nodes. Optionally filtered by the given nodespace"""
-        nodes = self.nodes if nodespace is None else self.nodespaces[nodespace].netentities['nodes']
-        sensors = {}
-        for uid in nodes:
-            if self.nodes[uid].type == 'Sensor':
-                sensors[uid] = self.nodes[uid]
-        return sensors
-
-    def get_actors(self, nodespace=None):
-        """Returns a dict of all sensor nodes. Optionally filtered by the given nodespace"""
-        nodes = self.nodes if nodespace is None else self.nodespaces[nodespace].netentities['nodes']
-        actors = {}
-        for uid in nodes:
-            if self.nodes[uid].type == 'Actor':
-                actors[uid] = self.nodes[uid]
-        return actors
+    def get_sensors(self, nodespace=None, datasource=None):
+        """Returns a dict of all sensor nodes. Optionally filtered by the given nodespace and datasource"""
+        return self.node_index.query(nodespace=nodespace, types=['Sensor'], datasource=datasource)
+
+    def get_actors(self, nodespace=None, datatarget=None):
+        """Returns a dict of all actor nodes. Optionally filtered by the given nodespace and datatarget"""
+        return self.node_index.query(nodespace=nodespace, types=['Actor'], datatarget=datatarget)
 
     def get_link_uid(self, source_uid, source_gate_name, target_uid, target_slot_name):
         """links are uniquely identified by their origin and targets; this function checks if a link already exists.
@@ -625,12 +935,14 @@ class Nodenet(object):
             target_slot_name: type of the terminating slot
 
         Returns the link uid, or None if it does not exist"""
-        outgoing_candidates = set(self.nodes[source_uid].get_gate(source_gate_name).outgoing.keys())
-        incoming_candidates = set(self.nodes[target_uid].get_slot(target_slot_name).incoming.keys())
-        try:
-            return (outgoing_candidates & incoming_candidates).pop()
-        except KeyError:
-            return None
+        outgoing_candidates = self.nodes[source_uid].get_gate(source_gate_name).outgoing
+        incoming_candidates = self.nodes[target_uid].get_slot(target_slot_name).incoming
+        if len(incoming_candidates) < len(outgoing_candidates):
+            outgoing_candidates, incoming_candidates = incoming_candidates, outgoing_candidates
+        for uid in outgoing_candidates:
+            if uid in incoming_candidates:
+                return uid
+        return None
 
     def set_link_weight(self, link_uid, weight, certainty=1):
         """Set weight of the given link."""
@@ -638,6 +950,7 @@ class Nodenet(object):
         self.state['links'][link_uid]['certainty'] = certainty
         self.links[link_uid].weight = weight
         self.links[link_uid].certainty = certainty
+        self.structure_changed()
         return True
 
     def create_link(self, source_node_uid, gate_type, target_node_uid, slot_type, weight=1, certainty=1, uid=None):
@@ -683,6 +996,57 @@ class Nodenet(object):
         del self.state['links'][link_uid]
         return True
 
+    def create_links(self, links):
+        """Creates or updates many links at once.
+
+        Arguments:
+            links: a list of dicts with the arguments of create_link: source_node_uid, gate_type, target_node_uid,
+                slot_type and optionally weight, certainty and uid
+
+        All links are checked before the first one is created. Returns the list of link uids."""
+        for data in links:
+            for key, names in (('source_node_uid', 'gates'), ('target_node_uid', 'slots')):
+                node = self.nodes.get(data.get(key))
+                if node is None:
+                    raise KeyError("Node %s not found" % data.get(key))
+                name = data.get('gate_type' if names == 'gates' else 'slot_type')
+                if name not in getattr(node, names):
+                    raise KeyError("Node %s has no %s %s" % (node.uid, names[:-1], name))
+
+        # the existing links of every source gate, by target node and slot
+        existing = {}
+        uids = []
+        for data in links:
+            source_node = self.nodes[data['source_node_uid']]
+            gate = source_node.get_gate(data['gate_type'])
+            key = (source_node.uid, gate.type)
+            if key not in existing:
+                existing[key] = dict(((link.data['target_node_uid'], link.data['target_slot_name']), uid)
+                                     for uid, link in gate.outgoing.items())
+            target = (data['target_node_uid'], data['slot_type'])
+            weight = data.get('weight', 1)
+            certainty = data.get('certainty', 1)
+            link_uid = existing[key].get(target)
+            if link_uid is not None:
+                self.set_link_weight(link_uid, weight, certainty)
+            else:
+                link = Link(source_node, gate.type, self.nodes[target[0]], target[1],
+                            weight=weight, certainty=certainty, uid=data.get('uid'))
+                self.links[link.uid] = link
+                link_uid = existing[key][target] = link.uid
+            uids.append(link_uid)
+        return uids
+
+    def delete_links(self, link_uids):
+        """Deletes many links at once. All uids are checked before the first link is deleted."""
+        link_uids = list(OrderedDict.fromkeys(link_uids))
+        for uid in link_uids:
+            if uid not in self.links:
+                raise KeyError("Link %s not found" % uid)
+        for uid in link_uids:
+            self.delete_link(uid)
+        return True
+
     def is_locked(self, lock):
         """Returns true if a lock of the given name exists"""
         return lock in self.locks
@@ -744,12 +1108,7 @@ class NetAPI(object):
         Returns a list of nodes in the given nodespace (all Nodespaces if None) whose names start with
         the given prefix (all if None)
         """
-        nodes = []
-        for node_uid, node in self.__nodenet.nodes.items():
-            if ((node_name_prefix is None or node.name.startswith(node_name_prefix)) and
-                    (nodespace is None or node.parent_nodespace == nodespace)):
-                nodes.append(node)
-        return nodes
+        return list(self.__nodenet.node_index.query(nodespace=nodespace, name_prefix=node_name_prefix).values())
 
     def get_nodes_in_gate_field(self, node, gate=None, no_links_to=None, nodespace=None):
         """
@@ -802,15 +1161,15 @@ class NetAPI(object):
         Returns all nodes with a min activation, of the given type, active at the given gate, or with node.activation
         """
         nodes = []
-        for node in self.get_nodes(nodespace):
-            if type is None or node.type == type:
-                if gate is not None:
-                    if gate in node.gates:
-                        if node.get_gate(gate).sheaves[sheaf].activation >= min_activation:
-                            nodes.append(node)
-                else:
-                    if node.sheaves[sheaf].activation >= min_activation:
+        candidates = self.__nodenet.node_index.query(nodespace=nodespace, types=None if type is None else [type])
+        for node in candidates.values():
+            if gate is not None:
+                if gate in node.gates:
+                    if node.get_gate(gate).sheaves[sheaf].activation >= min_activation:
                         nodes.append(node)
+            else:
+                if node.sheaves[sheaf].activation >= min_activation:
+                    nodes.append(node)
         return nodes
 
     def delete_node(self, node):
@@ -819,6 +1178,12 @@ class NetAPI(object):
         """
         self.__nodenet.delete_node(node.uid)
 
+    def delete_nodes(self, nodes):
+        """
+        Deletes many nodes and all links connected to them at once.
+        """
+        self.__nodenet.delete_nodes([node.uid for node in nodes])
+
     def create_node(self, nodetype, nodespace, name=None):
         """
         Creates a new node or node space of the given type, with the given name and in the given nodespace.
@@ -831,9 +1196,17 @@ class NetAPI(object):
             entity = Nodespace(self.__nodenet, nodespace, pos, name=name)
         else:
             entity = Node(self.__nodenet, nodespace, pos, name=name, type=nodetype)
-        self.__nodenet.update_node_positions()
         return entity
 
+    def create_nodes(self, nodetype, nodespace, names):
+        """
+        Creates a node of the given type in the given nodespace for each of the given names.
+        Returns the list of the new nodes.
+        """
+        pos = (self.__nodenet.max_coords['x'] + 50, 100)
+        return self.__nodenet.create_nodes([
+            {'type': nodetype, 'parent_nodespace': nodespace, 'position': pos, 'name': name or ""} for name in names])
+
     def link(self, source_node, source_gate, target_node, target_slot, weight=1, certainty=1):
         """
         Creates a link between two nodes. If the link already exists, it will be updated
@@ -841,39 +1214,44 @@ class NetAPI(object):
         """
         self.__nodenet.create_link(source_node.uid, source_gate, target_node.uid, target_slot, weight, certainty)
 
+    def link_many(self, links, weight=1, certainty=1):
+        """
+        Creates or updates many links at once. links is a list of (source_node, source_gate, target_node,
+        target_slot) tuples; all links get the given weight and certainty.
+        """
+        self.__nodenet.create_links([{
+            'source_node_uid': source_node.uid, 'gate_type': source_gate,
+            'target_node_uid': target_node.uid, 'slot_type': target_slot,
+            'weight': weight, 'certainty': certainty} for source_node, source_gate, target_node, target_slot in links])
+
+    def get_reciprocal_links(self, source_node, target_node, linktype):
+        """
+        Returns the two (reciprocal) links between two nodes as (source_node, source_gate, target_node,
+        target_slot) tuples, valid linktypes are subsur, porret, catexp and symref
+        """
+        if linktype not in RECIPROCAL_LINKTYPES:
+            return []
+        forward, backward = RECIPROCAL_LINKTYPES[linktype]
+        forward_slot = forward if forward in target_node.slots else "gen"
+        backward_slot = backward if backward in source_node.slots else "gen"
+        return [(source_node, forward, target_node, forward_slot), (target_node, backward, source_node, backward_slot)]
+
     def link_with_reciprocal(self, source_node, target_node, linktype, weight=1, certainty=1):
         """
         Creates two (reciprocal) links between two nodes, valid linktypes are subsur, porret, catexp and symref
         """
-        if linktype == "subsur":
-            subslot = "sub" if "sub" in target_node.slots else "gen"
-            surslot = "sur" if "sur" in source_node.slots else "gen"
-            self.__nodenet.create_link(source_node.uid, "sub", target_node.uid, subslot, weight, certainty)
-            self.__nodenet.create_link(target_node.uid, "sur", source_node.uid, surslot, weight, certainty)
-        elif linktype == "porret":
-            porslot = "por" if "por" in target_node.slots else "gen"
-            retslot = "ret" if "ret" in source_node.slots else "gen"
-            self.__nodenet.create_link(source_node.uid, "por", target_node.uid, porslot, weight, certainty)
-            self.__nodenet.create_link(target_node.uid, "ret", source_node.uid, retslot, weight, certainty)
-        elif linktype == "catexp":
-            catslot = "cat" if "cat" in target_node.slots else "gen"
-            expslot = "exp" if "exp" in source_node.slots else "gen"
-            self.__nodenet.create_link(source_node.uid, "cat", target_node.uid, catslot, weight, certainty)
-            self.__nodenet.create_link(target_node.uid, "exp", source_node.uid, expslot, weight, certainty)
-        elif linktype == "symref":
-            symslot = "sym" if "sym" in target_node.slots else "gen"
-            refslot = "ref" if "ref" in source_node.slots else "gen"
-            self.__nodenet.create_link(source_node.uid, "sym", target_node.uid, symslot, weight, certainty)
-            self.__nodenet.create_link(target_node.uid, "ref", source_node.uid, refslot, weight, certainty)
+        self.link_many(self.get_reciprocal_links(source_node, target_node, linktype), weight, certainty)
 
     def link_full(self, nodes, linktype="porret", weight=1, certainty=1):
         """
         Creates two (reciprocal) links between all nodes in the node list (every node to every node),
         valid linktypes are subsur, porret, and catexp.
         """
+        links = []
         for source in nodes:
             for target in nodes:
-                self.link_with_reciprocal(source, target, linktype, weight, certainty)
+                links.extend(self.get_reciprocal_links(source, target, linktype))
+        self.link_many(links, weight, certainty)
 
     def unlink(self, source_node, source_gate=None, target_node=None, target_slot=None):
         """
@@ -890,6 +1268,21 @@ class NetAPI(object):
         for uid in links_to_delete:
             self.__nodenet.delete_link(uid)
 
+    def unlink_many(self, links):
+        """
+        Deletes many links at once. links is a list of (source_node, source_gate, target_node, target_slot) tuples,
+        where everything but the source node may be None, as in unlink
+        """
+        links_to_delete = []
+        for source_node, source_gate, target_node, target_slot in links:
+            for gatetype, gateobject in source_node.gates.items():
+                if source_gate is None or source_gate == gatetype:
+                    for linkid, link in gateobject.outgoing.items():
+                        if target_node is None or target_node.uid == link.target_node.uid:
+                            if target_slot is None or target_slot == link.target_slot.type:
+                                links_to_delete.append(linkid)
+        self.__nodenet.delete_links(links_to_delete)
+
     def link_actor(self, node, datatarget, weight=1, certainty=1, gate='sub', slot='sur'):
         """
         Links a node to an actor. If no actor exists in the node's nodespace for the given datatarget,
@@ -897,13 +1290,10 @@ class NetAPI(object):
         """
         if datatarget not in self.world.get_available_datatargets(self.__nodenet.uid):
             raise KeyError("Data target %s not found" % datatarget)
-        actor = None
-        for uid, candidate in self.__nodenet.get_actors(node.parent_nodespace).items():
-            if candidate.parameters['datatarget'] == datatarget:
-                actor = candidate
+        actor = next(iter(self.__nodenet.get_actors(node.parent_nodespace, datatarget).values()), None)
         if actor is None:
             actor = self.create_node("Actor", node.parent_nodespace, datatarget)
-            actor.parameters.update({'datatarget': datatarget})
+            actor.set_parameter('datatarget', datatarget)
 
         self.link(node, gate, actor, 'gen', weight, certainty)
         #self.link(actor, 'gen', node, slot)
@@ -915,13 +1305,10 @@ class NetAPI(object):
         """
         if datasource not in self.world.get_available_datasources(self.__nodenet.uid):
             raise KeyError("Data source %s not found" % datasource)
-        sensor = None
-        for uid, candidate in self.__nodenet.get_sensors(node.parent_nodespace).items():
-            if candidate.parameters['datasource'] == datasource:
-                sensor = candidate
+        sensor = next(iter(self.__nodenet.get_sensors(node.parent_nodespace, datasource).values()), None)
         if sensor is None:
             sensor = self.create_node("Sensor", node.parent_nodespace, datasource)
-            sensor.parameters.update({'datasource': datasource})
+            sensor.set_parameter('datasource', datasource)
 
         self.link(sensor, 'gen', node, slot)
 
@@ -936,13 +1323,10 @@ class NetAPI(object):
 
         for datatarget in self.world.get_available_datatargets(self.__nodenet.uid):
             if datatarget_prefix is None or datatarget.startswith(datatarget_prefix):
-                actor = None
-                for uid, candidate in self.__nodenet.get_actors(nodespace).items():
-                    if candidate.parameters['datatarget'] == datatarget:
-                        actor = candidate
+                actor = next(iter(self.__nodenet.get_actors(nodespace, datatarget).values()), None)
                 if actor is None:
                     actor = self.create_node("Actor", nodespace, datatarget)
-                    actor.parameters.update({'datatarget': datatarget})
+                    actor.set_parameter('datatarget', datatarget)
                 all_actors.append(actor)
         return all_actors
 
@@ -957,13 +1341,10 @@ class NetAPI(object):
 
         for datasource in self.world.get_available_datasources(self.__nodenet.uid):
             if datasource_prefix is None or datasource.startswith(datasource_prefix):
-                sensor = None
-                for uid, candidate in self.__nodenet.get_sensors(nodespace).items():
-                    if candidate.parameters['datasource'] == datasource:
-                        sensor = candidate
+                sensor = next(iter(self.__nodenet.get_sensors(nodespace, datasource).values()), None)
                 if sensor is None:
                     sensor = self.create_node("Sensor", nodespace, datasource)
-                    sensor.parameters.update({'datasource': datasource})
+                    sensor.set_parameter('datasource', datasource)
                 all_sensors.append(sensor)
         return all_sensors
 
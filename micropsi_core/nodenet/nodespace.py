@@ -4,6 +4,7 @@ Nodespace definition
 """
 
 from .netentity import NetEntity
+from .gatefunctions import get_builtin
 import micropsi_core.tools
 import warnings
 
@@ -19,7 +20,8 @@ class Nodespace(NetEntity):
 
     Attributes:
         activators: a dictionary of activators that control the spread of activation, via activator nodes
-        netentities: a dictionary containing all the contained nodes and nodespaces, to speed up drawing
+        netentities: a dictionary containing all the contained nodes and nodespaces, to speed up drawing. The uids
+            of the entities of every type are kept as the keys of an OrderedDict
     """
 
     def __init__(self, nodenet, parent_nodespace, position, name="", uid=None,
@@ -60,7 +62,10 @@ class Nodespace(NetEntity):
         pass
 
     def set_gate_function(self, nodetype, gatetype, gatefunction, parameters=None):
-        """Sets the gatefunction for a given node- and gatetype within this nodespace"""
+        """Sets the gatefunction for a given node- and gatetype within this nodespace.
+        The names and sources of the functions in gatefunctions.BUILTIN_GATEFUNCTIONS select the built-in
+        functions, which the array engine can apply to whole arrays of gates."""
+        self.nodenet.structure_changed()
         if gatefunction:
             if 'gatefunctions' not in self.data:
                 self.data['gatefunctions'] = {}
@@ -69,6 +74,10 @@ class Nodespace(NetEntity):
             self.data['gatefunctions'][nodetype][gatetype] = gatefunction
             if nodetype not in self.gatefunctions:
                 self.gatefunctions[nodetype] = {}
+            builtin = get_builtin(gatefunction)
+            if builtin is not None:
+                self.gatefunctions[nodetype][gatetype] = builtin
+                return
             try:
                 import math
                 self.gatefunctions[nodetype][gatetype] = micropsi_core.tools.create_function(gatefunction, parameters="x, r, t", additional_symbols={'math': math})
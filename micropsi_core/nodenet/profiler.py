@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+Step profiler
+
+Records the wall time spent in the phases of Nodenet.step, in the node functions of each node type, and in the
+node functions of individual native modules.
+"""
+
+import time
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+
+class StepProfiler(object):
+    """Collects timing data for the steps of a nodenet.
+
+    Attributes:
+        nodenet: the profiled nodenet
+        steps: the number of profiled steps
+        phases: a dict of phase names and the total time spent in them
+        nodetypes: a dict of node types and a list with the total time spent in their node functions and the
+            number of calls
+        nativemodules: a dict of native module node uids and a list with the total time spent in their node function,
+            the number of calls and the longest call
+    """
+
+    def __init__(self, nodenet):
+        self.nodenet = nodenet
+        self.steps = 0
+        self.phases = {}
+        self.nodetypes = {}
+        self.nativemodules = {}
+        self.last = None
+
+    def start_step(self):
+        self.steps += 1
+        self.last = time.perf_counter()
+
+    def mark(self, phase):
+        """Adds the time since the last mark to the given phase"""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0) + now - self.last
+        self.last = now
+
+    def calculate_node_functions(self, nodes):
+        """Calls the node functions of the given nodes, and records the time spent in them"""
+        native_modules = self.nodenet.native_modules
+        for uid, node in nodes.copy().items():
+            start = time.perf_counter()
+            node.node_function()
+            duration = time.perf_counter() - start
+            if node.type not in self.nodetypes:
+                self.nodetypes[node.type] = [0, 0]
+            self.nodetypes[node.type][0] += duration
+            self.nodetypes[node.type][1] += 1
+            if node.type in native_modules:
+                if uid not in self.nativemodules:
+                    self.nativemodules[uid] = [0, 0, 0]
+                self.nativemodules[uid][0] += duration
+                self.nativemodules[uid][1] += 1
+                self.nativemodules[uid][2] = max(self.nativemodules[uid][2], duration)
+
+    def get_profile(self, top=10):
+        """Returns the collected data, including the top native modules with the longest total calculation time"""
+        steps = self.steps or 1
+        slowest = sorted(self.nativemodules.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        nodes = self.nodenet.nodes
+        return {
+            'steps': self.steps,
+            'total': sum(self.phases.values()),
+            'phases': dict((phase, {'total': total, 'mean': total / steps}) for phase, total in self.phases.items()),
+            'nodetypes': dict((nodetype, {'total': total, 'calls': calls, 'mean': total / calls})
+                              for nodetype, (total, calls) in self.nodetypes.items()),
+            'nativemodules': [{
+                'uid': uid,
+                'name': nodes[uid].name if uid in nodes else None,
+                'type': nodes[uid].type if uid in nodes else None,
+                'total': total,
+                'calls': calls,
+                'mean': total / calls,
+                'max': longest
+            } for uid, (total, calls, longest) in slowest]
+        }
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""
+Native module sandbox
+
+Calls the node functions of native modules, and accounts the wall and CPU time spent in every native module type.
+
+Native modules can be given a time budget per call. A call that takes longer counts as an overrun, and a native
+module type whose calls overrun too often in a row is disabled until it is enabled again. If the sandbox is
+isolated, calls are interrupted as soon as they exceed the budget: a trace function raises NativeModuleTimeout in
+the Python code of the native module, and the step continues with the next node. Code that does not return to the
+interpreter (e.g. a long call into a C library) can not be interrupted, but still counts as an overrun.
+"""
+
+import logging
+import sys
+import time
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+# the default settings, as stored in the nodenet state
+DEFAULT_SETTINGS = {
+    'isolated': False,      # interrupt calls that exceed the time budget
+    'time_budget': None,    # the time budget of a call in seconds, or None
+    'max_overruns': 5       # the number of overruns in a row after which a native module type is disabled
+}
+
+
+class NativeModuleTimeout(BaseException):
+    """Raised in a native module that has exceeded its time budget. Like KeyboardInterrupt, it is not an Exception,
+    so native modules do not swallow it by accident"""
+    pass
+
+
+class NativeModuleSandbox(object):
+    """Calls the node functions of the native modules of a nodenet.
+
+    Attributes:
+        nodenet: the nodenet of the native modules
+        stats: a dict of native module types and dicts with their number of calls, total wall and CPU time, longest
+            call, number of overruns, timeouts and overruns in a row, and whether they are disabled
+    """
+
+    def __init__(self, nodenet):
+        self.nodenet = nodenet
+        self.stats = {}
+
+    @property
+    def settings(self):
+        settings = DEFAULT_SETTINGS.copy()
+        settings.update(self.nodenet.state.get('nativemodule_sandbox', {}))
+        return settings
+
+    def configure(self, isolated=None, time_budget=None, max_overruns=None):
+        """Changes the given settings. A time budget of 0 removes the budget."""
+        settings = self.settings
+        if isolated is not None:
+            settings['isolated'] = bool(isolated)
+        if time_budget is not None:
+            if time_budget < 0:
+                raise ValueError("The time budget must not be negative")
+            settings['time_budget'] = time_budget or None
+        if max_overruns is not None:
+            if max_overruns < 1:
+                raise ValueError("At least one overrun has to be allowed")
+            settings['max_overruns'] = max_overruns
+        self.nodenet.state['nativemodule_sandbox'] = settings
+        return settings
+
+    def get_stats(self, nodetype):
+        if nodetype not in self.stats:
+            self.stats[nodetype] = {'calls': 0, 'wall_time': 0.0, 'cpu_time': 0.0, 'longest': 0.0, 'overruns': 0,
+                                    'timeouts': 0, 'errors': 0, 'overruns_in_a_row': 0, 'disabled': False}
+        return self.stats[nodetype]
+
+    def enable(self, nodetype):
+        """Enables a native module type that has been disabled after overrunning its budget"""
+        stats = self.get_stats(nodetype)
+        stats['disabled'] = False
+        stats['overruns_in_a_row'] = 0
+
+    def call(self, node, sheaf):
+        """Calls the node function of the given native module for the given sheaf. Returns False if the native module
+        type has been disabled, True otherwise."""
+        stats = self.get_stats(node.type)
+        if stats['disabled']:
+            return False
+        settings = self.settings
+        budget = settings['time_budget']
+        nodefunction = node.nodetype.nodefunction
+        kwargs = dict(node.parameters, netapi=self.nodenet.netapi, node=node, sheaf=sheaf)
+
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        timed_out = False
+        try:
+            if budget is not None and settings['isolated']:
+                timed_out = self._call_with_deadline(nodefunction, kwargs, start + budget)
+            else:
+                nodefunction(**kwargs)
+        except Exception:
+            stats['errors'] += 1
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            stats['calls'] += 1
+            stats['wall_time'] += duration
+            stats['cpu_time'] += time.thread_time() - cpu_start
+            stats['longest'] = max(stats['longest'], duration)
+
+        if budget is not None:
+            if duration > budget:
+                stats['overruns'] += 1
+                stats['overruns_in_a_row'] += 1
+                if timed_out:
+                    stats['timeouts'] += 1
+                if stats['overruns_in_a_row'] >= settings['max_overruns']:
+                    stats['disabled'] = True
+                    logging.getLogger("nodenet").warning(
+                        "Disabled native module %s after %d calls in a row exceeded the time budget of %s s" %
+                        (node.type, stats['overruns_in_a_row'], budget))
+            else:
+                stats['overruns_in_a_row'] = 0
+        return True
+
+    @staticmethod
+    def _call_with_deadline(nodefunction, kwargs, deadline):
+        """Calls the node function, and interrupts it once the deadline has passed. Returns True if the call has
+        been interrupted."""
+        clock = time.perf_counter
+
+        def trace(frame, event, arg):
+            if clock() > deadline:
+                raise NativeModuleTimeout("Native module exceeded its time budget")
+            return trace
+
+        previous = sys.gettrace()
+        sys.settrace(trace)
+        try:
+            nodefunction(**kwargs)
+        except NativeModuleTimeout:
+            return True
+        finally:
+            sys.settrace(previous)
+        return False
+
+    def get_report(self):
+        """Returns the settings, and the stats of all native module types that have been called, ordered by their
+        total CPU time"""
+        modules = []
+        for nodetype, stats in sorted(self.stats.items(), key=lambda item: item[1]['cpu_time'], reverse=True):
+            module = dict(stats, type=nodetype)
+            module['mean'] = stats['wall_time'] / stats['calls'] if stats['calls'] else 0
+            modules.append(module)
+        return {'settings': self.settings, 'nativemodules': modules}
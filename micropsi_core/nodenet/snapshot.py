@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+
+"""
+Binary snapshot format for nodenet states
+
+A snapshot stores the same data as the JSON format, but keeps nodes and links in columnar tables: the values of
+entities that have the same structure (usually the nodes of one node type) are stored in typed arrays, and all
+strings are kept in a single string table. Nested dicts like gate parameters and gate activations are flattened
+into columns, too. The rest of the state, and entities that do not share their structure with others, are stored
+as JSON.
+
+Layout (all integers little endian):
+    MAGIC, format version (1 byte), flags (1 byte)
+    info: uint32 length + JSON with the scalar values of the state (uid, name, owner, world, ...)
+    manifest: uint64 length + JSON that describes the tables and the remaining state
+    buffers: uint64 length + the concatenated column arrays and the string table
+
+If the compression flag is set, manifest and buffers are compressed with zlib.
+"""
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+MAGIC = b"MPSNAP"
+SNAPSHOT_VERSION = 1
+FLAG_COMPRESSED = 1
+
+# the parts of the state that are stored as tables
+TABLES = ["nodes", "links"]
+
+
+def is_snapshot(data):
+    """Returns True if the given bytes contain a snapshot"""
+    return data[:len(MAGIC)] == MAGIC
+
+
+def dumps(state, compress=True):
+    """Returns the given nodenet state as a snapshot"""
+    writer = _Writer()
+    rest = {}
+    for key, value in state.items():
+        if key not in TABLES:
+            rest[key] = value
+    manifest = {
+        "state": rest,
+        "tables": dict((key, writer.write_table(state[key])) for key in TABLES if key in state)
+    }
+    manifest["strings"] = writer.write_strings()
+    info = dict((key, value) for key, value in rest.items() if not isinstance(value, (dict, list)))
+
+    manifest = json.dumps(manifest).encode("utf-8")
+    buffers = b"".join(writer.buffers)
+    if compress:
+        manifest = zlib.compress(manifest)
+        buffers = zlib.compress(buffers)
+    info = json.dumps(info).encode("utf-8")
+    return b"".join([
+        MAGIC,
+        struct.pack("<BB", SNAPSHOT_VERSION, FLAG_COMPRESSED if compress else 0),
+        struct.pack("<I", len(info)), info,
+        struct.pack("<Q", len(manifest)), manifest,
+        struct.pack("<Q", len(buffers)), buffers
+    ])
+
+
+def loads(data):
+    """Returns the nodenet state stored in the given snapshot"""
+    flags, info, position = _read_header(data)
+    try:
+        length, = struct.unpack_from("<Q", data, position)
+        position += 8
+        manifest = data[position:position + length]
+        position += length
+        length, = struct.unpack_from("<Q", data, position)
+        position += 8
+        buffers = data[position:position + length]
+        if flags & FLAG_COMPRESSED:
+            manifest = zlib.decompress(manifest)
+            buffers = zlib.decompress(buffers)
+    except (struct.error, zlib.error) as err:
+        raise ValueError("Corrupt nodenet snapshot: %s" % err)
+    manifest = json.loads(manifest.decode("utf-8"))
+
+    reader = _Reader(manifest, buffers)
+    state = manifest["state"]
+    for key, table in manifest["tables"].items():
+        state[key] = reader.read_table(table)
+    return state
+
+
+def loads_info(data):
+    """Returns the scalar values of the state (uid, name, owner, ...) without reading the whole snapshot"""
+    return _read_header(data)[1]
+
+
+def _read_header(data):
+    if not is_snapshot(data):
+        raise ValueError("Not a nodenet snapshot")
+    position = len(MAGIC)
+    version, flags = struct.unpack_from("<BB", data, position)
+    if version != SNAPSHOT_VERSION:
+        raise ValueError("Unsupported snapshot version %d" % version)
+    position += 2
+    length, = struct.unpack_from("<I", data, position)
+    position += 4
+    info = json.loads(data[position:position + length].decode("utf-8"))
+    return flags, info, position + length
+
+
+def _flatten(value, path, result):
+    """Adds the leaves of nested, non-empty dicts to the result, as tuples of path and value"""
+    if isinstance(value, dict) and value:
+        for key in value:
+            _flatten(value[key], path + (key,), result)
+    else:
+        result.append((path, value))
+    return result
+
+
+def _typecode(value_type):
+    """Returns the column type for values of the given type: 's' for strings, 'q' for ints, 'd' for floats and
+    'j' for anything else, which is stored as JSON"""
+    return {str: 's', int: 'q', float: 'd'}.get(value_type, 'j')
+
+
+def _access(path):
+    return "e" + "".join("[%r]" % key for key in path)
+
+
+def _compile(source, name, symbols=None):
+    namespace = {"__builtins__": {"len": len, "map": map, "tuple": tuple, "type": type,
+                                  "KeyError": KeyError, "TypeError": TypeError}}
+    namespace.update(symbols or {})
+    exec(source, namespace)
+    return namespace[name]
+
+
+def _compile_extractor(shape):
+    """Compiles a function that returns the leaf values of an entity with the given shape as a tuple, or None if the
+    entity has a different shape"""
+    sizes = {}
+    for path, value_type in shape:
+        for i in range(len(path)):
+            sizes.setdefault(path[:i], set()).add(path[i])
+        if value_type is dict:
+            sizes[path] = set()
+    conditions = ["len(%s) == %d" % (_access(path), len(keys)) for path, keys in sizes.items()] or ["True"]
+    source = "\n".join([
+        "def extract(e):",
+        "    try:",
+        "        if %s:" % " and ".join(conditions),
+        "            values = (%s,)" % ", ".join(_access(path) for path, value_type in shape),
+        "            if tuple(map(type, values)) == types:",
+        "                return values",
+        "    except (KeyError, TypeError):",
+        "        pass",
+        "    return None"
+    ])
+    return _compile(source, "extract", {"types": tuple(value_type for path, value_type in shape)})
+
+
+def _compile_builder(paths):
+    """Compiles a function that takes the leaf values of an entity and returns the nested entity"""
+    tree = {}
+    for index, path in enumerate(paths):
+        if not path:
+            return lambda value: value
+        target = tree
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = index
+
+    def literal(node):
+        if isinstance(node, dict):
+            return "{%s}" % ", ".join("%r: %s" % (key, literal(value)) for key, value in node.items())
+        return "c%d" % node
+
+    arguments = ", ".join("c%d" % index for index in range(len(paths)))
+    return _compile("def build(%s):\n    return %s" % (arguments, literal(tree)), "build")
+
+
+def _to_bytes(values):
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class _Writer(object):
+    """Collects the strings and column arrays of a snapshot"""
+
+    def __init__(self):
+        self.strings = {}
+        self.buffers = []
+        self.offset = 0
+
+    def add_buffer(self, data):
+        self.buffers.append(data)
+        self.offset += len(data)
+        return [self.offset - len(data), len(data)]
+
+    def string_ids(self, values):
+        ids = array('I')
+        for value in values:
+            if value not in self.strings:
+                self.strings[value] = len(self.strings)
+            ids.append(self.strings[value])
+        return ids
+
+    def write_column(self, typecode, values):
+        """Returns the type and the buffer reference of the column, or the values themselves for JSON columns"""
+        if typecode == 's':
+            return typecode, self.add_buffer(_to_bytes(self.string_ids(values)))
+        if typecode != 'j':
+            try:
+                return typecode, self.add_buffer(_to_bytes(array(typecode, values)))
+            except OverflowError:
+                pass
+        return 'j', values
+
+    def write_table(self, entities):
+        """Groups the entities by their structure, and writes every group as a set of columns"""
+        groups = {}
+        extractors = []
+        for key, entity in entities.items():
+            # most entities share their structure with one of the previous ones
+            for shape, extract in extractors:
+                values = extract(entity)
+                if values is not None:
+                    break
+            else:
+                leaves = sorted(_flatten(entity, (), [])) if isinstance(entity, dict) else [((), entity)]
+                shape = tuple((path, type(value)) for path, value in leaves)
+                values = tuple(value for path, value in leaves)
+                if shape in groups:
+                    extractors.insert(0, (shape, _compile_extractor(shape)))
+                    del extractors[8:]
+                else:
+                    groups[shape] = ([], [])
+            groups[shape][0].append(key)
+            groups[shape][1].append(values)
+
+        table = {"groups": [], "entities": {}}
+        for shape, (keys, rows) in groups.items():
+            if len(keys) < 2:
+                table["entities"][keys[0]] = entities[keys[0]]
+                continue
+            columns = list(zip(*rows))
+            table["groups"].append({
+                "keys": self.write_column('s', keys)[1],
+                "columns": [[list(path)] + list(self.write_column(_typecode(value_type), columns[i]))
+                            for i, (path, value_type) in enumerate(shape)]
+            })
+        return table
+
+    def write_strings(self):
+        strings = sorted(self.strings, key=self.strings.get)
+        encoded = [string.encode("utf-8") for string in strings]
+        lengths = self.add_buffer(_to_bytes(array('I', [len(string) for string in encoded])))
+        return {"lengths": lengths, "data": self.add_buffer(b"".join(encoded))}
+
+
+class _Reader(object):
+    """Reads the strings and column arrays of a snapshot"""
+
+    def __init__(self, manifest, buffers):
+        self.buffers = buffers
+        strings = manifest["strings"]
+        lengths = _from_bytes('I', self.get_buffer(strings["lengths"]))
+        data = self.get_buffer(strings["data"])
+        self.strings = []
+        position = 0
+        for length in lengths:
+            self.strings.append(data[position:position + length].decode("utf-8"))
+            position += length
+
+    def get_buffer(self, reference):
+        offset, length = reference
+        return self.buffers[offset:offset + length]
+
+    def read_column(self, typecode, reference):
+        if typecode == 's':
+            strings = self.strings
+            return [strings[i] for i in _from_bytes('I', self.get_buffer(reference))]
+        if typecode == 'j':
+            return reference
+        return _from_bytes(typecode, self.get_buffer(reference)).tolist()
+
+    def read_table(self, table):
+        entities = table["entities"]
+        for group in table["groups"]:
+            keys = self.read_column('s', group["keys"])
+            columns = [self.read_column(typecode, reference) for path, typecode, reference in group["columns"]]
+            build = _compile_builder([tuple(path) for path, typecode, reference in group["columns"]])
+            entities.update(zip(keys, map(build, *columns)))
+        return entities
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""
+Sparse activity engine
+
+Calculates a nodenet like the object engine, but only propagates activation from gates that are active, and only
+calls the node functions of nodes that received activation, or whose outputs might otherwise have changed since
+their last calculation. Activators, sensors, actors and native modules are calculated on every step.
+
+A node that has been calculated without any input keeps its gate activations until it receives input again, its
+gates are set from outside, or the activators of its nodespace change. Nodes in nodespaces that define gate
+functions for their node type are calculated on every step.
+"""
+
+from collections import OrderedDict
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+# node types that are calculated on every step, because they do not only depend on their slots
+ALWAYS_CALCULATED_NODETYPES = ["Activator", "Sensor", "Actor"]
+
+
+class SparseEngine(object):
+    """Runs the activation spreading of a nodenet on its active part only.
+
+    Attributes:
+        nodenet: the nodenet that is being calculated
+        version: the structure version of the nodenet the engine has been prepared for
+        active: the uids of all nodes that have at least one active gate
+        awake: the uids of all nodes that need to be calculated in the next step
+        fed: the uids of all nodes that received activation in the last step
+        touched: a set of gates whose activations have been set from outside of the engine since the last step
+    """
+
+    def __init__(self, nodenet):
+        self.nodenet = nodenet
+        self.version = None
+        self.touched = set()
+
+    def compile(self):
+        """Prepares the engine for the current structure of the nodenet. Everything is calculated in the next step"""
+        nodenet = self.nodenet
+        self.order = dict((uid, index) for index, uid in enumerate(nodenet.nodes))
+        self.nativemodules = nodenet.get_nativemodules()
+        self.always = set(self.nativemodules)
+        for uid, node in nodenet.nodes.items():
+            nodespace = nodenet.nodespaces[node.parent_nodespace]
+            if node.type in ALWAYS_CALCULATED_NODETYPES or node.type in nodespace.gatefunctions:
+                self.always.add(uid)
+        self.active = set(uid for uid, node in nodenet.nodes.items() if self.is_active(node))
+        self.awake = set(nodenet.nodes)
+        self.fed = set(nodenet.nodes)
+        self.activators = dict((uid, nodespace.activators.copy()) for uid, nodespace in nodenet.nodespaces.items())
+        self.touched = set()
+        self.version = nodenet.structure_version
+
+    def is_active(self, node):
+        """Returns True if any gate of the node has activation or sheaves to propagate"""
+        for gate in node.gates.values():
+            for sheaf_id, sheaf in gate.sheaves.items():
+                if sheaf.activation != 0 or sheaf_id != "default":
+                    return True
+        return False
+
+    def step(self, activators):
+        """Calculates a single step of the nodenet"""
+        nodenet = self.nodenet
+        if self.version != nodenet.structure_version:
+            self.compile()
+
+        # gates that have been set from outside invalidate the last calculation of their node
+        for gate in self.touched:
+            self.wake(gate.node)
+        self.touched = set()
+
+        sources = dict((uid, nodenet.nodes[uid]) for uid in self.active)
+        targets = set()
+        for node in sources.values():
+            for gate in node.gates.values():
+                for link in gate.outgoing.values():
+                    targets.add(link.target_node.uid)
+
+        for uid in self.fed | targets:
+            nodenet.nodes[uid].reset_slots()
+        nodenet.propagate_link_activation(sources)
+        self.fed = targets
+        self.awake |= targets
+
+        nodenet.timeout_locks()
+
+        nodenet.calculate_node_functions(activators)
+        nodenet.calculate_node_functions(self.nativemodules)
+        self.wake_changed_activators()
+
+        calculated = sorted(self.awake - set(self.nativemodules), key=self.order.get)
+        nodenet.calculate_node_functions(OrderedDict((uid, nodenet.nodes[uid]) for uid in calculated))
+
+        if nodenet.structure_version != self.version:
+            # node functions changed the nodenet, everything will be calculated in the next step
+            return
+
+        for uid in self.nativemodules:
+            self.update_active(nodenet.nodes[uid])
+        for uid in calculated:
+            self.update_active(nodenet.nodes[uid])
+        self.touched = set()
+
+        # nodes that had input need to be calculated again, to see it disappear
+        self.awake = self.fed | self.always
+
+    def wake(self, node):
+        """Calculates the given node in the next step"""
+        if node.uid in self.nodenet.nodes:
+            self.awake.add(node.uid)
+            self.update_active(node)
+
+    def wake_changed_activators(self):
+        """Calculates all nodes in the nodespaces whose activators have changed"""
+        for uid, nodespace in self.nodenet.nodespaces.items():
+            if self.activators.get(uid) != nodespace.activators:
+                self.activators[uid] = nodespace.activators.copy()
+                self.awake.update(nodespace.netentities.get('nodes', []))
+
+    def update_active(self, node):
+        if self.is_active(node):
+            self.active.add(node.uid)
+        else:
+            self.active.discard(node.uid)
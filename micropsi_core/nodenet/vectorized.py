@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+"""
+Array-backed activation engine
+
+Compiles a nodenet into flat numpy arrays (gate activations, slot activations, gate parameters and a CSR weight
+matrix from gates to slots) and performs link propagation and the standard gate function as batched array
+operations. Node types whose node functions can not be expressed as array operations (activators, scripts, pipes
+and native modules) are calculated through their regular node functions, and so are nodes that can receive sheaves
+other than the default sheaf, since the arrays only hold the default sheaf.
+
+The engine keeps the node, gate and slot objects in sync, but only writes back values that actually changed.
+"""
+
+import numpy as np
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+# node types that are calculated by the engine; all others are calculated by calling their node function
+VECTORIZED_NODETYPES = ["Concept", "Register", "Sensor", "Actor"]
+
+
+class ArrayEngine(object):
+    """Runs the activation spreading of a nodenet on flat numpy arrays.
+
+    Attributes:
+        nodenet: the nodenet that is being calculated
+        version: the structure version of the nodenet the arrays have been compiled for
+        gate_activations: the default sheaf activation of every gate in the nodenet
+        slot_activations: the default sheaf activation of every slot in the nodenet
+        touched: a set of gates whose activations have been set from outside of the engine since the last step
+    """
+
+    def __init__(self, nodenet):
+        self.nodenet = nodenet
+        self.version = None
+        self.touched = set()
+
+    def compile(self):
+        """Builds the arrays from the current node, gate, slot and link objects"""
+        nodenet = self.nodenet
+        self.gates = []
+        self.slots = []
+        self.gate_index = {}
+        self.slot_index = {}
+        self.vectorized_nodes = []
+        self.fallback_nodes = []
+        self.nativemodules = {}
+
+        for uid, node in nodenet.nodes.items():
+            for gatetype, gate in node.gates.items():
+                self.gate_index[id(gate)] = len(self.gates)
+                self.gates.append(gate)
+            for slottype, slot in node.slots.items():
+                self.slot_index[id(slot)] = len(self.slots)
+                self.slots.append(slot)
+            if node.type in VECTORIZED_NODETYPES and node.nodetype.nodefunction_definition is None \
+                    and not self.has_sheaves(node):
+                self.vectorized_nodes.append(node)
+            elif node.type not in nodenet.nodetypes:
+                self.nativemodules[uid] = node
+            elif node.type != "Activator":
+                self.fallback_nodes.append(node)
+
+        gate_count = len(self.gates)
+        self.gate_activations = np.array([gate.sheaves['default'].activation if 'default' in gate.sheaves else 0
+                                          for gate in self.gates], dtype=np.float64)
+        self.slot_activations = np.array([slot.sheaves['default'].activation if 'default' in slot.sheaves else 0
+                                          for slot in self.slots], dtype=np.float64)
+
+        # gate parameters
+        self.threshold = np.zeros(gate_count)
+        self.amplification = np.ones(gate_count)
+        self.minimum = np.zeros(gate_count)
+        self.maximum = np.zeros(gate_count)
+        self.rho = np.zeros(gate_count)
+        self.theta = np.zeros(gate_count)
+        for index, gate in enumerate(self.gates):
+            self.threshold[index] = gate.parameters['threshold']
+            self.amplification[index] = gate.parameters['amplification']
+            self.minimum[index] = gate.parameters['minimum']
+            self.maximum[index] = gate.parameters['maximum']
+            self.rho[index] = gate.parameters.get('rho', 0)
+            self.theta[index] = gate.parameters.get('theta', 0)
+
+        # the weight matrix from gates (columns) to slots (rows) in compressed sparse row format
+        rows = []
+        columns = []
+        weights = []
+        for uid, link in nodenet.links.items():
+            rows.append(self.slot_index[id(link.target_slot)])
+            columns.append(self.gate_index[id(link.source_gate)])
+            weights.append(float(link.weight))
+        rows = np.array(rows, dtype=np.int64)
+        order = np.argsort(rows, kind='mergesort')
+        self.weights_indices = np.array(columns, dtype=np.int64)[order]
+        self.weights_data = np.array(weights, dtype=np.float64)[order]
+        self.weights_indptr = np.zeros(len(self.slots) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self.slots)), out=self.weights_indptr[1:])
+        self.link_rows = np.repeat(np.arange(len(self.slots)), np.diff(self.weights_indptr))
+
+        # the gates of the vectorized nodes, and the slot that feeds their gate function
+        vectorized_gates = []
+        gate_groups = {}
+        activator_keys = {}
+        activator_index = []
+        for node in self.vectorized_nodes:
+            for gatetype, gate in node.gates.items():
+                index = self.gate_index[id(gate)]
+                vectorized_gates.append(index)
+                key = (node.parent_nodespace, gatetype)
+                if key not in activator_keys:
+                    activator_keys[key] = len(activator_keys)
+                activator_index.append(activator_keys[key])
+                gate_groups.setdefault((node.parent_nodespace, node.type, gatetype), []).append(
+                    len(vectorized_gates) - 1)
+        self.vectorized_gates = np.array(vectorized_gates, dtype=np.int64)
+        self.activator_keys = list(activator_keys.keys())
+        self.activator_index = np.array(activator_index, dtype=np.int64)
+        # the groups of gates that have a gate function; setting a gate function changes the structure version
+        self.gatefunction_groups = []
+        for (nodespace, nodetype, gatetype), positions in gate_groups.items():
+            gatefunction = nodenet.nodespaces[nodespace].get_gatefunction(nodetype, gatetype)
+            if gatefunction:
+                positions = np.array(positions, dtype=np.int64)
+                self.gatefunction_groups.append((positions, self.vectorized_gates[positions], gatefunction,
+                                                 getattr(gatefunction, 'vectorized', None)))
+
+        # map the vectorized gates to the inputs of their gate functions
+        self.input_slot = np.full(len(vectorized_gates), -1, dtype=np.int64)
+        self.sensors = []
+        self.actors = []
+        position = 0
+        for node in self.vectorized_nodes:
+            if node.type == "Sensor":
+                self.sensors.append((node, position))
+            elif node.type == "Actor":
+                self.actors.append((node, position))
+            elif 'gen' in node.slots:
+                for gatetype in node.gates:
+                    self.input_slot[position] = self.slot_index[id(node.slots['gen'])]
+                    position += 1
+                continue
+            position += len(node.gates)
+
+        self.vectorized_gate_mask = np.zeros(gate_count, dtype=bool)
+        self.vectorized_gate_mask[self.vectorized_gates] = True
+        self.touched = set()
+        self.version = nodenet.structure_version
+
+    def has_sheaves(self, node):
+        """Returns True if the node can hold sheaves other than the default sheaf: if one of its incoming links comes
+        from a gate that spreads its sheaves, or if its slots or gates still hold such sheaves"""
+        for slot in node.slots.values():
+            if len(slot.sheaves) > 1:
+                return True
+            for link in slot.incoming.values():
+                if link.source_gate.parameters['spreadsheaves'] is True:
+                    return True
+        return any(len(gate.sheaves) > 1 for gate in node.gates.values())
+
+    def propagate_link_activation(self):
+        """Calculates the slot activations as the product of the weight matrix and the gate activations"""
+        products = self.weights_data * self.gate_activations[self.weights_indices]
+        return np.bincount(self.link_rows, weights=products, minlength=len(self.slots))
+
+    def gate_function(self, inputs):
+        """The default gate function, applied to the gates of all vectorized nodes at once.
+
+        Arguments:
+            inputs: an array of input activations, one for every vectorized gate
+        """
+        nodespaces = self.nodenet.nodespaces
+        factors = np.array([nodespaces[nodespace].activators.get(gatetype, 1.0)
+                            for nodespace, gatetype in self.activator_keys], dtype=np.float64)
+        gate_factor = factors[self.activator_index] if len(factors) else np.ones(len(inputs))
+
+        activations = inputs.copy()
+        for positions, gates, gatefunction, vectorized in self.gatefunction_groups:
+            if vectorized is not None:
+                activations[positions] = vectorized(inputs[positions], self.rho[gates], self.theta[gates])
+            else:
+                activations[positions] = [gatefunction(x, r, t) for x, r, t in
+                                          zip(inputs[positions], self.rho[gates], self.theta[gates])]
+
+        gates = self.vectorized_gates
+        activations = np.where(activations * gate_factor < self.threshold[gates], 0,
+                               activations * self.amplification[gates] * gate_factor)
+        activations = np.minimum(self.maximum[gates], np.maximum(self.minimum[gates], activations))
+        activations[gate_factor == 0.0] = 0
+        return activations
+
+    def step(self, activators):
+        """Performs the link propagation and node function calculation for one step of the nodenet"""
+        nodenet = self.nodenet
+        if self.version != nodenet.structure_version:
+            self.compile()
+
+        # gates that have been set from outside since the last step
+        for gate in self.touched:
+            index = self.gate_index.get(id(gate))
+            if index is not None:
+                self.gate_activations[index] = gate.sheaves['default'].activation
+        self.touched = set()
+
+        # propagate activation
+        slot_activations = self.propagate_link_activation()
+        changed = np.flatnonzero(slot_activations != self.slot_activations)
+        self.slot_activations = slot_activations
+        for index in changed:
+            self.slots[index].sheaves['default'].activation = float(slot_activations[index])
+        self.propagate_to_fallback_nodes()
+
+        nodenet.timeout_locks()
+
+        nodenet.calculate_node_functions(activators)            # activators go first
+        nodenet.calculate_node_functions(self.nativemodules)    # then native modules, so API sees a deterministic state
+
+        if self.version != nodenet.structure_version:
+            # native modules have changed the net; the arrays are stale, so we finish with the object engine
+            everythingelse = dict((node.uid, node) for node in self.vectorized_nodes + self.fallback_nodes)
+            nodenet.calculate_node_functions(everythingelse)
+            return
+
+        for node in self.fallback_nodes:
+            node.node_function()
+
+        gate_activations = self.gate_activations.copy()
+        gate_activations[self.vectorized_gates] = self.calculate_vectorized_nodes()
+        for node in list(self.nativemodules.values()) + self.fallback_nodes:
+            for gate in node.gates.values():
+                sheaf = gate.sheaves.get('default')
+                gate_activations[self.gate_index[id(gate)]] = sheaf.activation if sheaf is not None else 0
+
+        # write back the changed gates, and the ones that have been set by node functions during this step
+        changed = set(np.flatnonzero((gate_activations != self.gate_activations) & self.vectorized_gate_mask))
+        for gate in self.touched:
+            index = self.gate_index.get(id(gate))
+            if index is not None and self.vectorized_gate_mask[index]:
+                changed.add(index)
+        self.gate_activations = gate_activations
+        for index in changed:
+            gate = self.gates[index]
+            gate.sheaves['default'].activation = float(gate_activations[index])
+        self.touched = set()
+
+    def calculate_vectorized_nodes(self):
+        """Calculates the node functions of all vectorized nodes, and returns their new gate activations"""
+        nodenet = self.nodenet
+        inputs = np.zeros(len(self.vectorized_gates), dtype=np.float64)
+        has_input = self.input_slot >= 0
+        inputs[has_input] = self.slot_activations[self.input_slot[has_input]]
+
+        # concepts and registers take over the activation of their gen slot
+        for node in self.vectorized_nodes:
+            if node.type in ("Concept", "Register"):
+                activation = float(self.slot_activations[self.slot_index[id(node.slots['gen'])]])
+                if node.sheaves['default'].activation != activation:
+                    self.set_node_activation(node, activation)
+
+        for node, position in self.sensors:
+            value = nodenet.world.get_datasource(nodenet.uid, node.parameters.get('datasource'))
+            self.set_node_activation(node, value)
+            inputs[position] = value or 0
+            has_input[position] = True
+
+        for node, position in self.actors:
+            if not nodenet.world:
+                continue
+            activation_to_set = node.get_slot("gen").activation
+            nodenet.world.set_datatarget(nodenet.uid, node.parameters.get('datatarget'), activation_to_set)
+            feedback = nodenet.world.get_datatarget_feedback(nodenet.uid, node.parameters.get('datatarget'))
+            if feedback is not None:
+                inputs[position] = feedback
+                has_input[position] = True
+
+        activations = self.gate_function(inputs)
+        # the object engine resets all gates before the node functions; the actor node function leaves them at 0
+        # without a world or feedback, so these rows do not keep their previous activation either
+        activations[~has_input] = 0
+        return activations
+
+    def set_node_activation(self, node, activation):
+        """Sets the default sheaf activation of a vectorized node, without touching its gates"""
+        if activation is None:
+            activation = 0
+        node.sheaves['default'].activation = float(activation)
+
+    def propagate_to_fallback_nodes(self):
+        """Propagates the sheaves of incoming links into the slots of the nodes that are not vectorized,
+        since their node functions may depend on sheaves other than the default sheaf"""
+        for node in self.fallback_nodes + list(self.nativemodules.values()):
+            node.reset_slots()
+            incoming = [link for slot in node.slots.values() for link in slot.incoming.values()]
+            for link in incoming:
+                gate = link.source_gate
+                if gate.parameters['spreadsheaves'] is True:
+                    for sheaf_id, sheaf in gate.sheaves.items():
+                        for slot in node.slots.values():
+                            if sheaf_id not in slot.sheaves:
+                                slot.add_sheaf(sheaf_id, sheaf.name)
+            for link in incoming:
+                self.nodenet.propagate_sheaves(link.source_gate, link)
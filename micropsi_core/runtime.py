@@ -13,20 +13,26 @@ __author__ = 'joscha'
 __date__ = '10.05.12'
 
 from configuration import RESOURCE_PATH, SERVER_SETTINGS_PATH, LOGGING
+from configuration import AUTOSAVE_INTERVAL, AUTOSAVE_RETENTION
 
 from micropsi_core.nodenet.node import Node, Nodetype, STANDARD_NODETYPES
-from micropsi_core.nodenet.nodenet import Nodenet
+from micropsi_core.nodenet.nodenet import Nodenet, EXPORT_SECTIONS
+from micropsi_core.nodenet import snapshot, jsonstream
 from micropsi_core.nodenet.nodespace import Nodespace
 
 from micropsi_core.nodenet import node_alignment
 from micropsi_core import config
 from micropsi_core.tools import Bunch
+import io
 import os
+import hashlib
+import importlib
+import shutil
 import sys
 from micropsi_core import tools
 import json
 import warnings
-from threading import Thread
+from threading import Thread, Condition
 from datetime import datetime, timedelta
 import time
 import signal
@@ -35,7 +41,11 @@ import logging
 
 from .micropsi_logger import MicropsiLogger
 
+NODENETRUNNER_MODES = ["shared", "workers"]
+
 NODENET_DIRECTORY = "nodenets"
+AUTOSAVE_DIRECTORY = "autosave"
+NODENET_FILE_EXTENSIONS = {"json": ".json", "snapshot": ".snapshot"}
 WORLD_DIRECTORY = "worlds"
 
 configs = config.ConfigurationManager(SERVER_SETTINGS_PATH)
@@ -44,21 +54,32 @@ worlds = {}
 nodenets = {}
 nodetypes = STANDARD_NODETYPES
 native_modules = {}
+# the md5 hash of the nodefunctions module of the user, when it was last imported
+nodefunctions_signature = None
 runner = {
-    'nodenet': {'timestep': 1000, 'runner': None},
-    'world': {'timestep': 5000, 'runner': None}
+    'nodenet': {'timestep': 1000, 'runner': None, 'workers': {}},
+    'world': {'timestep': 5000, 'runner': None},
+    'autosave': {'runner': None, 'next': {}, 'stats': {}}
 }
 
 signal_handler_registry = []
 
+# notified whenever a nodenet or a world has been stepped, so clients waiting for updates can be woken up
+step_condition = Condition()
+
 logger = MicropsiLogger({
     'system': LOGGING['level_system'],
     'world': LOGGING['level_world'],
     'nodenet': LOGGING['level_nodenet']
 })
 
-def add_signal_handler(handler):
-    signal_handler_registry.append(handler)
+def add_signal_handler(handler, first=False):
+    """Registers a function that is called with the signal and frame when the process is terminated. Handlers
+    registered with first=True are called before the others, e.g. to stop serving requests before the runners stop."""
+    if first:
+        signal_handler_registry.insert(0, handler)
+    else:
+        signal_handler_registry.append(handler)
 
 
 def signal_handler(signal, frame):
@@ -68,26 +89,117 @@ def signal_handler(signal, frame):
     sys.exit(0)
 
 
+def notify_step():
+    """Wakes up everybody who waits for the next step of a nodenet or world"""
+    with step_condition:
+        step_condition.notify_all()
+
+
+def wait_for_step(timeout):
+    """Waits until a nodenet or world has been stepped, or the timeout (in seconds) has passed"""
+    with step_condition:
+        step_condition.wait(timeout)
+
+
 def nodenetrunner():
     """Looping thread to simulate node nets continously"""
     while runner['nodenet']['running']:
+        if configs['nodenetrunner_mode'] == "workers":
+            start_nodenet_workers()
+            time.sleep(0.1)
+            continue
         if configs['nodenetrunner_timestep'] > 1000:
             step = timedelta(seconds=configs['nodenetrunner_timestep'] / 1000)
         else:
             step = timedelta(milliseconds=configs['nodenetrunner_timestep'])
         start = datetime.now()
-        for uid in nodenets:
-            if nodenets[uid].is_active:
+        for uid in list(nodenets.keys()):
+            if uid in nodenets and nodenets[uid].is_active and not _has_nodenet_worker(uid):
                 try:
                     nodenets[uid].step()
                 except:
                     e = sys.exc_info()[1]
                     logging.getLogger("nodenet").error("Exception in NodenetRunner: %s", str(e))
+        notify_step()
         left = step - (datetime.now() - start)
         if left.total_seconds() > 0:
             time.sleep(left.total_seconds())
 
 
+class NodenetWorker(Thread):
+    """Thread that simulates a single nodenet continuously, using the timestep of the nodenet.
+
+    The workers run the nodenets concurrently, each at its own speed, but not in parallel: they are threads of the
+    server process and share the GIL, so all nodenets are still calculated on one core.
+
+    Attributes:
+        nodenet_uid: the uid of the simulated nodenet
+        steps: the number of steps calculated by this worker
+        duration: the total time spent in these steps, in seconds
+        last_duration: the time spent in the last step, in seconds
+        overruns: the number of steps that took longer than the timestep
+        overrun_time: the total time by which these steps exceeded the timestep, in seconds
+    """
+
+    def __init__(self, nodenet_uid):
+        Thread.__init__(self, name="NodenetWorker %s" % nodenet_uid)
+        self.daemon = True
+        self.nodenet_uid = nodenet_uid
+        self.steps = 0
+        self.duration = 0
+        self.last_duration = 0
+        self.overruns = 0
+        self.overrun_time = 0
+
+    def is_needed(self):
+        nodenet = nodenets.get(self.nodenet_uid)
+        return runner['nodenet']['running'] and configs['nodenetrunner_mode'] == "workers" and \
+            nodenet is not None and nodenet.is_active
+
+    def run(self):
+        while self.is_needed():
+            timestep = get_nodenetrunner_timestep(self.nodenet_uid) / 1000
+            start = time.perf_counter()
+            try:
+                nodenets[self.nodenet_uid].step()
+            except:
+                e = sys.exc_info()[1]
+                logging.getLogger("nodenet").error("Exception in NodenetWorker: %s", str(e))
+            notify_step()
+            duration = time.perf_counter() - start
+            self.steps += 1
+            self.duration += duration
+            self.last_duration = duration
+            if duration > timestep:
+                self.overruns += 1
+                self.overrun_time += duration - timestep
+            else:
+                time.sleep(timestep - duration)
+
+    def get_stats(self):
+        return {
+            'steps': self.steps,
+            'mean_duration': self.duration / self.steps if self.steps else 0,
+            'last_duration': self.last_duration,
+            'overruns': self.overruns,
+            'overrun_time': self.overrun_time,
+            'timestep': get_nodenetrunner_timestep(self.nodenet_uid)
+        }
+
+
+def _has_nodenet_worker(nodenet_uid):
+    worker = runner['nodenet']['workers'].get(nodenet_uid)
+    return worker is not None and worker.is_alive()
+
+
+def start_nodenet_workers():
+    """Starts a worker for every active nodenet that does not have a running one"""
+    for uid in list(nodenets.keys()):
+        if uid in nodenets and nodenets[uid].is_active and not _has_nodenet_worker(uid):
+            runner['nodenet']['workers'][uid] = NodenetWorker(uid)
+            runner['nodenet']['workers'][uid].start()
+
+
 def worldrunner():
     """Looping thread to simulate worlds continously"""
     while runner['world']['running']:
@@ -103,16 +215,54 @@ def worldrunner():
                 except:
                     e = sys.exc_info()[1]
                     logging.getLogger("world").error("Exception in WorldRunner: %s", str(e))
+        notify_step()
         left = step - (datetime.now() - start)
         if left.total_seconds() > 0:
             time.sleep(left.total_seconds())
 
 
+def autosaver():
+    """Looping thread that regularly saves a copy of every loaded nodenet that has changed since its last autosave"""
+    error = None
+    while runner['autosave']['running']:
+        time.sleep(0.5)
+        try:
+            interval = get_autosave_setting('autosave_interval')
+            get_autosave_setting('autosave_retention')
+            error = None
+        except ValueError as err:
+            if str(err) != error:
+                error = str(err)
+                logging.getLogger("system").error("Autosaving disabled: %s", error)
+            interval = 0
+        if not interval:
+            runner['autosave']['next'] = {}
+            continue
+        now = time.time()
+        for uid in list(nodenets.keys()):
+            nodenet = nodenets.get(uid)
+            if nodenet is None:
+                continue
+            if uid not in runner['autosave']['next']:
+                runner['autosave']['next'][uid] = now + interval
+            if now >= runner['autosave']['next'][uid] and changed_since_autosave(uid):
+                runner['autosave']['next'][uid] = now + interval
+                try:
+                    autosave_nodenet(uid)
+                except:
+                    e = sys.exc_info()[1]
+                    logging.getLogger("nodenet").error("Exception in Autosaver: %s", str(e))
+
+
 def kill_runners(signal, frame):
     runner['world']['running'] = False
     runner['nodenet']['running'] = False
+    runner['autosave']['running'] = False
     runner['world']['runner'].join()
     runner['nodenet']['runner'].join()
+    runner['autosave']['runner'].join()
+    for worker in list(runner['nodenet']['workers'].values()):
+        worker.join()
 
 
 def _get_world_uid_for_nodenet_uid(nodenet_uid):
@@ -199,6 +349,16 @@ def get_nodenet(nodenet_uid):
     return nodenets[nodenet_uid]
 
 
+def get_nodenet_filename(nodenet_uid, file_format=None):
+    """Returns the path of the file of the given nodenet. Without a file format, the existing file is returned"""
+    if file_format is None:
+        for file_format in ["snapshot", "json"]:
+            filename = get_nodenet_filename(nodenet_uid, file_format)
+            if os.path.isfile(filename):
+                return filename
+    return os.path.join(RESOURCE_PATH, NODENET_DIRECTORY, nodenet_uid + NODENET_FILE_EXTENSIONS[file_format])
+
+
 def load_nodenet(nodenet_uid):
     """ Load the nodenet with the given uid into memeory
         TODO: how do we know in which world we want to load the nodenet?
@@ -221,7 +381,7 @@ def load_nodenet(nodenet_uid):
                     world = worlds.get(data.world)
                     worldadapter = data.get('worldadapter')
             nodenets[nodenet_uid] = Nodenet(
-                os.path.join(RESOURCE_PATH, NODENET_DIRECTORY,  nodenet_uid + '.json'),
+                get_nodenet_filename(nodenet_uid),
                 name=data.name, worldadapter=worldadapter,
                 world=world, owner=data.owner, uid=data.uid,
                 nodetypes=nodetypes, native_modules=native_modules)
@@ -238,6 +398,7 @@ def get_nodenet_data(nodenet_uid, **coordinates):
     """ returns the current state of the nodenet """
     nodenet = get_nodenet(nodenet_uid)
     with nodenet.netlock:
+        nodenet.update_state()
         data = nodenet.state.copy()
     data.update(get_nodenet_area(nodenet_uid, **coordinates))
     data.update({
@@ -293,6 +454,7 @@ def new_nodenet(nodenet_name, worldadapter, template=None, owner="", world_uid=N
     """
     if template is not None and template in nodenet_data:
         if template in nodenets:
+            nodenets[template].update_state()
             data = nodenets[template].state.copy()
         else:
             data = nodenet_data[template].copy()
@@ -334,13 +496,21 @@ def delete_nodenet(nodenet_uid):
     Simple unloading is maintained automatically when a nodenet is suspended and another one is accessed.
     """
     unload_nodenet(nodenet_uid)
-    filename = os.path.join(RESOURCE_PATH, NODENET_DIRECTORY, nodenet_uid + '.json')
-    os.remove(filename)
+    for file_format in NODENET_FILE_EXTENSIONS:
+        filename = get_nodenet_filename(nodenet_uid, file_format)
+        if os.path.isfile(filename):
+            os.remove(filename)
+    autosave_directory = os.path.join(RESOURCE_PATH, AUTOSAVE_DIRECTORY, nodenet_uid)
+    if os.path.isdir(autosave_directory):
+        shutil.rmtree(autosave_directory)
+    runner['autosave']['stats'].pop(nodenet_uid, None)
+    runner['autosave']['next'].pop(nodenet_uid, None)
     del nodenet_data[nodenet_uid]
     return True
 
 
-def set_nodenet_properties(nodenet_uid, nodenet_name=None, worldadapter=None, world_uid=None, owner=None):
+def set_nodenet_properties(nodenet_uid, nodenet_name=None, worldadapter=None, world_uid=None, owner=None, engine=None,
+                           file_format=None):
     """Sets the supplied parameters (and only those) for the nodenet with the given uid."""
     nodenet = nodenets[nodenet_uid]
     if nodenet.world and nodenet.world.uid != world_uid:
@@ -357,6 +527,10 @@ def set_nodenet_properties(nodenet_uid, nodenet_name=None, worldadapter=None, wo
         nodenet.name = nodenet_name
     if owner:
         nodenet.owner = owner
+    if engine:
+        nodenet.engine = engine
+    if file_format:
+        nodenet.file_format = file_format
     nodenet_data[nodenet_uid] = Bunch(**nodenet.state)
     return True
 
@@ -367,22 +541,55 @@ def start_nodenetrunner(nodenet_uid):
     return True
 
 
-def set_nodenetrunner_timestep(timestep):
+def set_nodenetrunner_timestep(timestep, nodenet_uid=None):
     """Sets the speed of the nodenet simulation in ms.
 
     Argument:
         timestep: sets the simulation speed.
+        nodenet_uid (optional): if given, sets the speed of this nodenet only, which is used if the runner
+            simulates every nodenet in its own worker. A timestep of None resets it to the speed of the runner.
     """
+    if nodenet_uid is not None:
+        nodenets[nodenet_uid].runner_timestep = timestep
+        return True
     configs['nodenetrunner_timestep'] = timestep
     runner['nodenet']['timestep'] = timestep
     return True
 
 
-def get_nodenetrunner_timestep():
-    """Returns the speed that has been configured for the nodenet runner (in ms)."""
+def get_nodenetrunner_timestep(nodenet_uid=None):
+    """Returns the speed that has been configured for the nodenet runner, or for the given nodenet (in ms)."""
+    if nodenet_uid is not None and nodenet_uid in nodenets and nodenets[nodenet_uid].runner_timestep is not None:
+        return nodenets[nodenet_uid].runner_timestep
     return configs['nodenetrunner_timestep']
 
 
+def set_nodenetrunner_mode(mode):
+    """Sets how the runner simulates the active nodenets:
+        "shared": one after another, in a single thread, sharing the runner timestep
+        "workers": each in its own worker thread, with the timestep of the nodenet. A slow nodenet no longer delays
+            the others, but the threads share one core (see NodenetWorker)
+    """
+    if mode not in NODENETRUNNER_MODES:
+        raise ValueError("Unknown nodenet runner mode: %s" % mode)
+    configs['nodenetrunner_mode'] = mode
+    return True
+
+
+def get_nodenetrunner_mode():
+    """Returns the mode of the nodenet runner, either "shared" or "workers"."""
+    return configs['nodenetrunner_mode']
+
+
+def get_nodenetrunner_stats(nodenet_uid):
+    """Returns the number of steps, the mean and last step duration, and the number of steps that took longer than
+    the timestep (and by how long, in total) from the worker of the given nodenet, or None if it has no worker."""
+    worker = runner['nodenet']['workers'].get(nodenet_uid)
+    if worker is None:
+        return None
+    return worker.get_stats()
+
+
 def get_is_nodenet_running(nodenet_uid):
     """Returns True if a nodenet runner is active for the given nodenet, False otherwise."""
     return nodenets[nodenet_uid].is_active
@@ -405,9 +612,57 @@ def step_nodenet(nodenet_uid, nodespace=None):
     #     nodenets[nodenet_uid].step_nodespace(nodespace)
     # else:
     nodenets[nodenet_uid].step()
+    notify_step()
     return nodenets[nodenet_uid].current_step
 
 
+def set_step_profiling(nodenet_uid, enabled=True):
+    """Starts or stops recording the timing of the steps of the given nodenet. Starting discards earlier data."""
+    nodenets[nodenet_uid].set_profiling(enabled)
+    return True
+
+
+def get_step_profile(nodenet_uid, top=10):
+    """Returns the time spent in the phases of the recorded steps, in the node functions of each node type,
+    and in the given number of slowest native modules. Returns None if profiling is not enabled."""
+    nodenet = nodenets[nodenet_uid]
+    if nodenet.profiler is None:
+        return None
+    with nodenet.netlock:
+        return nodenet.profiler.get_profile(top)
+
+
+def set_native_module_sandbox(nodenet_uid, isolated=None, time_budget=None, max_overruns=None):
+    """Configures how the native modules of the given nodenet are called.
+
+    Arguments:
+        isolated (optional): if True, native module calls are interrupted when they exceed the time budget
+        time_budget (optional): the time a single native module call may take in seconds, 0 removes the budget
+        max_overruns (optional): the number of calls in a row that may exceed the budget before the native module
+            type is disabled
+    """
+    nodenet = nodenets[nodenet_uid]
+    with nodenet.netlock:
+        return nodenet.sandbox.configure(isolated, time_budget, max_overruns)
+
+
+def get_native_module_stats(nodenet_uid):
+    """Returns the sandbox settings of the given nodenet, and for every native module type that has been called, the
+    number of calls, the total wall and CPU time, the mean and longest call, the number of overruns, timeouts and
+    errors, and whether it has been disabled. The most expensive native modules come first."""
+    nodenet = nodenets[nodenet_uid]
+    with nodenet.netlock:
+        return nodenet.sandbox.get_report()
+
+
+def enable_native_module(nodenet_uid, nodetype):
+    """Enables a native module type that has been disabled because it exceeded its time budget too often."""
+    nodenet = nodenets[nodenet_uid]
+    with nodenet.netlock:
+        nodenet.sandbox.enable(nodetype)
+    return True
+
+
 def revert_nodenet(nodenet_uid):
     """Returns the nodenet to the last saved state."""
     unload_nodenet(nodenet_uid)
@@ -415,55 +670,221 @@ def revert_nodenet(nodenet_uid):
     return True
 
 
+def _write_nodenet_file(filename, state, file_format):
+    """Writes the nodenet state to a temporary file and renames it, so the file is never left half written.
+    Returns the number of bytes written."""
+    if file_format == "snapshot":
+        data = snapshot.dumps(state)
+    else:
+        data = json.dumps(state, sort_keys=True, indent=4).encode('utf-8')
+    with open(filename + '.tmp', 'wb') as fp:
+        fp.write(data)
+    os.replace(filename + '.tmp', filename)
+    return len(data)
+
+
 def save_nodenet(nodenet_uid):
-    """Stores the nodenet on the server (but keeps it open)."""
+    """Stores the nodenet on the server (but keeps it open), in the file format of the nodenet."""
     nodenet = nodenets[nodenet_uid]
-    with open(os.path.join(RESOURCE_PATH, NODENET_DIRECTORY, nodenet_uid + '.json'), 'w+') as fp:
-        fp.write(json.dumps(nodenet.state, sort_keys=True, indent=4))
-    fp.close()
+    with nodenet.netlock:
+        state = nodenet.copy_state()
+    filename = get_nodenet_filename(nodenet_uid, nodenet.file_format)
+    _write_nodenet_file(filename, state, nodenet.file_format)
+    _remove_other_nodenet_files(nodenet_uid, nodenet.file_format)
+    nodenet.filename = filename
+    return True
+
+
+def _remove_other_nodenet_files(nodenet_uid, file_format):
+    """Removes the files of the nodenet in all but the given file format, so they can not be loaded instead"""
+    for other_format in NODENET_FILE_EXTENSIONS:
+        if other_format != file_format and os.path.isfile(get_nodenet_filename(nodenet_uid, other_format)):
+            os.remove(get_nodenet_filename(nodenet_uid, other_format))
+
+
+def _get_nodenet_version(nodenet):
+    """Returns the step, the structure version and the journal version of the nodenet, which change whenever the
+    nodenet is stepped or edited"""
+    return nodenet.current_step, nodenet.structure_version, nodenet.journal.version
+
+
+def changed_since_autosave(nodenet_uid):
+    """Tells whether the nodenet has been stepped or edited since its last autosave"""
+    stats = runner['autosave']['stats'].get(nodenet_uid)
+    return stats is None or stats['version'] != _get_nodenet_version(nodenets[nodenet_uid])
+
+
+def autosave_nodenet(nodenet_uid):
+    """Saves a copy of the nodenet to its autosave directory, and removes the oldest autosaves beyond the
+    configured retention count. The netlock is only held while the state is copied.
+
+    Returns the statistics of the autosaves of this nodenet (see get_autosave_stats)."""
+    nodenet = nodenets[nodenet_uid]
+    retention = get_autosave_setting('autosave_retention')
+    start = time.perf_counter()
+    with nodenet.netlock:
+        state = nodenet.copy_state()
+        step = nodenet.current_step
+        version = _get_nodenet_version(nodenet)
+    lock_duration = time.perf_counter() - start
+
+    directory = os.path.join(RESOURCE_PATH, AUTOSAVE_DIRECTORY, nodenet_uid)
+    tools.mkdir(directory)
+    filename = os.path.join(directory, "%s-step%d%s" % (datetime.now().strftime("%Y%m%d-%H%M%S-%f"), step,
+                                                          NODENET_FILE_EXTENSIONS[nodenet.file_format]))
+    size = _write_nodenet_file(filename, state, nodenet.file_format)
+    duration = time.perf_counter() - start
+
+    autosaves = sorted(name for name in os.listdir(directory) if not name.endswith('.tmp'))
+    for name in autosaves[:-retention]:
+        os.remove(os.path.join(directory, name))
+
+    stats = runner['autosave']['stats'].get(nodenet_uid, {'saves': 0, 'total_bytes': 0})
+    stats.update({
+        'saves': stats['saves'] + 1,
+        'step': step,
+        'version': version,
+        'filename': filename,
+        'time': datetime.now().isoformat(),
+        'duration': duration,
+        'lock_duration': lock_duration,
+        'bytes': size,
+        'total_bytes': stats['total_bytes'] + size
+    })
+    runner['autosave']['stats'][nodenet_uid] = stats
+    return stats
+
+
+def set_autosave(interval=None, retention=None):
+    """Configures the autosaver.
+
+    Arguments:
+        interval (optional): the time between two autosaves of a nodenet in seconds, 0 disables autosaving
+        retention (optional): the number of autosaves that are kept for every nodenet
+    """
+    if interval is not None:
+        if interval < 0:
+            raise ValueError("The autosave interval can not be negative")
+        configs['autosave_interval'] = interval
+    if retention is not None:
+        if retention < 1:
+            raise ValueError("At least one autosave needs to be kept")
+        configs['autosave_retention'] = retention
     return True
 
 
+def get_autosave_setting(key):
+    """Returns the autosave_interval or autosave_retention set with set_autosave, or the default from the
+    configuration. Raises ValueError if the value is not valid, e.g. in config.ini."""
+    if key in configs:
+        value = configs[key]
+    else:
+        value = {'autosave_interval': AUTOSAVE_INTERVAL, 'autosave_retention': AUTOSAVE_RETENTION}[key]
+    if key == 'autosave_interval' and value < 0:
+        raise ValueError("autosave_interval can not be negative, but is %s" % value)
+    if key == 'autosave_retention' and value < 1:
+        raise ValueError("autosave_retention needs to be at least 1, but is %s" % value)
+    return value
+
+
+def get_autosave_stats(nodenet_uid):
+    """Returns the number of autosaves of the given nodenet, the total bytes written, and the step, version (see
+    changed_since_autosave), file, time, duration, time spent holding the netlock and size of the last autosave, or None
+    if it has not been autosaved."""
+    return runner['autosave']['stats'].get(nodenet_uid)
+
+
 def export_nodenet(nodenet_uid):
     """Exports the nodenet state to the user, so it can be viewed and exchanged.
 
     Returns a string that contains the nodenet state in JSON format.
     """
-    return json.dumps(nodenets[nodenet_uid].state, sort_keys=True, indent=4)
+    nodenet = nodenets[nodenet_uid]
+    with nodenet.netlock:
+        nodenet.update_state()
+        return json.dumps(nodenet.state, sort_keys=True, indent=4)
+
+
+def export_nodenet_stream(nodenet_uid, batch_size=1000):
+    """Exports the nodenet state like export_nodenet, but yields the JSON incrementally: first the properties of
+    the nodenet, then nodespaces, nodes, links and monitors in batches of the given size.
+    """
+    return jsonstream.dump_members(nodenets[nodenet_uid].export_data(batch_size), batch_size, encoded=True)
+
+
+def _get_json_stream(data):
+    """Returns a file object for the given JSON string, bytes or file object"""
+    if hasattr(data, 'read'):
+        return data
+    if isinstance(data, bytes):
+        return io.BytesIO(data)
+    return io.StringIO(data)
 
 
 def import_nodenet(string, owner=None):
     """Imports the nodenet state, instantiates the nodenet.
 
+    The data is parsed and written to the nodenet file incrementally, so large nodenets can be imported from
+    a file object without reading them into memory at once.
+
     Arguments:
         nodenet_uid: the uid of the nodenet (may overwrite existing nodenet)
-        string: a string that contains the nodenet state in JSON format.
+        string: a string, bytes or a file object that contains the nodenet state in JSON format.
     """
     global nodenet_data
-    import_data = json.loads(string)
-    if 'uid' not in import_data:
-        import_data['uid'] = tools.generate_uid()
-    if 'owner':
-        import_data['owner'] = owner
+    info = {}
+
+    def members():
+        for section, key, value in jsonstream.iterate_members(_get_json_stream(string), EXPORT_SECTIONS):
+            if section is None and key in ['uid', 'owner']:
+                info[key] = value
+                continue
+            if section is None and not isinstance(value, (dict, list)):
+                info[key] = value
+            yield section, key, value
+        # uid and owner are only known at the end
+        info['uid'] = info.get('uid') or tools.generate_uid()
+        info['owner'] = owner
+        yield None, 'uid', info['uid']
+        yield None, 'owner', owner
+
+    directory = os.path.join(RESOURCE_PATH, NODENET_DIRECTORY)
+    partial_filename = os.path.join(directory, "import-%s.part" % tools.generate_uid())
+    try:
+        with open(partial_filename, 'w') as fp:
+            jsonstream.write_members(fp, members())
+    except ValueError:
+        os.remove(partial_filename)
+        raise
     # assert import_data['world'] in worlds
-    filename = os.path.join(RESOURCE_PATH, NODENET_DIRECTORY, import_data['uid'] + '.json')
-    with open(filename, 'w+') as fp:
-        fp.write(json.dumps(import_data))
-    fp.close()
-    nodenet_data[import_data['uid']] = parse_definition(import_data, filename)
+    filename = get_nodenet_filename(info['uid'], "json")
+    os.rename(partial_filename, filename)
+    # a snapshot of an existing nodenet with this uid would be loaded instead of the imported file
+    _remove_other_nodenet_files(info['uid'], "json")
+    nodenet_data[info['uid']] = parse_definition(info, filename)
     return True
 
 
 def merge_nodenet(nodenet_uid, string):
     """Merges the nodenet data with an existing nodenet, instantiates the nodenet.
 
+    The data is parsed incrementally into new sections, which replace those of the nodenet state at once.
+
     Arguments:
         nodenet_uid: the uid of the existing nodenet (may overwrite existing nodenet)
-        string: a string that contains the nodenet data that is to be merged in JSON format.
+        string: a string, bytes or a file object that contains the nodenet data that is to be merged in JSON format.
     """
     nodenet = nodenets[nodenet_uid]
-    data = json.loads(string)
-    nodenet.merge_data(data)
+    data = {}
+    for section, key, value in jsonstream.iterate_members(_get_json_stream(string), EXPORT_SECTIONS):
+        if section is None:
+            data[key] = value
+        elif key is None:
+            data[section] = {}
+        else:
+            data[section][key] = value
+    with nodenet.netlock:
+        nodenet.merge_data(data)
     save_nodenet(nodenet_uid)
     unload_nodenet(nodenet_uid)
     load_nodenet(nodenet_uid)
@@ -537,6 +958,25 @@ def get_nodespace(nodenet_uid, nodespace, step, **coordinates):
     return data
 
 
+def get_nodespace_changes(nodenet_uid, nodespace, since_step, **coordinates):
+    """Returns the nodes and links of the nodespace that have changed since the given step, for UI purposes.
+    If the changes since that step are no longer in the journal of the nodenet, the whole area is returned, like
+    by get_nodenet_area. The key "full" tells which of both has been returned."""
+    nodenet = nodenets[nodenet_uid]
+    if nodespace not in nodenet.nodespaces:
+        nodespace = "Root"
+    with nodenet.netlock:
+        data = nodenet.get_nodespace_changes(nodespace, since_step, **coordinates)
+    if data is None:
+        data = get_nodenet_area(nodenet_uid, nodespace, **coordinates)
+        data['full'] = True
+    else:
+        data['full'] = False
+        data['nodespace'] = nodespace
+    data.update({'current_step': nodenet.current_step, 'is_active': nodenet.is_active})
+    return data
+
+
 def get_node(nodenet_uid, node_uid):
     """Returns a dictionary with all node parameters, if node exists, or None if it does not. The dict is
     structured as follows:
@@ -584,10 +1024,33 @@ def add_node(nodenet_uid, type, pos, nodespace="Root", state=None, uid=None, nam
     else:
         node = Node(nodenet, nodespace, pos, name=name, type=type, uid=uid, parameters=parameters)
         uid = node.uid
-        nodenet.update_node_positions()
     return True, uid
 
 
+def add_nodes(nodenet_uid, nodes):
+    """Creates many nodes at once, holding the netlock once for the whole batch.
+
+    Arguments:
+        nodenet_uid: uid of the nodenet
+        nodes: a list of dicts with the arguments of add_node (type, pos and optionally nodespace, state, uid, name
+            and parameters). Nodespaces cannot be created in a batch.
+
+    Returns:
+        True and the list of the new node uids. If any of the nodes is invalid, none is created.
+    """
+    nodenet = get_nodenet(nodenet_uid)
+    data = [{
+        'type': node['type'],
+        'position': node['pos'],
+        'parent_nodespace': node.get('nodespace', "Root"),
+        'state': node.get('state'),
+        'uid': node.get('uid'),
+        'name': node.get('name', ""),
+        'parameters': node.get('parameters')} for node in nodes]
+    with nodenet.netlock:
+        return True, [node.uid for node in nodenet.create_nodes(data)]
+
+
 def set_node_position(nodenet_uid, node_uid, pos):
     """Positions the specified node at the given coordinates."""
     nodenet = nodenets[nodenet_uid]
@@ -595,7 +1058,6 @@ def set_node_position(nodenet_uid, node_uid, pos):
         nodenet.nodes[node_uid].position = pos
     elif node_uid in nodenet.nodespaces:
         nodenet.nodespaces[node_uid].position = pos
-    nodenet.update_node_positions()
     return True
 
 
@@ -630,6 +1092,14 @@ def delete_node(nodenet_uid, node_uid):
     return True
 
 
+def delete_nodes(nodenet_uid, node_uids):
+    """Removes many nodes at once, holding the netlock once for the whole batch"""
+    nodenet = nodenets[nodenet_uid]
+    with nodenet.netlock:
+        nodenet.delete_nodes(node_uids)
+    return True
+
+
 def get_available_node_types(nodenet_uid=None):
     """Returns a list of available node types. (Including native modules.)"""
     all_nodetypes = native_modules.copy()
@@ -750,7 +1220,7 @@ def bind_datasource_to_sensor(nodenet_uid, sensor_uid, datasource):
     """Associates the datasource type to the sensor node with the given uid."""
     node = nodenets[nodenet_uid].nodes[sensor_uid]
     if node.type == "Sensor":
-        node.parameters.update({'datasource': datasource})
+        node.set_parameter('datasource', datasource)
         return True
     return False
 
@@ -759,7 +1229,7 @@ def bind_datatarget_to_actor(nodenet_uid, actor_uid, datatarget):
     """Associates the datatarget type to the actor node with the given uid."""
     node = nodenets[nodenet_uid].nodes[actor_uid]
     if node.type == "Actor":
-        node.parameters.update({'datatarget': datatarget})
+        node.set_parameter('datatarget', datatarget)
         return True
     return False
 
@@ -786,6 +1256,22 @@ def add_link(nodenet_uid, source_node_uid, gate_type, target_node_uid, slot_type
     return True
 
 
+def add_links(nodenet_uid, links):
+    """Creates or updates many links at once, holding the netlock once for the whole batch.
+
+    Arguments:
+        nodenet_uid: uid of the nodenet
+        links: a list of dicts with the arguments of add_link (source_node_uid, gate_type, target_node_uid,
+            slot_type and optionally weight, certainty and uid)
+
+    Returns:
+        True and the list of the link uids. If any of the links is invalid, none is created.
+    """
+    nodenet = nodenets[nodenet_uid]
+    with nodenet.netlock:
+        return True, nodenet.create_links(links)
+
+
 def set_link_weight(nodenet_uid, link_uid, weight, certainty=1):
     """Set weight of the given link."""
     nodenet = nodenets[nodenet_uid]
@@ -815,12 +1301,17 @@ def delete_link(nodenet_uid, link_uid):
     return nodenet.delete_link(link_uid)
 
 
+def delete_links(nodenet_uid, link_uids):
+    """Deletes many links at once, holding the netlock once for the whole batch"""
+    nodenet = nodenets[nodenet_uid]
+    with nodenet.netlock:
+        nodenet.delete_links(link_uids)
+    return True
+
+
 def align_nodes(nodenet_uid, nodespace):
     """Perform auto-alignment of nodes in the current nodespace"""
-    result = node_alignment.align(nodenets[nodenet_uid], nodespace)
-    if result:
-        nodenets[nodenet_uid].update_node_positions()
-    return result
+    return node_alignment.align(nodenets[nodenet_uid], nodespace)
 
 # --- end of API
 
@@ -836,9 +1327,13 @@ def crawl_definition_files(path, type="definition"):
         for definition_file_name in file_names:
             try:
                 filename = os.path.join(user_directory_name, definition_file_name)
-                with open(filename) as file:
-                    data = parse_definition(json.load(file), filename)
-                    result[data.uid] = data
+                with open(filename, 'rb') as file:
+                    content = file.read()
+                if snapshot.is_snapshot(content):
+                    data = parse_definition(snapshot.loads_info(content), filename)
+                else:
+                    data = parse_definition(json.loads(content.decode('utf-8')), filename)
+                result[data.uid] = data
             except ValueError:
                 warnings.warn("Invalid %s data in file '%s'" % (type, definition_file_name))
             except IOError:
@@ -921,14 +1416,41 @@ def load_user_files(do_reload=False):
     return native_modules
 
 
+def reload_nodefunctions_module():
+    """Imports the user's nodefunctions module again if its source has changed since it was last imported.
+    Returns True if the module has been (re)imported."""
+    global nodefunctions_signature
+    path = os.path.join(RESOURCE_PATH, 'nodefunctions.py')
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as fp:
+        signature = hashlib.md5(fp.read()).hexdigest()
+    module = sys.modules.get('nodefunctions')
+    if module is not None and signature == nodefunctions_signature:
+        return False
+    importlib.invalidate_caches()
+    if module is None:
+        importlib.import_module('nodefunctions')
+    else:
+        importlib.reload(module)
+    nodefunctions_signature = signature
+    return True
+
+
 def reload_native_modules(nodenet_uid=None):
+    """Reloads the native module definitions and the user's node functions, and applies them to the given nodenet,
+    or to all loaded nodenets. Only the nodes of native modules whose slots, gates or parameters have changed are
+    rebuilt; all other native modules get their node function swapped in place.
+
+    Returns a dict with the nodenet uids and the report of Nodenet.reload_native_modules"""
     load_user_files(True)
-    if nodenet_uid:
-        for key in native_modules:
-            if key not in nodenets[nodenet_uid].native_modules:
-                nodenets[nodenet_uid].native_modules[key] = Nodetype(nodenet=nodenets[nodenet_uid], **native_modules[key])
-            nodenets[nodenet_uid].native_modules[key].reload_nodefunction()
-    return True
+    reload_nodefunctions_module()
+    report = {}
+    for uid in ([nodenet_uid] if nodenet_uid else list(nodenets.keys())):
+        nodenet = nodenets[uid]
+        with nodenet.netlock:
+            report[uid] = nodenet.reload_native_modules(native_modules)
+    return report
 
 
 load_definitions()
@@ -941,14 +1463,20 @@ if 'worldrunner_timestep' not in configs:
     configs['worldrunner_timestep'] = 5000
     configs['nodenetrunner_timestep'] = 1000
     configs.save_configs()
+if 'nodenetrunner_mode' not in configs:
+    configs['nodenetrunner_mode'] = "shared"
 runner['world']['running'] = True
 runner['world']['runner'] = Thread(target=worldrunner)
 runner['world']['runner'].daemon = True
 runner['nodenet']['running'] = True
 runner['nodenet']['runner'] = Thread(target=nodenetrunner)
 runner['nodenet']['runner'].daemon = True
+runner['autosave']['running'] = True
+runner['autosave']['runner'] = Thread(target=autosaver)
+runner['autosave']['runner'].daemon = True
 runner['world']['runner'].start()
 runner['nodenet']['runner'].start()
+runner['autosave']['runner'].start()
 
 add_signal_handler(kill_runners)
 
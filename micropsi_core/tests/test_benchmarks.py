@@ -0,0 +1,33 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the nodenet benchmarks
+"""
+
+import pytest
+from micropsi_core import runtime as micropsi
+from micropsi_core.benchmarks.benchmark import run_benchmark
+from micropsi_core.benchmarks.memory import run_memory_benchmark
+from micropsi_core.benchmarks.topologies import TOPOLOGIES
+
+
+@pytest.mark.parametrize("topology", sorted(TOPOLOGIES.keys()))
+def test_run_benchmark(topology):
+    nodenets = len(micropsi.nodenets)
+    result = run_benchmark(micropsi, topology, 30, steps=2, deletions=3)
+    assert result['nodes'] == 30
+    assert result['links'] > 0
+    assert result['timings']['step']['runs'] == 2
+    assert result['timings']['delete_node']['runs'] == 3
+    for operation in ['build', 'step', 'initialize_nodenet', 'save_nodenet', 'load_nodenet', 'get_nodenet_area']:
+        assert result['timings'][operation]['mean'] >= 0
+    assert len(micropsi.nodenets) == nodenets
+
+
+def test_run_memory_benchmark():
+    result = run_memory_benchmark(micropsi, "pipe_hierarchy", 30)
+    assert result['nodes'] == 30
+    assert result['bytes'] > 0
+    assert result['bytes_per_node'] == result['bytes'] / 30
+
@@ -5,7 +5,9 @@
 Tests for node, nodefunction and the like
 """
 
-from micropsi_core.nodenet.node import Node, Nodetype, STANDARD_NODETYPES
+import json
+
+from micropsi_core.nodenet.node import Node, Nodetype, SheafTable, STANDARD_NODETYPES
 from micropsi_core.nodenet.nodefunctions import concept
 from micropsi_core import runtime as micropsi
 
@@ -20,3 +22,50 @@ def test_nodetype_function_definition_overwrites_default_function_name(fixed_nod
     assert foo.nodefunction != concept
     assert foo.nodefunction(nodenet, None) == 17
 
+
+def test_gates_share_default_parameters(fixed_nodenet):
+    netapi = micropsi.get_nodenet(fixed_nodenet).netapi
+    first = netapi.create_node("Register", "Root")
+    second = netapi.create_node("Register", "Root")
+    assert first.get_gate("gen").parameters is second.get_gate("gen").parameters
+    first.set_gate_parameters("gen", {"maximum": 10})
+    assert first.get_gate("gen").parameters["maximum"] == 10
+    assert second.get_gate("gen").parameters["maximum"] == 1
+    assert first.data["gate_parameters"]["gen"]["maximum"] == 10
+
+
+def test_activations_are_written_to_state_on_demand(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    node = nodenet.netapi.create_node("Register", "Root")
+    node.set_gate_activation("gen", 0.5)
+    assert nodenet.state['nodes'][node.uid]['gate_activations']['gen']['default']['activation'] == 0
+    data = json.loads(micropsi.export_nodenet(fixed_nodenet))
+    assert data['nodes'][node.uid]['gate_activations']['gen']['default']['activation'] == 0.5
+
+
+def test_sheaf_elements_are_reused(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    netapi = nodenet.netapi
+    source = netapi.create_node("Register", "Root", "Source")
+    pipe = netapi.create_node("Pipe", "Root", "Pipe")
+    netapi.link(source, "gen", source, "gen")
+    netapi.link(source, "gen", pipe, "sub")
+    netapi.link(pipe, "cat", pipe, "exp")
+    source.activation = 1
+    pipe.get_gate("cat").open_sheaf(1)
+    nodenet.step()
+    elements = [pipe.get_gate("gen").sheaves["default"], pipe.get_slot("exp").sheaves["default"]]
+    for i in range(3):
+        nodenet.step()
+    assert elements == [pipe.get_gate("gen").sheaves["default"], pipe.get_slot("exp").sheaves["default"]]
+    assert "default-" + pipe.uid in pipe.get_slot("exp").sheaves
+
+
+def test_sheaf_table():
+    table = SheafTable()
+    assert table.get_child("default", "n1") == "default-n1"
+    assert table.get_child("default", "n1") is table.get_child("default", "n1")
+    assert table.get_upsheaf("default-n1", "n1") == "default"
+    assert table.get_upsheaf("default-n1", "n2") is None
+    assert table.get_upsheaf("foo-bar-n2", "n2") == "foo-bar"
+    assert table.intern("default") == 0
@@ -180,6 +180,32 @@ def test_node_netapi_get_nodes_by_name_and_nodespace(fixed_nodenet):
     assert node2 in nodes
 
 
+def test_node_netapi_get_nodes_follows_changes(fixed_nodenet):
+    # test that the node indexes follow renamed, moved, rebound and deleted nodes
+    net, netapi, source = prepare(fixed_nodenet)
+    nodespace = netapi.create_node("Nodespace", "Root", "NestedNodespace")
+    node = netapi.create_node("Register", "Root", "TestName1")
+    sensor = netapi.create_node("Sensor", "Root", "TestSensor")
+
+    node.name = "OtherName"
+    assert netapi.get_nodes("Root", "TestName") == []
+    assert netapi.get_nodes(None, "Other") == [node]
+
+    node.parent_nodespace = nodespace.uid
+    assert netapi.get_nodes(nodespace.uid) == [node]
+    assert node not in netapi.get_nodes("Root")
+
+    micropsi.bind_datasource_to_sensor(fixed_nodenet, sensor.uid, "test_source")
+    assert net.get_sensors("Root", "test_source") == {sensor.uid: sensor}
+    assert net.get_sensors("Root", "other_source") == {}
+
+    netapi.delete_node(node)
+    netapi.delete_node(sensor)
+    assert netapi.get_nodes(nodespace.uid) == []
+    assert sensor.uid not in net.get_sensors()
+    assert netapi.get_nodes(None, "Other") == []
+
+
 def test_node_netapi_get_nodes_in_gate_field(fixed_nodenet):
     # test get_nodes_in_gate_field
     net, netapi, source = prepare(fixed_nodenet)
@@ -515,6 +541,27 @@ def test_node_netapi_link_full(fixed_nodenet):
     assert len(n_d.get_slot('por').incoming) == 4
 
 
+def test_node_netapi_batch_operations(fixed_nodenet):
+    # test creating, linking, unlinking and deleting many nodes at once
+    net, netapi, source = prepare(fixed_nodenet)
+    nodes = netapi.create_nodes("Pipe", "Root", ["Batch%d" % i for i in range(5)])
+    assert [node.name for node in nodes] == ["Batch%d" % i for i in range(5)]
+    assert netapi.get_nodes("Root", "Batch") == nodes
+
+    netapi.link_many([(source, "gen", node, "gen") for node in nodes], weight=0.5)
+    netapi.link_many([(source, "gen", nodes[0], "gen")], weight=0.8)
+    assert len(source.get_gate("gen").outgoing) == 6
+    assert net.links[net.get_link_uid(source.uid, "gen", nodes[0].uid, "gen")].weight == 0.8
+
+    netapi.unlink_many([(source, "gen", nodes[0], None), (source, None, nodes[1], "gen")])
+    assert len(source.get_gate("gen").outgoing) == 4
+
+    netapi.delete_nodes(nodes[2:])
+    assert netapi.get_nodes("Root", "Batch") == nodes[:2]
+    assert len(source.get_gate("gen").outgoing) == 1
+    assert list(net.nodespaces["Root"].netentities["nodes"]) == list(net.nodes.keys())
+
+
 def test_node_netapi_unlink(fixed_nodenet):
     # test completely unlinking a node
     net, netapi, source = prepare(fixed_nodenet)
@@ -0,0 +1,196 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the array-backed nodenet engine
+"""
+
+import math
+import pytest
+from micropsi_core import runtime as micropsi
+from micropsi_core.nodenet import gatefunctions
+from micropsi_core.tests.test_node_logic import add_dummyworld
+
+pytest.importorskip("numpy")
+
+
+def prepare(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    nodenet.engine = "arrays"
+    netapi = nodenet.netapi
+    source = netapi.create_node("Register", "Root", "Source")
+    netapi.link(source, "gen", source, "gen")
+    source.activation = 1
+    nodenet.step()
+    return nodenet, netapi, source
+
+
+def build_chain(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    micropsi.add_node(fixed_nodenet, "Register", [10, 10], "Root", uid="source")
+    micropsi.add_node(fixed_nodenet, "Concept", [20, 10], "Root", uid="concept")
+    micropsi.add_node(fixed_nodenet, "Register", [30, 10], "Root", uid="register")
+    micropsi.add_node(fixed_nodenet, "Pipe", [40, 10], "Root", uid="pipe")
+    micropsi.add_node(fixed_nodenet, "Activator", [50, 10], "Root", uid="activator", parameters={"type": "ret"})
+    micropsi.add_link(fixed_nodenet, "source", "gen", "source", "gen", uid="l1")
+    micropsi.add_link(fixed_nodenet, "source", "gen", "concept", "gen", weight=0.5, uid="l2")
+    micropsi.add_link(fixed_nodenet, "concept", "por", "register", "gen", weight=0.8, uid="l3")
+    micropsi.add_link(fixed_nodenet, "concept", "sub", "pipe", "sub", uid="l4")
+    micropsi.add_link(fixed_nodenet, "pipe", "gen", "register", "gen", weight=0.3, uid="l5")
+    micropsi.add_link(fixed_nodenet, "source", "gen", "activator", "gen", weight=0.7, uid="l6")
+    nodenet.nodes["register"].set_gate_parameters("gen", {"amplification": 2, "maximum": 10})
+    nodenet.nodes["source"].activation = 1
+    return nodenet
+
+
+def build_sheaves(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    micropsi.add_node(fixed_nodenet, "Register", [10, 10], "Root", uid="source")
+    micropsi.add_node(fixed_nodenet, "Pipe", [20, 10], "Root", uid="pipe")
+    micropsi.add_node(fixed_nodenet, "Register", [30, 10], "Root", uid="register")
+    micropsi.add_link(fixed_nodenet, "source", "gen", "source", "gen", uid="l1")
+    micropsi.add_link(fixed_nodenet, "source", "gen", "pipe", "sub", uid="l2")
+    micropsi.add_link(fixed_nodenet, "pipe", "cat", "register", "gen", uid="l3")
+    nodenet.nodes["source"].activation = 1
+    return nodenet
+
+
+# nodenets that both engines have to calculate in the same way
+SCENARIOS = [build_chain, build_sheaves]
+
+
+def gate_activations(nodenet):
+    return dict(((uid, gate), dict((sheaf_id, sheaf.activation) for sheaf_id, sheaf in
+                                   node.get_gate(gate).sheaves.items()))
+                for uid, node in nodenet.nodes.items() for gate in node.gates)
+
+
+@pytest.mark.parametrize("build", SCENARIOS)
+def test_arrays_match_objects(fixed_nodenet, build):
+    nodenet = build(fixed_nodenet)
+    results = []
+    for i in range(5):
+        nodenet.step()
+        results.append(gate_activations(nodenet))
+
+    micropsi.revert_nodenet(fixed_nodenet)
+    nodenet = build(fixed_nodenet)
+    nodenet.engine = "arrays"
+    for i in range(5):
+        nodenet.step()
+        assert gate_activations(nodenet) == results[i]
+
+
+def test_arrays_spread_sheaves(fixed_nodenet):
+    nodenet = build_sheaves(fixed_nodenet)
+    nodenet.engine = "arrays"
+    nodenet.step()
+    nodenet.step()
+    register = nodenet.nodes["register"]
+    assert register in nodenet.get_step_engine().fallback_nodes
+    assert len(register.get_gate("gen").sheaves) == 2
+
+
+def test_arrays_gate_arithmetics(fixed_nodenet):
+    net, netapi, source = prepare(fixed_nodenet)
+    register = netapi.create_node("Register", "Root")
+    netapi.link(source, "gen", register, "gen")
+    register.set_gate_parameters("gen", {"maximum": 10, "amplification": 10})
+    net.step()
+    assert register.get_gate("gen").activation == 10
+    register.set_gate_parameters("gen", {"threshold": 2})
+    net.step()
+    assert register.get_gate("gen").activation == 0
+
+
+def test_arrays_directional_activator(fixed_nodenet):
+    net, netapi, source = prepare(fixed_nodenet)
+    register = netapi.create_node("Register", "Root")
+    netapi.link(source, "gen", register, "gen")
+    genactivator = netapi.create_node("Activator", "Root")
+    genactivator.parameters["type"] = "gen"
+    netapi.link(source, "gen", genactivator, "gen", 5)
+    register.set_gate_parameters("gen", {"maximum": 10})
+    net.step()
+    assert register.get_gate("gen").activation == 5
+
+
+def test_arrays_gatefunction(fixed_nodenet):
+    net, netapi, source = prepare(fixed_nodenet)
+    register = netapi.create_node("Register", "Root")
+    netapi.link(source, "gen", register, "gen")
+    net.nodespaces["Root"].set_gate_function("Register", "gen", "return 0.9")
+    net.step()
+    assert register.get_gate("gen").activation == 0.9
+
+
+def test_arrays_builtin_gatefunctions(fixed_nodenet):
+    results = {}
+    for engine in ["objects", "arrays"]:
+        net, netapi, source = prepare(fixed_nodenet)
+        net.engine = engine
+        concepts = netapi.create_nodes("Concept", "Root", ["c1", "c2"])
+        for concept, weight in zip(concepts, [-0.5, 2]):
+            netapi.link(source, "gen", concept, "gen", weight)
+            concept.set_gate_parameters("gen", {"theta": 3, "minimum": -1, "maximum": 1})
+        for name, source_string in [("sigmoid", "return 1/(1+math.exp(-t*x))"), ("absolute", "absolute"),
+                                    ("threshold", "return 1 if x > t else 0"), ("identity", "identity")]:
+            net.nodespaces["Root"].set_gate_function("Concept", "gen", source_string)
+            assert net.nodespaces["Root"].get_gatefunction("Concept", "gen") is gatefunctions.BUILTIN_GATEFUNCTIONS[name]
+            net.step()
+            results.setdefault(name, []).append([concept.get_gate("gen").activation for concept in concepts])
+        micropsi.revert_nodenet(fixed_nodenet)
+    for name, (objects, arrays) in results.items():
+        assert arrays == pytest.approx(objects)
+    assert results["absolute"][0] == [0.5, 1]
+    assert results["sigmoid"][0] == pytest.approx([1 / (1 + math.exp(1.5)), 1 / (1 + math.exp(-6))])
+
+
+def test_arrays_logic_die(fixed_nodenet):
+    net, netapi, source = prepare(fixed_nodenet)
+    net.step()
+    assert source.get_gate("gen").activation == 1
+    netapi.unlink(source, "gen", source, "gen")
+    net.step()
+    assert source.get_gate("gen").activation == 0
+
+
+def test_arrays_sensor_and_actor(fixed_nodenet):
+    net, netapi, source = prepare(fixed_nodenet)
+    world = add_dummyworld(fixed_nodenet)
+
+    register = netapi.create_node("Register", "Root")
+    netapi.link_sensor(register, "test_source", "gen")
+    netapi.link_actor(source, "test_target", 0.5, 1, "gen", "gen")
+    actor = netapi.get_nodes("Root", "test_target")[0]
+    feedback = netapi.create_node("Register", "Root")
+    netapi.link(actor, "gen", feedback, "gen")
+    world.step()
+    net.step()
+    world.step()
+    net.step()
+    assert register.get_gate("gen").activation == 0.7
+    assert world.test_target_value == 0.5
+    assert feedback.get_gate("gen").activation == 0.3
+
+
+def test_arrays_worldless_actor(fixed_nodenet):
+    results = {}
+    for engine in ["objects", "arrays"]:
+        net, netapi, source = prepare(fixed_nodenet)
+        net.engine = engine
+        net.world = None
+        # sensors need a world in both engines
+        for uid in [uid for uid, node in net.nodes.items() if node.type == "Sensor"]:
+            net.delete_node(uid)
+        linked, unlinked = netapi.create_nodes("Actor", "Root", ["Linked", "Unlinked"])
+        netapi.link(source, "gen", linked, "gen")
+        for actor in linked, unlinked:
+            actor.parameters["datatarget"] = "engine_l"
+            actor.get_gate("gen").sheaves['default'].activation = 0.5
+        for i in range(3):
+            net.step()
+            results.setdefault(engine, []).append([actor.get_gate("gen").activation for actor in (linked, unlinked)])
+        micropsi.revert_nodenet(fixed_nodenet)
+    # the object engine resets the gates before the node function, which leaves them alone without a world
+    assert results["arrays"] == results["objects"] == [[0, 0]] * 3
@@ -0,0 +1,92 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the incremental JSON export and import
+"""
+
+import io
+import json
+
+from micropsi_core.nodenet import jsonstream
+from micropsi_core import runtime as micropsi
+
+
+def test_iterate_members_in_small_chunks():
+    data = {"a": 12345.678, "nodes": {"n1": {"name": "äöü", "weight": 1}, "n2": {}}, "links": {}, "z": [1, None, True]}
+    string = json.dumps(data, indent=4)
+    for stream in [io.StringIO(string), io.BytesIO(string.encode('utf-8'))]:
+        members = list(jsonstream.iterate_members(stream, sections=["nodes", "links"], chunk_size=3))
+        assert members == [
+            (None, "a", 12345.678),
+            ("nodes", None, None),
+            ("nodes", "n1", {"name": "äöü", "weight": 1}),
+            ("nodes", "n2", {}),
+            ("links", None, None),
+            (None, "z", [1, None, True])
+        ]
+        assert json.loads("".join(jsonstream.dump_members(members, batch_size=2))) == data
+
+
+def test_export_nodenet_stream(fixed_nodenet):
+    micropsi.step_nodenet(fixed_nodenet)
+    chunks = list(micropsi.export_nodenet_stream(fixed_nodenet, batch_size=2))
+    assert len(chunks) > 1
+    assert json.loads("".join(chunks)) == json.loads(micropsi.export_nodenet(fixed_nodenet))
+
+
+def test_import_nodenet_from_file(fixed_nodenet):
+    data = json.loads(micropsi.export_nodenet(fixed_nodenet))
+    data['uid'] = 'imported_test_nodenet'
+    micropsi.import_nodenet(io.BytesIO(json.dumps(data).encode('utf-8')), owner="Pytest User")
+    try:
+        nodenet = micropsi.get_nodenet('imported_test_nodenet')
+        assert nodenet.owner == "Pytest User"
+        assert set(nodenet.nodes.keys()) == set(data['nodes'].keys())
+        assert set(nodenet.links.keys()) == set(data['links'].keys())
+    finally:
+        micropsi.delete_nodenet('imported_test_nodenet')
+
+
+def test_import_nodenet_over_snapshot(fixed_nodenet):
+    data = json.loads(micropsi.export_nodenet(fixed_nodenet))
+    data['uid'] = 'imported_test_nodenet'
+    micropsi.import_nodenet(json.dumps(data), owner="Pytest User")
+    try:
+        micropsi.get_nodenet('imported_test_nodenet')
+        micropsi.set_nodenet_properties('imported_test_nodenet', file_format="snapshot")
+        micropsi.save_nodenet('imported_test_nodenet')
+        micropsi.unload_nodenet('imported_test_nodenet')
+
+        del data['nodes']['B2']
+        data['links'] = dict((uid, link) for uid, link in data['links'].items()
+                             if 'B2' not in [link['source_node_uid'], link['target_node_uid']])
+        micropsi.import_nodenet(io.StringIO(json.dumps(data)), owner="Pytest User")
+        # the imported file is loaded, not the older snapshot
+        assert micropsi.get_nodenet_filename('imported_test_nodenet').endswith(".json")
+        nodenet = micropsi.get_nodenet('imported_test_nodenet')
+        assert set(nodenet.nodes.keys()) == set(data['nodes'].keys())
+    finally:
+        micropsi.delete_nodenet('imported_test_nodenet')
+
+
+def test_merge_nodenet_from_file(fixed_nodenet):
+    data = json.loads(micropsi.export_nodenet(fixed_nodenet))
+    del data['nodes']['B2']
+    data['links'] = dict((uid, link) for uid, link in data['links'].items()
+                         if 'B2' not in [link['source_node_uid'], link['target_node_uid']])
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    merged = []
+
+    def merge_data(nodenet_data):
+        # the state is replaced at once, after the whole file has been parsed
+        assert 'B2' in nodenet.state['nodes']
+        merged.append(set(nodenet_data['nodes']))
+        type(nodenet).merge_data(nodenet, nodenet_data)
+    nodenet.merge_data = merge_data
+
+    micropsi.merge_nodenet(fixed_nodenet, io.StringIO(json.dumps(data)))
+    assert merged == [set(data['nodes'])]
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    assert set(nodenet.nodes.keys()) == set(data['nodes'].keys())
+    assert set(nodenet.links.keys()) == set(data['links'].keys())
@@ -0,0 +1,131 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the activation monitors
+"""
+
+import pytest
+from micropsi_core.nodenet.monitor import RingBuffer
+from micropsi_core import runtime as micropsi
+from micropsi_core.tests.test_nodenet_arrays import build_chain
+
+
+def test_ring_buffer():
+    buffer = RingBuffer(4, 2)
+    for step in range(1, 7):
+        buffer.append(step, step * 10, -step)
+    assert len(buffer) == 4
+    assert buffer.discarded
+    assert buffer.first_step == 3
+    assert buffer.get_range() == [[3, 4, 5, 6], [30, 40, 50, 60], [-3, -4, -5, -6]]
+    assert buffer.get_range(4, 5) == [[4, 5], [40, 50], [-4, -5]]
+    assert buffer.get_range(7) == [[], [], []]
+    buffer.clear()
+    assert buffer.get_range() == [[], [], []]
+
+
+def test_monitor_retention_and_downsampling(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    monitor = micropsi.add_gate_monitor(fixed_nodenet, 'A1', 'gen', retention=20, downsampling=[(5, 4), (50, 10)])
+    for i in range(100):
+        nodenet.monitors[monitor['uid']].record(i, i)
+
+    data = micropsi.get_monitor_data(fixed_nodenet)['monitors'][monitor['uid']]
+    assert data['interval'] == 1
+    assert sorted(data['values']) == list(range(80, 100))
+
+    # the exact values are gone, and the first tier only reaches back to step 80, too
+    data = micropsi.get_monitor_data(fixed_nodenet, from_step=60)['monitors'][monitor['uid']]
+    assert data['interval'] == 50
+    assert data['values'] == {50: 74.5}
+    assert data['min'] == {50: 50} and data['max'] == {50: 99}
+
+    data = micropsi.get_monitor_data(fixed_nodenet, from_step=85, to_step=94, resolution=2)['monitors'][monitor['uid']]
+    assert data['interval'] == 5
+    assert data['values'] == {85: 87, 90: 92}
+
+    micropsi.clear_monitor(fixed_nodenet, monitor['uid'])
+    assert micropsi.get_monitor_data(fixed_nodenet)['monitors'][monitor['uid']]['values'] == {}
+
+
+def test_monitor_data_is_saved(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    monitor = micropsi.add_gate_monitor(fixed_nodenet, 'A1', 'gen', retention=5, downsampling=[(2, 10)])
+    for i in range(8):
+        nodenet.step()
+    values = micropsi.get_monitor_data(fixed_nodenet, from_step=0)['monitors'][monitor['uid']]
+    assert len(micropsi.export_monitor_data(fixed_nodenet, monitor['uid'])['values']) == 5
+    micropsi.save_nodenet(fixed_nodenet)
+    micropsi.unload_nodenet(fixed_nodenet)
+    micropsi.load_nodenet(fixed_nodenet)
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    assert micropsi.get_monitor_data(fixed_nodenet, from_step=0)['monitors'][monitor['uid']] == values
+    nodenet.step()
+    data = micropsi.get_monitor_data(fixed_nodenet)['monitors'][monitor['uid']]
+    assert sorted(data['values']) == [5, 6, 7, 8, 9]
+
+
+def test_get_monitor_data_since_cursor(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    monitor = micropsi.add_gate_monitor(fixed_nodenet, 'A1', 'gen')
+    other = micropsi.add_slot_monitor(fixed_nodenet, 'A2', 'gen')
+    for i in range(3):
+        nodenet.step()
+    data = micropsi.get_monitor_data(fixed_nodenet)['monitors']
+    assert data[monitor['uid']]['cursor'] == 3
+    assert sorted(data[monitor['uid']]['values']) == [1, 2, 3]
+
+    for i in range(2):
+        nodenet.step()
+    data = micropsi.get_monitor_data(fixed_nodenet, since_step={monitor['uid']: 3})['monitors']
+    assert sorted(data[monitor['uid']]['values']) == [4, 5]
+    assert data[monitor['uid']]['cursor'] == 5
+    assert sorted(data[other['uid']]['values']) == [1, 2, 3, 4, 5]
+
+    data = micropsi.get_monitor_data(fixed_nodenet, since_step={monitor['uid']: 5})['monitors']
+    assert data[monitor['uid']]['values'] == {}
+    assert data[monitor['uid']]['cursor'] == 5
+
+
+def record_aggregates(fixed_nodenet, engine):
+    nodenet = build_chain(fixed_nodenet)
+    nodenet.engine = engine
+    monitor = micropsi.add_nodespace_monitor(fixed_nodenet, "Root", "gen", threshold=0.5, activation_retention=3)
+    concepts = micropsi.add_nodetype_monitor(fixed_nodenet, "Concept", "sub")
+    for i in range(5):
+        nodenet.step()
+    activations = micropsi.get_monitor_activations(fixed_nodenet, monitor['uid'])
+    gates = [nodenet.nodes[uid].get_gate("gen").activation for uid in activations['node_uids']]
+    data = micropsi.get_monitor_data(fixed_nodenet)['monitors']
+    return nodenet, activations, gates, data[monitor['uid']], data[concepts['uid']]
+
+
+def test_aggregate_monitors(fixed_nodenet):
+    nodenet, activations, gates, data, concepts = record_aggregates(fixed_nodenet, "objects")
+    assert set(activations['node_uids']) == set(uid for uid, node in nodenet.nodes.items() if 'gen' in node.gates)
+    assert activations['steps'] == [3, 4, 5]
+    assert activations['activations'][-1] == gates
+    assert data['mean'][5] == pytest.approx(sum(gates) / len(gates))
+    assert data['max'][5] == max(gates)
+    assert data['count'][5] == len([value for value in gates if value > 0.5])
+    assert sorted(data['values']) == [1, 2, 3, 4, 5]
+    assert concepts['node_name'] == "nodetype Concept"
+    assert len(micropsi.get_monitor_activations(fixed_nodenet, concepts['uid'])['node_uids']) == \
+        len([node for node in nodenet.nodes.values() if node.type == "Concept"])
+
+    micropsi.save_nodenet(fixed_nodenet)
+    micropsi.revert_nodenet(fixed_nodenet)
+    assert micropsi.get_monitor_data(fixed_nodenet)['monitors'][data['uid']]['mean'] == data['mean']
+
+
+def test_aggregate_monitors_with_arrays(fixed_nodenet):
+    pytest.importorskip("numpy")
+    nodenet, activations, gates, data, concepts = record_aggregates(fixed_nodenet, "objects")
+    micropsi.revert_nodenet(fixed_nodenet)
+    nodenet, array_activations, array_gates, array_data, array_concepts = record_aggregates(fixed_nodenet, "arrays")
+    assert nodenet.monitors[array_data['uid']].indices is not None
+    for row, array_row in zip(activations['activations'], array_activations['activations']):
+        assert array_row == pytest.approx(row)
+    assert array_data['mean'] == pytest.approx(data['mean'])
+    assert array_data['count'] == data['count']
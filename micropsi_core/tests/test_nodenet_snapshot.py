@@ -0,0 +1,68 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the binary snapshot format
+"""
+
+import json
+import os
+
+from micropsi_core.nodenet import snapshot
+from micropsi_core import runtime as micropsi
+
+
+def json_state(nodenet):
+    nodenet.update_state()
+    return json.loads(json.dumps(nodenet.state, sort_keys=True))
+
+
+def test_snapshot_round_trip(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    for i in range(3):
+        nodenet.step()
+    state = json_state(nodenet)
+    for compress in [True, False]:
+        data = snapshot.dumps(state, compress=compress)
+        assert snapshot.is_snapshot(data)
+        restored = snapshot.loads(data)
+        assert json.dumps(restored, sort_keys=True) == json.dumps(state, sort_keys=True)
+    assert snapshot.loads_info(data)['uid'] == fixed_nodenet
+
+
+def test_snapshot_keeps_value_types():
+    state = {
+        "uid": "foo",
+        "nodes": {
+            "a": {"weight": 1, "certainty": 1.0, "name": "ä", "flag": True, "state": None, "gates": {}},
+            "b": {"weight": 2, "certainty": 0.5, "name": "b", "flag": False, "state": None, "gates": {}},
+            "c": {"weight": 2 ** 70, "certainty": 0.5, "name": "c", "flag": False, "state": [1], "gates": {"gen": 1}},
+            "d": {"weight": 2 ** 70, "certainty": 0.5, "name": "d", "flag": False, "state": {}, "gates": {"gen": 2}},
+        },
+        "links": {}
+    }
+    restored = snapshot.loads(snapshot.dumps(state))
+    assert json.dumps(restored, sort_keys=True) == json.dumps(state, sort_keys=True)
+
+
+def test_save_and_load_snapshot(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    nodenet.step()
+    micropsi.set_nodenet_properties(fixed_nodenet, file_format="snapshot")
+    state = json_state(nodenet)
+    micropsi.save_nodenet(fixed_nodenet)
+    assert micropsi.get_nodenet_filename(fixed_nodenet).endswith(".snapshot")
+    assert not os.path.isfile(micropsi.get_nodenet_filename(fixed_nodenet, "json"))
+    definitions = micropsi.crawl_definition_files(os.path.join(micropsi.RESOURCE_PATH, micropsi.NODENET_DIRECTORY))
+    assert definitions[fixed_nodenet].name == nodenet.name
+
+    micropsi.unload_nodenet(fixed_nodenet)
+    micropsi.load_nodenet(fixed_nodenet)
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    assert nodenet.file_format == "snapshot"
+    assert json_state(nodenet) == state
+
+    micropsi.set_nodenet_properties(fixed_nodenet, file_format="json")
+    micropsi.save_nodenet(fixed_nodenet)
+    assert micropsi.get_nodenet_filename(fixed_nodenet).endswith(".json")
+    assert not os.path.isfile(micropsi.get_nodenet_filename(fixed_nodenet, "snapshot"))
@@ -0,0 +1,72 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the sparse activity engine
+"""
+
+import pytest
+from micropsi_core import runtime as micropsi
+from micropsi_core.nodenet.nodenet import Nodenet
+from micropsi_core.tests import test_node_activation, test_node_pipe_logic
+
+SCENARIOS = [getattr(module, name) for module in (test_node_activation, test_node_pipe_logic)
+             for name in sorted(dir(module)) if name.startswith("test_")]
+
+
+def record_steps(fixed_nodenet, monkeypatch, scenario, engine):
+    """Runs the scenario with the given engine and returns the gate activations after every step"""
+    steps = []
+    original_step = Nodenet.step
+
+    def step(nodenet):
+        original_step(nodenet)
+        index = dict((uid, str(i)) for i, uid in enumerate(nodenet.nodes))
+
+        def sheaf_name(sheaf):
+            # open sheaves are named after node uids, which differ between both runs
+            return "-".join(index.get(part, part) for part in sheaf.split("-"))
+
+        steps.append([(node.type, gatetype, sorted((sheaf_name(sheaf), gate.sheaves[sheaf].activation)
+                                                   for sheaf in gate.sheaves))
+                      for node in nodenet.nodes.values() for gatetype, gate in sorted(node.gates.items())])
+
+    micropsi.get_nodenet(fixed_nodenet).engine = engine
+    monkeypatch.setattr(Nodenet, "step", step)
+    scenario(fixed_nodenet)
+    monkeypatch.undo()
+    return steps
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS, ids=[scenario.__name__ for scenario in SCENARIOS])
+def test_sparse_matches_full_step(fixed_nodenet, monkeypatch, scenario):
+    full = record_steps(fixed_nodenet, monkeypatch, scenario, "objects")
+    micropsi.revert_nodenet(fixed_nodenet)
+    sparse = record_steps(fixed_nodenet, monkeypatch, scenario, "sparse")
+    assert len(full) > 0
+    assert sparse == full
+
+
+def test_sparse_skips_quiet_nodes(fixed_nodenet):
+    net = micropsi.get_nodenet(fixed_nodenet)
+    net.engine = "sparse"
+    netapi = net.netapi
+    source = netapi.create_node("Register", "Root", "Source")
+    register = netapi.create_node("Register", "Root", "Register")
+    quiet = netapi.create_node("Concept", "Root", "Quiet")
+    netapi.link(source, "gen", register, "gen")
+    netapi.link(source, "gen", source, "gen")
+    source.activation = 1
+    net.step()
+    net.step()
+    engine = net.get_step_engine()
+    assert quiet.uid not in engine.awake
+    assert register.uid in engine.awake
+    assert register.get_gate("gen").activation == 1
+    netapi.unlink(source, "gen", source, "gen")
+    net.step()
+    net.step()
+    net.step()
+    assert register.get_gate("gen").activation == 0
+    assert register.uid not in engine.awake
+    assert source.uid not in engine.active
@@ -5,6 +5,9 @@
 
 """
 import os
+import json
+import time
+import pytest
 from micropsi_core import runtime
 from micropsi_core import runtime as micropsi
 
@@ -53,6 +56,179 @@ def test_nodespace_removal(fixed_nodenet):
     assert sub_uid not in micropsi.nodenets[fixed_nodenet].state['nodespaces']
 
 
+def test_step_profile(fixed_nodenet):
+    assert micropsi.get_step_profile(fixed_nodenet) is None
+    micropsi.set_step_profiling(fixed_nodenet)
+    micropsi.step_nodenet(fixed_nodenet)
+    micropsi.step_nodenet(fixed_nodenet)
+    profile = micropsi.get_step_profile(fixed_nodenet)
+    assert profile['steps'] == 2
+    for phase in ['snapshot', 'propagation', 'activators', 'nativemodules', 'nodes', 'monitors']:
+        assert phase in profile['phases']
+    assert profile['nodetypes']['Concept']['calls'] == 8
+    assert profile['nodetypes']['Activator']['calls'] == 8
+    assert profile['nativemodules'] == []
+    micropsi.set_step_profiling(fixed_nodenet, False)
+    assert micropsi.get_step_profile(fixed_nodenet) is None
+
+
+def test_native_module_sandbox(fixed_nodenet):
+    from micropsi_core.nodenet.node import Nodetype
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    calls = []
+
+    def loop_forever(netapi, node=None, sheaf="default", **_):
+        calls.append(node.uid)
+        while True:
+            pass
+
+    def count(netapi, node=None, sheaf="default", **_):
+        calls.append(node.uid)
+
+    for name, nodefunction in [("Looping", loop_forever), ("Counting", count)]:
+        nodenet.native_modules[name] = Nodetype(name, nodenet, ["gen"], ["gen"])
+        nodenet.native_modules[name].nodefunction = nodefunction
+        nodenet.netapi.create_node(name, "Root", name)
+
+    micropsi.set_native_module_sandbox(fixed_nodenet, isolated=True, time_budget=0.01, max_overruns=2)
+    for i in range(3):
+        micropsi.step_nodenet(fixed_nodenet)
+    stats = micropsi.get_native_module_stats(fixed_nodenet)
+    assert stats['settings'] == {'isolated': True, 'time_budget': 0.01, 'max_overruns': 2}
+    looping, counting = stats['nativemodules']
+    assert looping['type'] == "Looping"
+    assert looping['calls'] == looping['timeouts'] == 2
+    assert looping['disabled']
+    assert looping['cpu_time'] > 0
+    assert counting['calls'] == 3 and counting['overruns'] == 0 and not counting['disabled']
+    assert len(calls) == 5
+
+    micropsi.enable_native_module(fixed_nodenet, "Looping")
+    micropsi.step_nodenet(fixed_nodenet)
+    assert micropsi.get_native_module_stats(fixed_nodenet)['nativemodules'][0]['calls'] == 3
+
+
+def test_reload_native_modules(fixed_nodenet, resourcepath):
+    import sys
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    nodetypes = {
+        "Counter": {"name": "Counter", "slottypes": ["gen"], "gatetypes": ["gen"], "nodefunction_name": "counter"},
+        "Doubler": {"name": "Doubler", "slottypes": ["gen"], "gatetypes": ["gen"], "nodefunction_name": "doubler"}
+    }
+
+    def write_user_files(activation):
+        with open(os.path.join(resourcepath, 'nodetypes.json'), 'w') as fp:
+            fp.write(json.dumps(nodetypes))
+        with open(os.path.join(resourcepath, 'nodefunctions.py'), 'w') as fp:
+            fp.write("def counter(netapi, node=None, **_):\n    node.get_gate('gen').gate_function(%s)\n\n"
+                     "def doubler(netapi, node=None, **_):\n    node.get_gate('gen').gate_function(2)\n" % activation)
+
+    try:
+        write_user_files(0.5)
+        report = micropsi.reload_native_modules(fixed_nodenet)[fixed_nodenet]
+        assert report['added'] == ["Counter", "Doubler"]
+        counter = nodenet.netapi.create_node("Counter", "Root", "counter")
+        doubler = nodenet.netapi.create_node("Doubler", "Root", "doubler")
+        nodenet.netapi.link(counter, "gen", doubler, "gen", weight=0.5)
+        micropsi.step_nodenet(fixed_nodenet)
+        assert counter.get_gate("gen").activation == 0.5
+
+        # reloading unchanged files does not import the node functions again
+        assert not micropsi.reload_nodefunctions_module()
+
+        nodetypes["Doubler"]["gatetypes"] = ["gen", "sub"]
+        write_user_files(0.75)
+        report = micropsi.reload_native_modules(fixed_nodenet)[fixed_nodenet]
+        assert report == {'added': [], 'rebound': ["Counter"], 'rebuilt': {"Doubler": 1}}
+        assert nodenet.nodes[counter.uid] is counter
+        rebuilt = nodenet.nodes[doubler.uid]
+        assert rebuilt is not doubler
+        assert set(rebuilt.gates) == {"gen", "sub"}
+        links = list(rebuilt.get_slot("gen").incoming.values())
+        assert len(links) == 1 and links[0].source_node is counter and links[0].weight == 0.5
+        micropsi.step_nodenet(fixed_nodenet)
+        assert counter.get_gate("gen").activation == 0.75
+    finally:
+        os.remove(os.path.join(resourcepath, 'nodetypes.json'))
+        os.remove(os.path.join(resourcepath, 'nodefunctions.py'))
+        sys.modules.pop('nodefunctions', None)
+        runtime.native_modules = {}
+        runtime.nodefunctions_signature = None
+
+
+def test_nodenetrunner_workers(fixed_nodenet):
+    micropsi.set_nodenetrunner_timestep(10, fixed_nodenet)
+    assert micropsi.get_nodenetrunner_timestep(fixed_nodenet) == 10
+    assert micropsi.get_nodenetrunner_stats(fixed_nodenet) is None
+    micropsi.set_nodenetrunner_mode("workers")
+    try:
+        micropsi.start_nodenetrunner(fixed_nodenet)
+        for i in range(50):
+            time.sleep(0.05)
+            stats = micropsi.get_nodenetrunner_stats(fixed_nodenet)
+            if stats is not None and stats['steps'] > 2:
+                break
+        micropsi.stop_nodenetrunner(fixed_nodenet)
+        assert stats['steps'] > 2
+        assert stats['timestep'] == 10
+        assert stats['overruns'] <= stats['steps']
+    finally:
+        micropsi.stop_nodenetrunner(fixed_nodenet)
+        micropsi.set_nodenetrunner_mode("shared")
+        micropsi.runner['nodenet']['workers'][fixed_nodenet].join()
+    assert micropsi.get_nodenet(fixed_nodenet).current_step > 2
+    micropsi.set_nodenetrunner_timestep(None, fixed_nodenet)
+    assert micropsi.get_nodenetrunner_timestep(fixed_nodenet) == micropsi.get_nodenetrunner_timestep()
+
+
+def test_autosave_nodenet(fixed_nodenet):
+    retention = micropsi.get_autosave_setting('autosave_retention')
+    micropsi.set_autosave(retention=2)
+    try:
+        for i in range(3):
+            micropsi.step_nodenet(fixed_nodenet)
+            stats = micropsi.autosave_nodenet(fixed_nodenet)
+    finally:
+        if retention is not None:
+            micropsi.set_autosave(retention=retention)
+    assert stats['saves'] == 3
+    assert stats['bytes'] == os.path.getsize(stats['filename'])
+    assert stats['total_bytes'] >= stats['bytes']
+    assert micropsi.get_autosave_stats(fixed_nodenet) == stats
+    directory = os.path.dirname(stats['filename'])
+    assert len(os.listdir(directory)) == 2
+    with open(stats['filename']) as fp:
+        assert json.load(fp)['step'] == micropsi.get_nodenet(fixed_nodenet).current_step
+
+    # edits are autosaved, too, even if the nodenet is not stepped
+    assert not micropsi.changed_since_autosave(fixed_nodenet)
+    micropsi.set_node_name(fixed_nodenet, "A1", "Edited")
+    assert micropsi.changed_since_autosave(fixed_nodenet)
+    micropsi.autosave_nodenet(fixed_nodenet)
+    assert not micropsi.changed_since_autosave(fixed_nodenet)
+
+
+def test_autosave_retention_from_config(fixed_nodenet, monkeypatch):
+    # without a value set through set_autosave, the retention is read from config.ini
+    retention = None
+    if 'autosave_retention' in micropsi.configs:
+        retention = micropsi.configs['autosave_retention']
+        del micropsi.configs['autosave_retention']
+    try:
+        monkeypatch.setattr(micropsi, 'AUTOSAVE_RETENTION', 1)
+        micropsi.autosave_nodenet(fixed_nodenet)
+        stats = micropsi.autosave_nodenet(fixed_nodenet)
+        assert os.listdir(os.path.dirname(stats['filename'])) == [os.path.basename(stats['filename'])]
+        for value in [0, -1]:
+            monkeypatch.setattr(micropsi, 'AUTOSAVE_RETENTION', value)
+            with pytest.raises(ValueError):
+                micropsi.autosave_nodenet(fixed_nodenet)
+        assert micropsi.get_autosave_stats(fixed_nodenet) == stats
+    finally:
+        if retention is not None:
+            micropsi.set_autosave(retention=retention)
+
+
 
 """
 def test_set_nodenet_properties(micropsi, test_nodenet):
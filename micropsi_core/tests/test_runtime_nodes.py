@@ -4,6 +4,7 @@
 """
 
 """
+import pytest
 from micropsi_core import runtime as micropsi
 
 __author__ = 'joscha'
@@ -84,7 +85,7 @@ def test_add_link(test_nodenet):
 
 
 def test_delete_link(test_nodenet):
-    micropsi.delete_link(test_nodenet, "ret_cb")
+    assert micropsi.delete_link(test_nodenet, "ret_cb") is True
     nodespace = micropsi.get_nodespace(test_nodenet, "Root", -1)
     assert len(nodespace["links"]) == 1
     assert "ret_cb" not in nodespace["links"]
@@ -110,6 +111,109 @@ def test_remove_nodes_linking_to_themselves(fixed_nodenet):
     micropsi.add_link(fixed_nodenet, 'A1', 'gen', 'A1', 'gen')
     assert micropsi.delete_node(fixed_nodenet, 'A1')
 
+def test_batch_operations(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    result, uids = micropsi.add_nodes(fixed_nodenet, [
+        {"type": "Register", "pos": (10, 10), "name": "first"},
+        {"type": "Register", "pos": (20, 10), "uid": "second"}])
+    assert uids[1] == "second"
+    assert nodenet.nodes[uids[0]].name == "first"
+
+    # invalid batches are rejected as a whole
+    with pytest.raises(KeyError):
+        micropsi.add_nodes(fixed_nodenet, [{"type": "Register", "pos": (0, 0)}, {"type": "Foo", "pos": (0, 0)}])
+    with pytest.raises(KeyError):
+        micropsi.add_links(fixed_nodenet, [
+            {"source_node_uid": uids[0], "gate_type": "gen", "target_node_uid": uids[1], "slot_type": "gen"},
+            {"source_node_uid": uids[0], "gate_type": "foo", "target_node_uid": uids[1], "slot_type": "gen"}])
+    assert len(nodenet.nodes) == 9
+    assert len(nodenet.links) == 4
+
+    result, link_uids = micropsi.add_links(fixed_nodenet, [
+        {"source_node_uid": uids[0], "gate_type": "gen", "target_node_uid": uids[1], "slot_type": "gen"},
+        {"source_node_uid": uids[1], "gate_type": "gen", "target_node_uid": "A1", "slot_type": "gen", "weight": 0.5},
+        {"source_node_uid": uids[0], "gate_type": "gen", "target_node_uid": uids[1], "slot_type": "gen",
+         "weight": 0.3}])
+    assert link_uids[0] == link_uids[2]
+    assert nodenet.links[link_uids[0]].weight == 0.3
+    assert nodenet.links[link_uids[1]].weight == 0.5
+
+    micropsi.delete_links(fixed_nodenet, [link_uids[0]])
+    assert link_uids[0] not in nodenet.links
+    micropsi.delete_nodes(fixed_nodenet, uids + ["A1"])
+    assert link_uids[1] not in nodenet.state['links']
+    assert set(nodenet.nodes.keys()) == {"A2", "B1", "B2", "S", "ACTA", "ACTB"}
+
+
+def test_get_nodenet_area_follows_node_changes(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    res, nodespace = micropsi.add_node(fixed_nodenet, "Nodespace", (10, 10), "Root", name="Area")
+    res, node1 = micropsi.add_node(fixed_nodenet, "Concept", (150, 150), nodespace)
+    res, node2 = micropsi.add_node(fixed_nodenet, "Concept", (5450, 150), nodespace)
+    assert set(micropsi.get_nodenet_area(fixed_nodenet, nodespace, 100, 200, 100, 200)['nodes']) == {node1}
+    assert nodenet.max_coords['x'] == 5400
+
+    micropsi.set_node_position(fixed_nodenet, node2, (120, 180))
+    assert set(micropsi.get_nodenet_area(fixed_nodenet, nodespace, 100, 200, 100, 200)['nodes']) == {node1, node2}
+    assert nodenet.max_coords['x'] == max(int(node.position[0] // 100 * 100) for node in nodenet.nodes.values())
+
+    micropsi.delete_node(fixed_nodenet, node1)
+    assert set(micropsi.get_nodenet_area(fixed_nodenet, nodespace, 100, 200, 100, 200)['nodes']) == {node2}
+    assert micropsi.get_nodenet_area(fixed_nodenet, "Root", 100, 200, 100, 200)['nodes'].get(node2) is None
+
+
+def test_get_nodespace_changes(fixed_nodenet):
+    nodenet = micropsi.get_nodenet(fixed_nodenet)
+    area = dict(x1=0, x2=1000, y1=0, y2=1000)
+    step = nodenet.current_step
+    # the journal only knows the changes since it has first been asked
+    assert micropsi.get_nodespace_changes(fixed_nodenet, "Root", step, **area)['full']
+    micropsi.step_nodenet(fixed_nodenet)
+    step = nodenet.current_step
+    data = micropsi.get_nodespace_changes(fixed_nodenet, "Root", step, **area)
+    assert not data['full']
+    assert data['nodes'] == {} and data['links'] == {}
+
+    micropsi.set_node_activation(fixed_nodenet, 'A1', 0.5)
+    res, node = micropsi.add_node(fixed_nodenet, "Concept", (150, 150), "Root")
+    micropsi.add_link(fixed_nodenet, node, 'gen', 'A2', 'gen')
+    micropsi.delete_node(fixed_nodenet, 'B2')
+    data = micropsi.get_nodespace_changes(fixed_nodenet, "Root", step, **area)
+    assert not data['full']
+    assert set(data['nodes']) == {'A1', node, 'A2'}
+    assert [link['source_node_uid'] for link in data['links'].values()] == [node]
+    assert 'B2' in data['deleted_nodes']
+    assert data['deleted_links'] and not any(uid in nodenet.links for uid in data['deleted_links'])
+
+    # as are states that node functions set while the net runs
+    micropsi.step_nodenet(fixed_nodenet)
+    step = nodenet.current_step
+    assert 'B1' not in micropsi.get_nodespace_changes(fixed_nodenet, "Root", step, **area)['nodes']
+    nodenet.nodes['B1'].set_state('seen', True)
+    data = micropsi.get_nodespace_changes(fixed_nodenet, "Root", step, **area)
+    assert data['nodes']['B1']['state'] == {'seen': True}
+
+    # nodes that leave the area are listed as deleted
+    res, lonely = micropsi.add_node(fixed_nodenet, "Concept", (250, 150), "Root")
+    micropsi.step_nodenet(fixed_nodenet)
+    step = nodenet.current_step
+    micropsi.set_node_position(fixed_nodenet, lonely, (5000, 5000))
+    micropsi.set_node_position(fixed_nodenet, node, (5000, 5000))
+    data = micropsi.get_nodespace_changes(fixed_nodenet, "Root", step, **area)
+    assert lonely in data['deleted_nodes']
+    # nodes that are linked to visible nodes are still shown
+    assert node in data['nodes']
+
+    # steps that are no longer in the journal are answered with the whole area
+    nodenet.journal.length = 1
+    for i in range(3):
+        micropsi.step_nodenet(fixed_nodenet)
+        micropsi.set_node_position(fixed_nodenet, 'A1', (100 + i, 100))
+        micropsi.get_nodespace_changes(fixed_nodenet, "Root", nodenet.current_step, **area)
+    data = micropsi.get_nodespace_changes(fixed_nodenet, "Root", step, **area)
+    assert data['full']
+    assert set(data['nodes']) == set(micropsi.get_nodenet_area(fixed_nodenet, "Root", **area)['nodes'])
+
 """
 
 
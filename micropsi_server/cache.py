@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+Response cache for read-only RPCs
+
+Many clients watching the same nodenet ask for the same nodespace, node types or world view in every step. The
+cache keeps the encoded responses of the read-only RPCs, so they are computed and serialized once per step and
+shared by all clients.
+
+A response is stored under the function, its arguments and the versions of the nodenet and world it belongs to:
+their current steps, the structure version of the nodenet and the version of its change journal. A response
+therefore expires as soon as the nodenet or world steps, or one of its entities changes. Changes that are not
+covered by these versions (e.g. a new node function, or a world object moved by the user) are handled by
+invalidating the whole cache after every RPC that is not read-only.
+
+The cache is bounded by the number of responses and by their total size in bytes; the least recently used responses
+are evicted first.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+from micropsi_core import runtime
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+# the default maximum number of cached responses
+DEFAULT_MAX_ENTRIES = 512
+
+# the default maximum total size of the cached responses, in bytes
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def get_versions(arguments):
+    """Returns the versions of the nodenet and world the arguments of an RPC refer to"""
+    nodenet = runtime.nodenets.get(arguments.get('nodenet_uid'))
+    world = runtime.worlds.get(arguments.get('world_uid'))
+    versions = ()
+    if nodenet is not None:
+        versions = (id(nodenet), nodenet.current_step, nodenet.structure_version, nodenet.journal.version)
+        if world is None:
+            world = nodenet.world
+    if world is not None:
+        versions += (id(world), world.current_step)
+    return versions
+
+
+class ResponseCache(object):
+    """A thread-safe LRU cache of encoded RPC responses.
+
+    Attributes:
+        max_entries: the maximum number of responses
+        max_bytes: the maximum total size of the responses
+        size: the current total size of the responses
+        generation: a counter that is increased whenever the cache is invalidated
+        hits, misses: the number of lookups that have found a response, and that have not
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_key(self, command, arguments, variant=None):
+        """Returns the key of a response, or None if the arguments cannot be used as part of a key"""
+        try:
+            frozen = json.dumps(arguments, sort_keys=True, separators=(',', ':'))
+        except (TypeError, ValueError):
+            return None
+        return command, frozen, get_versions(arguments), variant
+
+    def get(self, key):
+        """Returns the response stored under the given key, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, response, size, generation):
+        """Stores a response of the given size in bytes, and evicts the least recently used responses if the cache is
+        full. The response is not stored if it is larger than the whole cache, or if the cache has been invalidated
+        since the given generation, while the response was computed."""
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if generation != self.generation:
+                return
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self.entries[key] = (response, size)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                discarded_key, (discarded, discarded_size) = self.entries.popitem(last=False)
+                self.size -= discarded_size
+
+    def invalidate(self):
+        """Removes all responses"""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.generation += 1
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses
+            }
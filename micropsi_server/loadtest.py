@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Load test for the MicroPsi server
+
+Serves the app on a free local port, and lets a number of clients call RPCs on it at the same time: most clients
+fetch the nodespace of a synthetic nodenet, while some of them keep exporting the whole nodenet, which is slow.
+Reports the throughput and the latencies of the fast calls as JSON, for the threaded server or bottle's
+single-threaded wsgiref server.
+
+    python -m micropsi_server.loadtest --server threaded --clients 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+
+def start_server(app, server_type, workers):
+    """Serves the app on a free port in a background thread. Returns the port and a function that stops the server"""
+    from micropsi_server import server
+    if server_type == "threaded":
+        adapter = server.ThreadedServer(host='127.0.0.1', port=0, workers=workers)
+        thread = threading.Thread(target=adapter.run, args=(app,))
+        thread.daemon = True
+        thread.start()
+        adapter.started.wait()
+        return adapter.port, adapter.shutdown
+    else:
+        from wsgiref.simple_server import make_server
+        httpd = make_server('127.0.0.1', 0, app, handler_class=server.QuietHandler)
+        thread = threading.Thread(target=httpd.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        def stop():
+            httpd.shutdown()
+            httpd.server_close()
+        return httpd.server_port, stop
+
+
+def call(port, command, **kwargs):
+    """Calls the given RPC, and returns the time it took in seconds"""
+    request = urllib.request.Request("http://127.0.0.1:%d/rpc/%s" % (port, command),
+                                     data=json.dumps(kwargs).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def run_load_test(runtime, server_type="threaded", workers=8, clients=8, slow_clients=1, requests=20, size=300,
+                  topology="chain"):
+    """Builds a nodenet of the given topology and size, and lets the given number of clients call RPCs on the app
+    at the same time. Every fast client fetches the nodespace the given number of times; the slow clients export
+    the nodenet until the fast clients are done."""
+    from micropsi_core.benchmarks.benchmark import statistics
+    from micropsi_core.benchmarks.topologies import TOPOLOGIES
+    from micropsi_server import micropsi_app
+
+    success, uid = runtime.new_nodenet("Load test", "Default", owner="Load test")
+    TOPOLOGIES[topology](runtime.get_nodenet(uid).netapi, size)
+    port, stop = start_server(micropsi_app.bottle.default_app(), server_type, workers)
+    latencies = []
+    slow_latencies = []
+    done = threading.Event()
+
+    def fetch_nodespace():
+        for i in range(requests):
+            latencies.append(call(port, "get_nodespace", nodenet_uid=uid, nodespace="Root", step=-1))
+
+    def export_nodenet():
+        while not done.is_set():
+            slow_latencies.append(call(port, "export_nodenet", nodenet_uid=uid))
+
+    try:
+        slow = [threading.Thread(target=export_nodenet) for i in range(slow_clients)]
+        fast = [threading.Thread(target=fetch_nodespace) for i in range(clients - slow_clients)]
+        for thread in slow:
+            thread.start()
+        start = time.perf_counter()
+        for thread in fast:
+            thread.start()
+        for thread in fast:
+            thread.join()
+        duration = time.perf_counter() - start
+        done.set()
+        for thread in slow:
+            thread.join()
+    finally:
+        stop()
+        runtime.delete_nodenet(uid)
+
+    latencies.sort()
+    return {
+        'server': server_type,
+        'workers': workers if server_type == "threaded" else 1,
+        'clients': clients,
+        'slow_clients': slow_clients,
+        'nodes': size,
+        'requests': len(latencies),
+        'duration': duration,
+        'throughput': len(latencies) / duration,
+        'latency': dict(statistics(latencies), p95=latencies[int(len(latencies) * 0.95) - 1]),
+        'slow_latency': statistics(slow_latencies) if slow_latencies else None
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the concurrent RPC throughput of the MicroPsi server")
+    parser.add_argument("--server", default="threaded", choices=["threaded", "wsgiref"])
+    parser.add_argument("--workers", type=int, default=8, help="worker threads of the threaded server")
+    parser.add_argument("--clients", type=int, default=8, help="number of concurrent clients")
+    parser.add_argument("--slow-clients", type=int, default=1, help="clients that export the nodenet")
+    parser.add_argument("--requests", type=int, default=20, help="nodespace requests per fast client")
+    parser.add_argument("--size", type=int, default=300, help="node count of the nodenet")
+    parser.add_argument("--resource-path", help="directory for the nodenet (default: a temporary one)")
+    args = parser.parse_args(argv)
+
+    # keep the load test nodenet away from the user's data
+    import configuration
+    configuration.RESOURCE_PATH = args.resource_path or tempfile.mkdtemp(prefix="micropsi_loadtest")
+    for directory in ["nodenets", "worlds"]:
+        if not os.path.isdir(os.path.join(configuration.RESOURCE_PATH, directory)):
+            os.makedirs(os.path.join(configuration.RESOURCE_PATH, directory))
+    from micropsi_core import runtime
+
+    result = run_load_test(runtime, server_type=args.server, workers=args.workers, clients=args.clients,
+                           slow_clients=args.slow_clients, requests=args.requests, size=args.size)
+    json.dump(result, sys.stdout, indent=4, sort_keys=True)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,13 +21,32 @@ from micropsi_server import bottle
 from micropsi_server.bottle import route, post, run, request, response, template, static_file, redirect, error
 import argparse
 import os
+import gzip
 import json
 import inspect
 from micropsi_server import minidoc
+from micropsi_server import cache
+from micropsi_server import push
+from micropsi_server import server
 from configuration import DEFAULT_HOST, DEFAULT_PORT, VERSION, APPTITLE
+from configuration import DEFAULT_SERVER, SERVER_WORKERS, SERVER_SOCKET_TIMEOUT
+from configuration import RPC_CACHE_ENTRIES, RPC_CACHE_SIZE
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 APP_PATH = os.path.dirname(__file__)
 
+MSGPACK_CONTENT_TYPE = 'application/x-msgpack'
+
+# responses smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+# the gzip compression level; higher levels take much longer, but hardly compress JSON any better
+GZIP_LEVEL = 5
+
 bottle.debug(False)  # devV
 
 bottle.TEMPLATE_PATH.insert(0, os.path.join(APP_PATH, 'view', ''))
@@ -35,9 +54,11 @@ bottle.TEMPLATE_PATH.insert(1, os.path.join(APP_PATH, 'static', ''))
 
 # runtime = micropsi_core.runtime.MicroPsiRuntime()
 usermanager = usermanagement.UserManager()
+push_channel = push.PushChannel(max_polls=push.get_max_polls(SERVER_WORKERS))
+response_cache = cache.ResponseCache(max_entries=RPC_CACHE_ENTRIES, max_bytes=RPC_CACHE_SIZE)
 
 
-def rpc(command, route_prefix="/rpc/", method="GET", permission_required=None):
+def rpc(command, route_prefix="/rpc/", method="GET", permission_required=None, read_only=False, cached=False):
     """Defines a decorator for accessing API calls. Use it by specifying the
     API method, followed by the permissions necessary to execute the method.
     Within the calling web page, use http://<url>/rpc/<method>(arg1="val1", arg2="val2", ...)
@@ -58,8 +79,15 @@ def rpc(command, route_prefix="/rpc/", method="GET", permission_required=None):
         method (optional): the request method
         permission_required (optional): the type of permission necessary to execute the method;
             if omitted, permissions won't be tested by the decorator
+        read_only (optional): the method does not change anything; all other methods invalidate the response cache
+        cached (optional): the responses of the method are kept in the response cache (implies read_only)
     """
     def _decorator(func):
+        # the signature is looked up once; arguments the function does not take are rejected
+        spec = inspect.getfullargspec(func)
+        argument_names = frozenset(spec.args + spec.kwonlyargs)
+        takes_any_arguments = spec.varkw is not None
+
         @route(route_prefix + command, "POST")
         @route(route_prefix + command + "()", method)
         @route(route_prefix + command + "(:argument#.+#)", method)
@@ -68,15 +96,7 @@ def rpc(command, route_prefix="/rpc/", method="GET", permission_required=None):
             kwargs = {}
             if argument:
                 try:
-                    # split at commas and correct illegaly split lists:
-                    arglist = argument.split(",")
-                    kwargs = []
-                    for index, val in enumerate(arglist):
-                        if '=' not in val:
-                            kwargs[len(kwargs) - 1] = kwargs[-1:][0] + ',' + val  # ugly.
-                        else:
-                            kwargs.append(val)
-                    kwargs = dict((n.strip(), json.loads(v)) for n, v in (item.split('=') for item in kwargs))
+                    kwargs = parse_arguments(argument)
                 except ValueError as err:
                     response.status = 400
                     return {"Error": "Invalid arguments for remote procedure call: " + str(err)}
@@ -92,15 +112,24 @@ def rpc(command, route_prefix="/rpc/", method="GET", permission_required=None):
                 return {"Error": "Insufficient permissions for remote procedure call"}
             else:
                 #kwargs.update({"argument": argument, "permissions": permissions, "user_id": user_id, "token": token})
-                arguments = dict((name, kwargs[name]) for name in inspect.getargspec(func).args if name in kwargs)
-                arguments.update(kwargs)
+                arguments = kwargs or {}
+                if not takes_any_arguments:
+                    unknown = [name for name in arguments if name not in argument_names]
+                    if unknown:
+                        response.status = 400
+                        return {"Error": "Unknown arguments for remote procedure call: " + ", ".join(sorted(unknown))}
                 try:
-                    return json.dumps(func(**arguments))
+                    if cached:
+                        return get_cached_response(command, func, arguments)
+                    return encode_response(func(**arguments))
                 except Exception as err:
                     response.status = 500
                     response.content_type = 'application/json'
                     import traceback
                     return json.dumps({"Error": str(err), "Traceback": traceback.format_exc()})
+                finally:
+                    if not (read_only or cached):
+                        response_cache.invalidate()
                 
                 # except TypeError as err:
                 #     response.status = 400
@@ -109,6 +138,99 @@ def rpc(command, route_prefix="/rpc/", method="GET", permission_required=None):
     return _decorator
 
 
+_json_decoder = json.JSONDecoder()
+
+
+def parse_arguments(argument):
+    """Parses the argument string of an RPC in the URL, name1=<json value>,name2=<json value>,..., in one pass.
+    Commas and equal signs within the values are allowed. Raises ValueError if the string is malformed."""
+    kwargs = {}
+    position = 0
+    length = len(argument)
+    while position < length:
+        separator = argument.find('=', position)
+        if separator < 0:
+            raise ValueError("Expected name=value at position %d" % position)
+        name = argument[position:separator].strip()
+        if not name.isidentifier():
+            raise ValueError("Invalid argument name %r at position %d" % (name, position))
+        position = separator + 1
+        while position < length and argument[position].isspace():
+            position += 1
+        kwargs[name], position = _json_decoder.raw_decode(argument, position)
+        while position < length and argument[position].isspace():
+            position += 1
+        if position < length:
+            if argument[position] != ',':
+                raise ValueError("Expected a comma at position %d" % position)
+            position += 1
+    return kwargs
+
+
+def accepts(header, value, wildcard=None):
+    """Tells whether the given Accept or Accept-Encoding header accepts the value, i.e. lists it (or the wildcard)
+    with a quality above 0"""
+    qualities = {}
+    for token in header.split(','):
+        name, _, parameters = token.partition(';')
+        quality = 1
+        for parameter in parameters.split(';'):
+            key, _, number = parameter.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0
+        qualities[name.strip().lower()] = quality
+    if value in qualities:
+        return qualities[value] > 0
+    return wildcard is not None and qualities.get(wildcard, 0) > 0
+
+
+def get_response_encoding():
+    """Returns whether the client accepts MessagePack, and whether it accepts gzip. MessagePack is only used if the
+    client asks for it explicitly."""
+    return (msgpack is not None and accepts(request.headers.get('Accept', ''), MSGPACK_CONTENT_TYPE),
+            accepts(request.headers.get('Accept-Encoding', ''), 'gzip', wildcard='*'))
+
+
+def encode_response(result):
+    """Encodes the result of an RPC as compact JSON, or as MessagePack if the client accepts application/x-msgpack
+    and msgpack is installed. Large responses are compressed with gzip if the client accepts it."""
+    use_msgpack, use_gzip = get_response_encoding()
+    if use_msgpack:
+        response.content_type = MSGPACK_CONTENT_TYPE
+        body = msgpack.packb(result, use_bin_type=True)
+    else:
+        body = json.dumps(result, separators=(',', ':')).encode('utf-8')
+    response.set_header('Vary', 'Accept-Encoding')
+    if len(body) >= GZIP_MIN_SIZE and use_gzip:
+        response.set_header('Content-Encoding', 'gzip')
+        body = gzip.compress(body, GZIP_LEVEL)
+    return body
+
+
+def get_cached_response(command, func, arguments):
+    """Returns the encoded response of a read-only RPC from the response cache, or calls the function and stores its
+    encoded response, if there is none for the current step of the nodenet and world"""
+    key = response_cache.get_key(command, arguments, get_response_encoding())
+    if key is None:
+        return encode_response(func(**arguments))
+    cached = response_cache.get(key)
+    if cached is None:
+        generation = response_cache.generation
+        body = encode_response(func(**arguments))
+        cached = (body, response.content_type, response.get_header('Content-Encoding'))
+        response_cache.put(key, cached, len(body), generation)
+        return body
+    body, content_type, content_encoding = cached
+    response.content_type = content_type
+    response.set_header('Vary', 'Accept-Encoding')
+    if content_encoding:
+        response.set_header('Content-Encoding', content_encoding)
+    return body
+
+
 def get_request_data():
     """Helper function to determine the current user, permissions and token"""
     if request.get_cookie("token"):
@@ -451,6 +573,7 @@ def nodenet_mgt():
 def select_nodenet_from_console(nodenet_uid):
     user_id, permissions, token = get_request_data()
     result, uid = runtime.load_nodenet(nodenet_uid)
+    response_cache.invalidate()
     if not result:
         return template("error", msg="Could not select nodenet")
     response.set_cookie("selected_nodenet", nodenet_uid, path="/")
@@ -462,6 +585,7 @@ def delete_nodenet_from_console(nodenet_uid):
     user_id, permissions, token = get_request_data()
     if "manage nodenets" in permissions:
         runtime.delete_nodenet(nodenet_uid)
+        response_cache.invalidate()
         response.set_cookie('notification', '{"msg":"Nodenet deleted", "status":"success"}', path='/')
         redirect('/nodenet_mgt')
     return template("error", msg="Insufficient rights to access nodenet console")
@@ -490,9 +614,8 @@ def import_nodenet_form():
 @route("/nodenet/import", method="POST")
 def import_nodenet():
     user_id, p, t = get_request_data()
-    data = request.files['file_upload'].file.read()
-    data = data.decode('utf-8')
-    nodenet_uid = runtime.import_nodenet(data, owner=user_id)
+    nodenet_uid = runtime.import_nodenet(request.files['file_upload'].file, owner=user_id)
+    response_cache.invalidate()
     return dict(status='success', msg="Nodenet imported", nodenet_uid=nodenet_uid)
 
 
@@ -508,7 +631,8 @@ def merge_nodenet_form(nodenet_uid):
 
 @route("/nodenet/merge/<nodenet_uid>", method="POST")
 def merge_nodenet(nodenet_uid):
-    runtime.merge_nodenet(nodenet_uid, request.files['file_upload'].file.read())
+    runtime.merge_nodenet(nodenet_uid, request.files['file_upload'].file)
+    response_cache.invalidate()
     return dict(status='success', msg="Nodenet merged")
 
 
@@ -516,7 +640,7 @@ def merge_nodenet(nodenet_uid):
 def export_nodenet(nodenet_uid):
     response.set_header('Content-type', 'application/json')
     response.set_header('Content-Disposition', 'attachment; filename="nodenet.json"')
-    return runtime.export_nodenet(nodenet_uid)
+    return runtime.export_nodenet_stream(nodenet_uid)
 
 
 @route("/nodenet/edit")
@@ -560,6 +684,7 @@ def import_world():
     data = request.files['file_upload'].file.read()
     data = data.decode('utf-8')
     world_uid = runtime.import_world(data, owner=user_id)
+    response_cache.invalidate()
     return dict(status='success', msg="World imported", world_uid=world_uid)
 
 
@@ -656,12 +781,12 @@ def load_nodenet(nodenet_uid, **coordinates):
     return data
 
 
-@rpc("generate_uid")
+@rpc("generate_uid", read_only=True)
 def generate_uid():
     return micropsi_core.tools.generate_uid()
 
 
-@rpc("get_available_nodenets")
+@rpc("get_available_nodenets", read_only=True)
 def get_available_nodenets(user_id):
     return runtime.get_available_nodenets(user_id)
 
@@ -689,8 +814,8 @@ def delete_nodenet(nodenet_uid):
 
 
 @rpc("set_nodenet_properties", permission_required="manage nodenets")
-def set_nodenet_properties(nodenet_uid, nodenet_name=None, worldadapter=None, world_uid=None, owner=None):
-    return runtime.set_nodenet_properties(nodenet_uid, nodenet_name=nodenet_name, worldadapter=worldadapter, world_uid=world_uid, owner=owner)
+def set_nodenet_properties(nodenet_uid, nodenet_name=None, worldadapter=None, world_uid=None, owner=None, engine=None, file_format=None):
+    return runtime.set_nodenet_properties(nodenet_uid, nodenet_name=nodenet_name, worldadapter=worldadapter, world_uid=world_uid, owner=owner, engine=engine, file_format=file_format)
 
 
 @rpc("set_node_state")
@@ -711,16 +836,43 @@ def start_nodenetrunner(nodenet_uid):
 
 
 @rpc("set_nodenetrunner_timestep", permission_required="manage nodenets")
-def set_nodenetrunner_timestep(timestep):
-    return runtime.set_nodenetrunner_timestep(timestep)
+def set_nodenetrunner_timestep(timestep, nodenet_uid=None):
+    return runtime.set_nodenetrunner_timestep(timestep, nodenet_uid)
+
+
+@rpc("get_nodenetrunner_timestep", permission_required="manage server", read_only=True)
+def get_nodenetrunner_timestep(nodenet_uid=None):
+    return runtime.get_nodenetrunner_timestep(nodenet_uid)
 
 
-@rpc("get_nodenetrunner_timestep", permission_required="manage server")
-def get_nodenetrunner_timestep():
-    return runtime.get_nodenetrunner_timestep()
+@rpc("set_nodenetrunner_mode", permission_required="manage server")
+def set_nodenetrunner_mode(mode):
+    """Sets the mode of the nodenet runner: "shared" steps the active nodenets one after another, "workers" steps
+    each of them concurrently in a thread of its own. Both use a single core."""
+    return runtime.set_nodenetrunner_mode(mode)
 
 
-@rpc("get_is_nodenet_running")
+@rpc("get_nodenetrunner_mode", read_only=True)
+def get_nodenetrunner_mode():
+    return runtime.get_nodenetrunner_mode()
+
+
+@rpc("get_nodenetrunner_stats", read_only=True)
+def get_nodenetrunner_stats(nodenet_uid):
+    return runtime.get_nodenetrunner_stats(nodenet_uid)
+
+
+@rpc("set_autosave", permission_required="manage server")
+def set_autosave(interval=None, retention=None):
+    return runtime.set_autosave(interval, retention)
+
+
+@rpc("get_autosave_stats", read_only=True)
+def get_autosave_stats(nodenet_uid):
+    return runtime.get_autosave_stats(nodenet_uid)
+
+
+@rpc("get_is_nodenet_running", read_only=True)
 def get_is_nodenet_running(nodenet_uid):
     return {'nodenet_running': runtime.get_is_nodenet_running(nodenet_uid)}
 
@@ -735,17 +887,42 @@ def step_nodenet(nodenet_uid, nodespace=None):
     return runtime.step_nodenet(nodenet_uid, nodespace)
 
 
+@rpc("set_step_profiling", permission_required="manage nodenets")
+def set_step_profiling(nodenet_uid, enabled=True):
+    return runtime.set_step_profiling(nodenet_uid, enabled)
+
+
+@rpc("get_step_profile", read_only=True)
+def get_step_profile(nodenet_uid, top=10):
+    return runtime.get_step_profile(nodenet_uid, top)
+
+
+@rpc("set_native_module_sandbox", permission_required="manage nodenets")
+def set_native_module_sandbox(nodenet_uid, isolated=None, time_budget=None, max_overruns=None):
+    return runtime.set_native_module_sandbox(nodenet_uid, isolated, time_budget, max_overruns)
+
+
+@rpc("get_native_module_stats", read_only=True)
+def get_native_module_stats(nodenet_uid):
+    return runtime.get_native_module_stats(nodenet_uid)
+
+
+@rpc("enable_native_module", permission_required="manage nodenets")
+def enable_native_module(nodenet_uid, nodetype):
+    return runtime.enable_native_module(nodenet_uid, nodetype)
+
+
 @rpc("revert_nodenet", permission_required="manage nodenets")
 def revert_nodenet(nodenet_uid):
     return runtime.revert_nodenet(nodenet_uid)
 
 
-@rpc("save_nodenet", permission_required="manage nodenets")
+@rpc("save_nodenet", permission_required="manage nodenets", read_only=True)
 def save_nodenet(nodenet_uid):
     return runtime.save_nodenet(nodenet_uid)
 
 
-@rpc("export_nodenet")
+@rpc("export_nodenet", read_only=True)
 def export_nodenet_rpc(nodenet_uid):
     return runtime.export_nodenet(nodenet_uid)
 
@@ -759,7 +936,7 @@ def merge_nodenet(nodenet_uid, nodenet): return runtime.merge_nodenet
 
 
 # World
-@rpc("get_available_worlds")
+@rpc("get_available_worlds", read_only=True)
 def get_available_worlds(user_id=None):
     data = {}
     for uid, world in runtime.get_available_worlds(user_id).items():
@@ -767,7 +944,7 @@ def get_available_worlds(user_id=None):
     return data
 
 
-@rpc("get_world_properties")
+@rpc("get_world_properties", read_only=True)
 def get_world_properties(world_uid):
     try:
         return runtime.get_world_properties(world_uid)
@@ -775,12 +952,12 @@ def get_world_properties(world_uid):
         return {'Error': 'World %s not found' % world_uid}
 
 
-@rpc("get_worldadapters")
+@rpc("get_worldadapters", read_only=True)
 def get_worldadapters(world_uid):
     return runtime.get_worldadapters(world_uid)
 
 
-@rpc("get_world_objects")
+@rpc("get_world_objects", read_only=True)
 def get_world_objects(world_uid, type=None):
     try:
         return runtime.get_world_objects(world_uid, type)
@@ -827,7 +1004,7 @@ def new_world(world_name, world_type, owner=""):
     return runtime.new_world(world_name, world_type, owner)
 
 
-@rpc("get_available_world_types")
+@rpc("get_available_world_types", read_only=True)
 def get_available_world_types():
     return runtime.get_available_worldtypes()
 
@@ -837,7 +1014,7 @@ def delete_world(world_uid):
     return runtime.delete_world(world_uid)
 
 
-@rpc("get_world_view")
+@rpc("get_world_view", cached=True)
 def get_world_view(world_uid, step):
     try:
         return runtime.get_world_view(world_uid, step)
@@ -854,12 +1031,12 @@ def start_worldrunner(world_uid):
     return runtime.start_worldrunner(world_uid)
 
 
-@rpc("get_worldrunner_timestep")
+@rpc("get_worldrunner_timestep", read_only=True)
 def get_worldrunner_timestep():
     return runtime.get_worldrunner_timestep()
 
 
-@rpc("get_is_world_running")
+@rpc("get_is_world_running", read_only=True)
 def get_is_world_running(world_uid):
     return runtime.get_is_world_running(world_uid)
 
@@ -884,12 +1061,12 @@ def revert_world(world_uid):
     return runtime.revert_world(world_uid)
 
 
-@rpc("save_world", permission_required="manage worlds")
+@rpc("save_world", permission_required="manage worlds", read_only=True)
 def save_world(world_uid):
     return runtime.save_world(world_uid)
 
 
-@rpc("export_world")
+@rpc("export_world", read_only=True)
 def export_world_rpc(world_uid):
     return runtime.export_world(world_uid)
 
@@ -901,13 +1078,31 @@ def import_world_rpc(world_uid, worlddata):
 # Monitor
 
 @rpc("add_gate_monitor")
-def add_gate_monitor(nodenet_uid, node_uid, gate):
-    return runtime.add_gate_monitor(nodenet_uid, node_uid, gate)
+def add_gate_monitor(nodenet_uid, node_uid, gate, retention=None, downsampling=None):
+    return runtime.add_gate_monitor(nodenet_uid, node_uid, gate, retention, downsampling)
 
 
 @rpc("add_slot_monitor")
-def add_slot_monitor(nodenet_uid, node_uid, slot):
-    return runtime.add_slot_monitor(nodenet_uid, node_uid, slot)
+def add_slot_monitor(nodenet_uid, node_uid, slot, retention=None, downsampling=None):
+    return runtime.add_slot_monitor(nodenet_uid, node_uid, slot, retention, downsampling)
+
+
+@rpc("add_nodespace_monitor")
+def add_nodespace_monitor(nodenet_uid, nodespace_uid, gate='gen', threshold=0.0, retention=None,
+                          activation_retention=None):
+    return runtime.add_nodespace_monitor(nodenet_uid, nodespace_uid, gate, threshold, retention, activation_retention)
+
+
+@rpc("add_nodetype_monitor")
+def add_nodetype_monitor(nodenet_uid, nodetype, gate='gen', nodespace_uid=None, threshold=0.0, retention=None,
+                         activation_retention=None):
+    return runtime.add_nodetype_monitor(nodenet_uid, nodetype, gate, nodespace_uid, threshold, retention,
+                                        activation_retention)
+
+
+@rpc("get_monitor_activations", read_only=True)
+def get_monitor_activations(nodenet_uid, monitor_uid, from_step=None, to_step=None):
+    return runtime.get_monitor_activations(nodenet_uid, monitor_uid, from_step, to_step)
 
 
 @rpc("remove_monitor")
@@ -928,29 +1123,34 @@ def clear_monitor(nodenet_uid, monitor_uid):
         return dict(status='error', msg='unknown nodenet or monitor')
 
 
-@rpc("export_monitor_data")
+@rpc("export_monitor_data", read_only=True)
 def export_monitor_data(nodenet_uid, monitor_uid=None):
     return runtime.export_monitor_data(nodenet_uid, monitor_uid)
 
 
-@rpc("get_monitor_data")
-def get_monitor_data(nodenet_uid, step):
-    return runtime.get_monitor_data(nodenet_uid, step)
+@rpc("get_monitor_data", read_only=True)
+def get_monitor_data(nodenet_uid, step, from_step=None, to_step=None, resolution=None, since_step=None):
+    return runtime.get_monitor_data(nodenet_uid, step, from_step, to_step, resolution, since_step)
 
 # Nodenet
 
-@rpc("get_nodespace_list")
+@rpc("get_nodespace_list", cached=True)
 def get_nodespace_list(nodenet_uid):
     """ returns a list of nodespaces in the given nodenet."""
     return runtime.get_nodespace_list(nodenet_uid)
 
 
-@rpc("get_nodespace")
+@rpc("get_nodespace", cached=True)
 def get_nodespace(nodenet_uid, nodespace, step, **coordinates):
     return runtime.get_nodespace(nodenet_uid, nodespace, step, **coordinates)
 
 
-@rpc("get_node")
+@rpc("get_nodespace_changes", read_only=True)
+def get_nodespace_changes(nodenet_uid, nodespace, since_step, **coordinates):
+    return runtime.get_nodespace_changes(nodenet_uid, nodespace, since_step, **coordinates)
+
+
+@rpc("get_node", read_only=True)
 def get_node(nodenet_uid, node_uid):
     return runtime.get_node(nodenet_uid, node_uid)
 
@@ -964,6 +1164,12 @@ def add_node(nodenet_uid, type, pos, nodespace, state=None, uid=None, name="", p
         return dict(status="error", msg=uid)
 
 
+@rpc("add_nodes", permission_required="manage nodenets")
+def add_nodes(nodenet_uid, nodes):
+    result, uids = runtime.add_nodes(nodenet_uid, nodes)
+    return dict(status="success", uids=uids)
+
+
 @rpc("set_node_position", permission_required="manage nodenets")
 def set_node_position(nodenet_uid, node_uid, pos):
     return runtime.set_node_position(nodenet_uid, node_uid, pos)
@@ -979,22 +1185,27 @@ def delete_node(nodenet_uid, node_uid):
     return runtime.delete_node(nodenet_uid, node_uid)
 
 
+@rpc("delete_nodes", permission_required="manage nodenets")
+def delete_nodes(nodenet_uid, node_uids):
+    return runtime.delete_nodes(nodenet_uid, node_uids)
+
+
 @rpc("align_nodes", permission_required="manage nodenets")
 def align_nodes(nodenet_uid, nodespace):
     return runtime.align_nodes(nodenet_uid, nodespace)
 
 
-@rpc("get_available_node_types")
+@rpc("get_available_node_types", cached=True)
 def get_available_node_types(nodenet_uid=None):
     return runtime.get_available_node_types(nodenet_uid)
 
 
-@rpc("get_available_native_module_types")
+@rpc("get_available_native_module_types", read_only=True)
 def get_available_native_module_types(nodenet_uid):
     return runtime.get_available_native_module_types(nodenet_uid)
 
 
-@rpc("get_nodefunction")
+@rpc("get_nodefunction", cached=True)
 def get_nodefunction(nodenet_uid, node_type):
     return runtime.get_nodefunction(nodenet_uid, node_type)
 
@@ -1019,17 +1230,17 @@ def delete_node_type(nodenet_uid, node_type):
     return runtime.delete_node_type(nodenet_uid, node_type)
 
 
-@rpc("get_slot_types")
+@rpc("get_slot_types", read_only=True)
 def get_slot_types(nodenet_uid, node_type):
     return runtime.get_slot_types(nodenet_uid, node_type)
 
 
-@rpc("get_gate_types")
+@rpc("get_gate_types", read_only=True)
 def get_gate_types(nodenet_uid, node_type):
     return runtime.get_gate_types(nodenet_uid, node_type)
 
 
-@rpc("get_gate_function")
+@rpc("get_gate_function", read_only=True)
 def get_gate_function(nodenet_uid, nodespace, node_type, gate_type):
     try:
         return runtime.get_gate_function(nodenet_uid, nodespace, node_type, gate_type)
@@ -1051,12 +1262,12 @@ def set_gate_parameters(nodenet_uid, node_uid, gate_type, parameters):
     return runtime.set_gate_parameters(nodenet_uid, node_uid, gate_type, parameters)
 
 
-@rpc("get_available_datasources")
+@rpc("get_available_datasources", cached=True)
 def get_available_datasources(nodenet_uid):
     return runtime.get_available_datasources(nodenet_uid)
 
 
-@rpc("get_available_datatargets")
+@rpc("get_available_datatargets", read_only=True)
 def get_available_datatargets(nodenet_uid):
     return runtime.get_available_datatargets(nodenet_uid)
 
@@ -1076,12 +1287,18 @@ def add_link(nodenet_uid, source_node_uid, gate_type, target_node_uid, slot_type
     return runtime.add_link(nodenet_uid, source_node_uid, gate_type, target_node_uid, slot_type, weight=weight, uid=uid)
 
 
+@rpc("add_links", permission_required="manage nodenets")
+def add_links(nodenet_uid, links):
+    result, uids = runtime.add_links(nodenet_uid, links)
+    return dict(status="success", uids=uids)
+
+
 @rpc("set_link_weight", permission_required="manage nodenets")
 def set_link_weight(nodenet_uid, link_uid, weight, certainty=1):
     return runtime.set_link_weight(nodenet_uid, link_uid, weight, certainty)
 
 
-@rpc("get_link")
+@rpc("get_link", read_only=True)
 def get_link(nodenet_uid, link_uid):
     return runtime.get_link(nodenet_uid, link_uid)
 
@@ -1091,6 +1308,11 @@ def delete_link(nodenet_uid, link_uid):
     return runtime.delete_link(nodenet_uid, link_uid)
 
 
+@rpc("delete_links", permission_required="manage nodenets")
+def delete_links(nodenet_uid, link_uids):
+    return runtime.delete_links(nodenet_uid, link_uids)
+
+
 @rpc("reload_native_modules", permission_required="manage nodenets")
 def reload_native_modules(nodenet_uid=None):
     return runtime.reload_native_modules(nodenet_uid)
@@ -1104,26 +1326,63 @@ def set_logging_levels(system=None, world=None, nodenet=None):
     return dict(status="success")
 
 
-@rpc("get_logger_messages")
+@rpc("get_logger_messages", read_only=True)
 def get_logger_messages(logger=[], after=0):
     return runtime.get_logger_messages(logger, after)
 
 
-@rpc("get_monitoring_info")
-def get_monitoring_info(nodenet_uid, logger=[], after=0):
-    data = runtime.get_monitor_data(nodenet_uid, 0)
+@rpc("get_monitoring_info", read_only=True)
+def get_monitoring_info(nodenet_uid, logger=[], after=0, from_step=None, resolution=None, since_step=None):
+    data = runtime.get_monitor_data(nodenet_uid, 0, from_step=from_step, resolution=resolution, since_step=since_step)
     data['logs'] = runtime.get_logger_messages(logger, after)
     return data
 
 
+# --------- push channel --------
+
+
+@rpc("subscribe", read_only=True)
+def subscribe(client_id=None, nodenet_uid=None, nodespace="Root", x1=0, x2=-1, y1=0, y2=-1, since_step=None,
+              monitors=False, from_step=None, resolution=None, world_uid=None, logger=[], after=0):
+    client_id = push_channel.subscribe(client_id, nodenet_uid=nodenet_uid, nodespace=nodespace,
+                                       coordinates={'x1': x1, 'x2': x2, 'y1': y1, 'y2': y2}, since_step=since_step,
+                                       monitors=monitors, from_step=from_step, resolution=resolution,
+                                       world_uid=world_uid, loggers=logger, log_time=after)
+    return {'client_id': client_id}
+
+
+@rpc("unsubscribe", read_only=True)
+def unsubscribe(client_id):
+    push_channel.unsubscribe(client_id)
+    return True
+
+
+@rpc("get_updates", read_only=True)
+def get_updates(client_id, timeout=push.POLL_TIMEOUT):
+    return push_channel.get_updates(client_id, timeout)
+
+
 # -----------------------------------------------------------------------------------------------
 
-def main(host=DEFAULT_HOST, port=DEFAULT_PORT):
-    run(host=host, port=port, quiet=True)  # devV
+def main(host=DEFAULT_HOST, port=DEFAULT_PORT, server_type=DEFAULT_SERVER, workers=SERVER_WORKERS,
+         socket_timeout=SERVER_SOCKET_TIMEOUT):
+    push_channel.max_polls = push.get_max_polls(workers if server_type == "threaded" else 1)
+    if server_type == "threaded":
+        adapter = server.ThreadedServer(host=host, port=port, workers=workers, socket_timeout=socket_timeout)
+        # stop serving requests before the runners are stopped
+        runtime.add_signal_handler(adapter.shutdown, first=True)
+        run(server=adapter, quiet=True)
+    else:
+        run(host=host, port=port, quiet=True)  # devV
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Start the %s server." % APPTITLE)
     parser.add_argument('-d', '--host', type=str, default=DEFAULT_HOST)
     parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('-s', '--server', type=str, default=DEFAULT_SERVER, choices=["threaded", "wsgiref"])
+    parser.add_argument('-w', '--workers', type=int, default=SERVER_WORKERS)
+    parser.add_argument('-t', '--socket-timeout', type=float, default=SERVER_SOCKET_TIMEOUT,
+                        help="seconds a connection may stay silent while a request or response is transferred")
     args = parser.parse_args()
-    main(host=args.host, port=args.port)
+    main(host=args.host, port=args.port, server_type=args.server, workers=args.workers,
+         socket_timeout=args.socket_timeout)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+"""
+Push channel for the browser clients
+
+Instead of polling get_nodespace, get_monitoring_info and get_logger_messages on timers, a client subscribes to the
+nodenet, nodespace, world and loggers it shows, and then calls get_updates in a loop. get_updates blocks until there
+is something new for the client (long polling), and returns everything in one batch.
+
+Every batch is put together from the current state when it is sent, and only contains what has changed since the
+last batch the client has received. A slow client therefore never falls behind: the steps in between are merged into
+one batch, and their number is reported as "dropped_steps".
+
+Every waiting client occupies a worker thread of the server, so only some of the workers may wait at the same time.
+If that many clients are waiting already, get_updates does not wait either, and returns an empty batch marked as
+"busy" if there is nothing new; the client then polls on its own for a while (see PushClient in dialogs.js).
+"""
+
+import threading
+import time
+
+import micropsi_core.tools
+from micropsi_core import runtime
+from micropsi_server.server import DEFAULT_WORKERS
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+# the longest time a call to get_updates waits for something new, in seconds
+POLL_TIMEOUT = 10
+
+# the longest time between two checks for new data that is not announced by a step, e.g. log messages, in seconds
+CHECK_INTERVAL = 0.25
+
+# subscriptions that have not been polled for this many seconds are removed
+SUBSCRIPTION_TIMEOUT = 60
+
+# the share of the worker threads of the server that may wait for updates; the others stay free for other requests
+POLL_WORKER_SHARE = 0.5
+
+
+def get_max_polls(workers):
+    """Returns the number of clients that may wait for updates at the same time on a server with the given number of
+    worker threads"""
+    return int(workers * POLL_WORKER_SHARE)
+
+
+class Subscription(object):
+    """The topics a client has subscribed to, and how far the client has seen them.
+
+    Attributes:
+        nodenet_uid, nodespace, coordinates: the visible area of the nodenet; without a nodespace, only the monitors
+            of the nodenet are pushed
+        monitors: if True, the values of the monitors of the nodenet are pushed, too
+        from_step, resolution: the window of monitor values the client shows, for monitors it has not seen yet
+        world_uid: the world, or None
+        loggers: a list of the names of the loggers
+        nodenet_step, world_step: the last step of the nodenet and world the client has seen, or None. The first
+            step is given as since_step, if the client already shows the nodespace as of that step
+        nodenet_version: the structure and journal versions of the nodenet the client has seen, or None
+        monitor_cursors: the cursors of the monitor values the client has seen
+        log_time: the time of the log messages the client has seen
+        last_poll: the time of the last call to get_updates
+    """
+
+    def __init__(self, nodenet_uid=None, nodespace="Root", coordinates=None, since_step=None, monitors=False,
+                 from_step=None, resolution=None, world_uid=None, loggers=None, log_time=0):
+        self.nodenet_uid = nodenet_uid
+        self.nodespace = nodespace
+        self.coordinates = coordinates or {}
+        self.monitors = monitors
+        self.from_step = from_step
+        self.resolution = resolution
+        self.world_uid = world_uid
+        self.loggers = loggers or []
+        self.nodenet_step = since_step
+        self.nodenet_version = None
+        self.world_step = None
+        self.monitor_cursors = {}
+        self.log_time = log_time
+        self.last_poll = time.time()
+
+    def get_nodenet(self):
+        return runtime.nodenets.get(self.nodenet_uid) if self.nodenet_uid else None
+
+    def get_world(self):
+        return runtime.worlds.get(self.world_uid) if self.world_uid else None
+
+    def has_updates(self):
+        """Tells whether there is something the client has not seen"""
+        nodenet = self.get_nodenet()
+        if nodenet is not None and (nodenet.current_step != self.nodenet_step or
+                                    (nodenet.structure_version, nodenet.journal.version) != self.nodenet_version):
+            return True
+        world = self.get_world()
+        if world is not None and world.current_step != self.world_step:
+            return True
+        if self.loggers and runtime.get_logger_messages(self.loggers, self.log_time)['logs']:
+            return True
+        return False
+
+    def get_updates(self):
+        """Returns everything that has changed since the last call, and marks it as seen"""
+        updates = {'dropped_steps': 0}
+        nodenet = self.get_nodenet()
+        if nodenet is not None:
+            current_step = nodenet.current_step
+            if self.nodespace is not None:
+                data = runtime.get_nodespace_changes(self.nodenet_uid, self.nodespace, self.nodenet_step,
+                                                     **self.coordinates)
+                current_step = data['current_step']
+                updates['nodespace'] = data
+            # taken after the changes, because putting them together records the activations in the journal
+            self.nodenet_version = (nodenet.structure_version, nodenet.journal.version)
+            if self.nodenet_step is not None:
+                updates['dropped_steps'] = max(0, current_step - self.nodenet_step - 1)
+            self.nodenet_step = current_step
+            if self.monitors:
+                data = runtime.get_monitor_data(self.nodenet_uid, from_step=self.from_step,
+                                                resolution=self.resolution, since_step=self.monitor_cursors)
+                self.monitor_cursors = dict((uid, monitor['cursor']) for uid, monitor in data['monitors'].items())
+                updates['monitors'] = data
+        world = self.get_world()
+        if world is not None:
+            self.world_step = world.current_step
+            updates['world'] = world.get_world_view(self.world_step)
+        if self.loggers:
+            data = runtime.get_logger_messages(self.loggers, self.log_time)
+            if data['logs']:
+                # get_logger_messages returns the messages from the given time on, including that time
+                self.log_time = data['logs'][-1]['time'] + 0.001
+            updates['logs'] = data
+        return updates
+
+
+class PushChannel(object):
+    """Keeps the subscriptions of the clients, and answers their long polls.
+
+    Attributes:
+        subscriptions: a dict of client ids and their subscriptions
+        max_polls: the number of clients that may wait for updates at the same time
+        polls: the number of clients that are waiting
+    """
+
+    def __init__(self, max_polls=get_max_polls(DEFAULT_WORKERS)):
+        self.subscriptions = {}
+        self.max_polls = max_polls
+        self.polls = 0
+        self.lock = threading.Lock()
+
+    def subscribe(self, client_id=None, **topics):
+        """Subscribes a client to the given topics (see Subscription), or changes the topics of a client that has
+        subscribed before. Returns the client id."""
+        with self.lock:
+            self.remove_expired()
+            client_id = client_id or micropsi_core.tools.generate_uid()
+            self.subscriptions[client_id] = Subscription(**topics)
+        return client_id
+
+    def unsubscribe(self, client_id):
+        with self.lock:
+            self.subscriptions.pop(client_id, None)
+
+    def remove_expired(self):
+        deadline = time.time() - SUBSCRIPTION_TIMEOUT
+        for client_id, subscription in list(self.subscriptions.items()):
+            if subscription.last_poll < deadline:
+                del self.subscriptions[client_id]
+
+    def get_updates(self, client_id, timeout=POLL_TIMEOUT):
+        """Waits until there is something new for the given client, or the timeout has passed, and returns the
+        updates. If too many clients are waiting already, returns at once, with {"busy": True} if there is nothing new.
+        Raises KeyError if the client has not subscribed, or its subscription has expired."""
+        subscription = self.subscriptions[client_id]
+        subscription.last_poll = time.time()
+        with self.lock:
+            waiting = self.polls < self.max_polls
+            if waiting:
+                self.polls += 1
+        if not waiting:
+            if subscription.has_updates():
+                return subscription.get_updates()
+            return {'dropped_steps': 0, 'busy': True}
+        try:
+            deadline = subscription.last_poll + min(timeout, POLL_TIMEOUT)
+            while not subscription.has_updates():
+                left = deadline - time.time()
+                if left <= 0:
+                    break
+                runtime.wait_for_step(min(left, CHECK_INTERVAL))
+        finally:
+            with self.lock:
+                self.polls -= 1
+        subscription.last_poll = time.time()
+        return subscription.get_updates()
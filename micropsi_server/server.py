@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+Multi-threaded WSGI server for the MicroPsi app
+
+bottle's default server handles one request after the other, so a slow request (e.g. exporting a large nodenet, or
+a long poll of the push channel) blocks every other client. The server in this module hands the requests to a pool
+of worker threads instead. It only uses the standard library.
+
+The server is multi-threaded rather than multi-process, because the nodenets and worlds live in the memory of the
+runtime and are shared by all requests.
+"""
+
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+
+from micropsi_server import bottle
+
+__author__ = 'joscha'
+__date__ = '18.10.14'
+
+# the default number of worker threads
+DEFAULT_WORKERS = 10
+
+# the default time in seconds a connection may stay silent while a request is read or a response is written; it does
+# not limit the time the app takes to process the request
+DEFAULT_SOCKET_TIMEOUT = 60
+
+# the default time in seconds a shutdown waits for the requests that are being handled
+DEFAULT_SHUTDOWN_TIMEOUT = 60
+
+
+class QuietHandler(WSGIRequestHandler):
+    """Does not look up the host names of the clients, and does not log every request"""
+
+    def address_string(self):
+        return self.client_address[0]
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class ThreadPoolWSGIServer(WSGIServer):
+    """A WSGI server that handles the requests in a pool of worker threads.
+
+    If all workers are busy, no further connections are accepted until one becomes free; the connections wait in the
+    listen queue of the socket.
+
+    Attributes:
+        workers: the number of worker threads
+        socket_timeout: the socket timeout of the connections, in seconds; it does not limit the processing time
+    """
+
+    request_queue_size = 64
+
+    def __init__(self, server_address, handler_class=QuietHandler, workers=DEFAULT_WORKERS,
+                 socket_timeout=DEFAULT_SOCKET_TIMEOUT):
+        self.workers = workers
+        self.socket_timeout = socket_timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="RequestWorker")
+        self.slots = threading.BoundedSemaphore(workers)
+        WSGIServer.__init__(self, server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        self.slots.acquire()
+        try:
+            self.executor.submit(self.process_request_in_worker, request, client_address)
+        except RuntimeError:
+            # the executor has been shut down
+            self.slots.release()
+            self.shutdown_request(request)
+
+    def process_request_in_worker(self, request, client_address):
+        try:
+            request.settimeout(self.socket_timeout)
+            self.finish_request(request, client_address)
+        except socket.timeout:
+            logging.getLogger("system").warning("Request from %s timed out" % client_address[0])
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def drain(self, timeout):
+        """Waits until the requests that are being handled are finished, at most for the given time in seconds.
+        Returns True if all of them have finished."""
+        deadline = time.time() + timeout
+        acquired = 0
+        while acquired < self.workers and self.slots.acquire(timeout=max(0, deadline - time.time())):
+            acquired += 1
+        for i in range(acquired):
+            self.slots.release()
+        self.executor.shutdown(wait=False)
+        return acquired == self.workers
+
+
+class ThreadedServer(bottle.ServerAdapter):
+    """bottle server adapter for the ThreadPoolWSGIServer.
+
+    Options:
+        workers: the number of worker threads
+        socket_timeout: the socket timeout of the connections, in seconds
+        shutdown_timeout: the longest time a shutdown waits for the running requests, in seconds
+    """
+
+    def __init__(self, host='127.0.0.1', port=8080, **options):
+        bottle.ServerAdapter.__init__(self, host, port, **options)
+        self.server = None
+        self.started = threading.Event()
+
+    def run(self, app):
+        self.server = ThreadPoolWSGIServer(
+            (self.host, self.port),
+            workers=self.options.get('workers', DEFAULT_WORKERS),
+            socket_timeout=self.options.get('socket_timeout', DEFAULT_SOCKET_TIMEOUT))
+        self.server.set_app(app)
+        self.port = self.server.server_address[1]
+        # serve in a thread of its own, so shutdown can be called from a signal handler in this thread
+        thread = threading.Thread(target=self.server.serve_forever, name="WSGIServer")
+        thread.daemon = True
+        thread.start()
+        self.started.set()
+        while thread.is_alive():
+            thread.join(0.5)
+
+    def shutdown(self, signal=None, frame=None):
+        """Stops accepting connections, and waits for the requests that are being handled. Can be used as a
+        signal handler of the runtime."""
+        if self.server is None:
+            return
+        self.server.shutdown()
+        if not self.server.drain(self.options.get('shutdown_timeout', DEFAULT_SHUTDOWN_TIMEOUT)):
+            logging.getLogger("system").warning("Shutting down with requests still running")
+        self.server.server_close()
@@ -173,6 +173,87 @@ var api = {
     EmptyCallback: function (){}
 };
 
+// the time a push client waits before it tries again, after the server has been busy or an error, in ms
+var PUSH_RETRY_INTERVAL = 5000;
+
+// a client of the push channel of the server: a view subscribes to what it shows, and then the server sends
+// everything new to the callback as soon as it happens (long polling, see get_updates).
+// While the push channel is not available (the server is busy, or an error occurred), active is false and the
+// fallback is called, which should poll on a timer for as long as the client is not active.
+function PushClient(callback, fallback){
+    this.callback = callback;
+    this.fallback = fallback;
+    this.client_id = null;
+    this.topics = null;
+    this.active = false;
+    // increased with every subscription, so that the answers to older ones are ignored
+    this.generation = 0;
+}
+
+PushClient.prototype.subscribe = function(topics){
+    var self = this;
+    var generation = ++self.generation;
+    self.topics = topics;
+    api.call('subscribe', $.extend({client_id: self.client_id}, topics), function(data){
+        if(generation == self.generation){
+            self.client_id = data.client_id;
+            self.poll(generation);
+        }
+    }, function(){
+        self.retry(generation);
+    });
+};
+
+PushClient.prototype.unsubscribe = function(){
+    this.generation++;
+    this.active = false;
+    if(this.client_id){
+        api.call('unsubscribe', {client_id: this.client_id}, api.EmptyCallback, api.EmptyCallback);
+        this.client_id = null;
+    }
+};
+
+PushClient.prototype.poll = function(generation){
+    var self = this;
+    api.call('get_updates', {client_id: self.client_id}, function(data){
+        if(generation != self.generation){
+            return;
+        }
+        if(data.busy){
+            self.retry(generation);
+        } else {
+            self.active = true;
+            self.callback(data);
+            self.poll(generation);
+        }
+    }, function(){
+        // e.g. the subscription has expired, or the server has been restarted
+        if(generation == self.generation){
+            self.client_id = null;
+        }
+        self.retry(generation);
+    });
+};
+
+// falls back to polling, and tries to subscribe again after a while
+PushClient.prototype.retry = function(generation){
+    var self = this;
+    if(generation != self.generation){
+        return;
+    }
+    self.active = false;
+    self.fallback();
+    setTimeout(function(){
+        if(generation == self.generation){
+            if(self.client_id){
+                self.poll(generation);
+            } else {
+                self.subscribe(self.topics);
+            }
+        }
+    }, PUSH_RETRY_INTERVAL);
+};
+
 
 $(function() {
 
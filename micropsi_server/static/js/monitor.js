@@ -13,6 +13,10 @@ $(function(){
     var nodenetMonitors = {};
     var currentMonitors = [];
 
+    // the values received so far, and the step of the newest value of every monitor
+    var monitorValues = {};
+    var monitorCursors = {};
+
     var currentNodenet = null;
 
     var nodenet_running = false;
@@ -31,6 +35,18 @@ $(function(){
 
     var log_container = $('#logs');
 
+    // the server pushes new monitor values and log messages; while it can not, we poll for them
+    var monitorPush = new PushClient(function(data){
+        if(data.monitors){
+            setMonitorData(data.monitors);
+            nodenet_running = data.monitors.nodenet_running;
+            currentSimulationStep = data.monitors.current_step;
+        }
+        if(data.logs){
+            setLoggingData(data);
+        }
+    }, pollMonitoringData);
+
     init();
 
     $(document).on('monitorsChanged', function(){
@@ -39,13 +55,15 @@ $(function(){
         }
     });
     $(document).on('nodenetStepped', function(){
-        if(!nodenet_running){
+        if(!nodenet_running && !monitorPush.active){
             pollMonitoringData();
         }
     });
     $(document).on('nodenetChanged', function(data, newNodenet){
         currentNodenet = newNodenet;
-        pollMonitoringData();
+        monitorValues = {};
+        monitorCursors = {};
+        subscribe();
     });
 
 
@@ -63,27 +81,51 @@ $(function(){
                 currentMonitors = Object.keys(nodenetMonitors);
                 currentSimulationStep = data.step;
                 nodenet_running = data.is_active;
-                pollMonitoringData();
+                subscribe();
             });
         }
     }
 
-    function pollMonitoringData(){
-        var poll = [];
+    function getCapturedLoggers(){
+        var loggers = [];
         for(var logger in capturedLoggers){
             if(capturedLoggers[logger]){
-                poll.push(logger);
+                loggers.push(logger);
             }
         }
-        api.call('get_monitoring_info', {
+        return loggers;
+    }
+
+    // subscribe to the monitors of the current nodenet and the captured loggers
+    function subscribe(){
+        monitorPush.subscribe({
             nodenet_uid: currentNodenet,
-            logger: poll,
+            nodespace: null,
+            monitors: true,
+            from_step: Math.max(0, currentSimulationStep - viewProperties.xvalues),
+            resolution: Math.max(1, Math.floor(container.width())),
+            logger: getCapturedLoggers(),
             after: last_logger_call
+        });
+    }
+
+    function pollMonitoringData(){
+        api.call('get_monitoring_info', {
+            nodenet_uid: currentNodenet,
+            logger: getCapturedLoggers(),
+            after: last_logger_call,
+            from_step: Math.max(0, currentSimulationStep - viewProperties.xvalues),
+            resolution: Math.max(1, Math.floor(container.width())),
+            since_step: monitorCursors
         }, function(data){
             setMonitorData(data);
             setLoggingData(data);
             nodenet_running = data.nodenet_running;
             currentSimulationStep = data.current_step;
+            if(monitorPush.active){
+                // the values are pushed from now on
+                return;
+            }
             if(nodenet_running){
                 window.setTimeout(pollMonitoringData, 500);
             } else {
@@ -94,6 +136,9 @@ $(function(){
     }
 
     function pollActive(){
+        if(monitorPush.active){
+            return;
+        }
         api.call('get_is_nodenet_running', {nodenet_uid: currentNodenet}, function(data){
             nodenet_running = data.nodenet_running;
             if(nodenet_running){
@@ -108,6 +153,34 @@ $(function(){
     }
 
     function setMonitorData(data){
+        var xstart = Math.max(viewProperties.xvalues, data.current_step) - viewProperties.xvalues;
+        for (var uid in data.monitors) {
+            var monitor = data.monitors[uid];
+            if (!(uid in monitorCursors) || monitorCursors[uid] > data.current_step) {
+                // a fresh window, or the nodenet has been reverted
+                monitorValues[uid] = {};
+            }
+            for (var step in monitor.values) {
+                monitorValues[uid][step] = monitor.values[step];
+            }
+            for (var step in monitorValues[uid]) {
+                if (parseInt(step, 10) < xstart) {
+                    delete monitorValues[uid][step];
+                }
+            }
+            if (monitor.cursor !== null && monitor.interval == 1) {
+                monitorCursors[uid] = monitor.cursor;
+            } else {
+                delete monitorCursors[uid];
+            }
+            monitor.values = monitorValues[uid];
+        }
+        for (var uid in monitorCursors) {
+            if (!(uid in data.monitors)) {
+                delete monitorCursors[uid];
+                delete monitorValues[uid];
+            }
+        }
         updateMonitorList(data.monitors);
         nodenetMonitors = data.monitors;
         var m = {};
@@ -138,6 +211,9 @@ $(function(){
             var el = $(event.target);
             capturedLoggers[el.attr('data')] = el.attr('checked')
             $.cookie('capturedLoggers', JSON.stringify(capturedLoggers), {path:'/', expires:7})
+            if(currentNodenet){
+                subscribe();
+            }
         });
         $('.log_level_switch').on('change', function(event){
             var el = $(event.target);
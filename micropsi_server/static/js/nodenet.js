@@ -119,6 +119,14 @@ worldadapters = {};
 currentSimulationStep = 0;
 nodenetRunning = false;
 
+// the server pushes the changes of the visible part of the nodespace; while it can not, we poll for them
+nodespacePush = new PushClient(function(data){
+    if(data.nodespace){
+        applyNodespaceUpdates(data.nodespace);
+    }
+}, refreshNodespaceChanges);
+subscribedView = null;
+
 get_available_worlds();
 refreshNodenetList();
 
@@ -255,6 +263,7 @@ function setCurrentNodenet(uid, nodespace){
             } else {
                 setNodespaceData(data, (nodespaceChanged));
             }
+            subscribeNodespace();
             refreshNodenetList();
         },
         function(data) {
@@ -303,74 +312,121 @@ function setNodespaceData(data, changed){
                 if (uid in selection) delete selection[uid];
             }
         }
-        for(uid in data.nodes){
-            item = new Node(uid, data.nodes[uid]['position'][0], data.nodes[uid]['position'][1], data.nodes[uid].parent_nodespace, data.nodes[uid].name, data.nodes[uid].type, data.nodes[uid].sheaves, data.nodes[uid].state, data.nodes[uid].parameters, data.nodes[uid].gate_activations, data.nodes[uid].gate_parameters);
-            if(uid in nodes){
-                if(nodeRedrawNeeded(item)) {
-                    nodes[uid].update(item);
-                    redrawNode(nodes[uid], true);
-                } else {
-                    nodes[uid].update(item);
-                }
-            } else{
-                addNode(item);
-            }
-        }
-        for(uid in data.nodespaces){
-            item = new Node(uid, data.nodespaces[uid]['position'][0], data.nodespaces[uid]['position'][1], data.nodespaces[uid].parent_nodespace, data.nodespaces[uid].name, "Nodespace", 0, data.nodespaces[uid].state);
-            if(uid in nodes){
-                redrawNode(item);
-                nodes[uid].update(item);
-            } else{
-                addNode(item);
-            }
-        }
-        var link, sourceId, targetId;
-        var outsideLinks = [];
-
+        setNodeData(data.nodes, data.nodespaces);
         for(var uid in links) {
             if(!(uid in data.links)) {
                 removeLink(links[uid]);
             }
         }
-        for(uid in data.links){
-            sourceId = data.links[uid]['source_node_uid'];
-            targetId = data.links[uid]['target_node_uid'];
-            if (sourceId in nodes && targetId in nodes && nodes[sourceId].parent == nodes[targetId].parent){
-                link = new Link(uid, sourceId, data.links[uid].source_gate_name, targetId, data.links[uid].target_slot_name, data.links[uid].weight, data.links[uid].certainty);
-                if(uid in links){
-                    redrawLink(link);
-                } else {
-                    addLink(link);
-                }
-            } else if(sourceId in nodes || targetId in nodes){
-                link = new Link(uid, sourceId, data.links[uid].source_gate_name, targetId, data.links[uid].target_slot_name, data.links[uid].weight, data.links[uid].certainty);
-                if(targetId in nodes && nodes[targetId].linksFromOutside.indexOf(link.uid) < 0)
-                    nodes[targetId].linksFromOutside.push(link.uid);
-                if(sourceId in nodes && nodes[sourceId].linksToOutside.indexOf(link.uid) < 0)
-                    nodes[sourceId].linksToOutside.push(link.uid);
-                outsideLinks.push(link);
+        setLinkData(data.links);
+
+        if(data.monitors){
+            monitors = data.monitors;
+        }
+        if(changed){
+            updateNodespaceForm();
+        }
+    }
+    updateViewSize();
+}
+
+// add or update the given nodes and nodespaces
+function setNodeData(nodesData, nodespacesData){
+    var uid, item;
+    for(uid in nodesData){
+        item = new Node(uid, nodesData[uid]['position'][0], nodesData[uid]['position'][1], nodesData[uid].parent_nodespace, nodesData[uid].name, nodesData[uid].type, nodesData[uid].sheaves, nodesData[uid].state, nodesData[uid].parameters, nodesData[uid].gate_activations, nodesData[uid].gate_parameters);
+        if(uid in nodes){
+            if(nodeRedrawNeeded(item)) {
+                nodes[uid].update(item);
+                redrawNode(nodes[uid], true);
+            } else {
+                nodes[uid].update(item);
             }
+        } else{
+            addNode(item);
+        }
+    }
+    for(uid in nodespacesData){
+        item = new Node(uid, nodespacesData[uid]['position'][0], nodespacesData[uid]['position'][1], nodespacesData[uid].parent_nodespace, nodespacesData[uid].name, "Nodespace", 0, nodespacesData[uid].state);
+        if(uid in nodes){
+            redrawNode(item);
+            nodes[uid].update(item);
+        } else{
+            addNode(item);
         }
-        for(var index in outsideLinks){
-            if(outsideLinks[index].uid in links){
-                redrawLink(outsideLinks[index]);
+    }
+}
+
+// add or update the given links, and the links to nodes outside of the nodespace
+function setLinkData(linksData){
+    var uid, link, sourceId, targetId;
+    var outsideLinks = [];
+
+    for(uid in linksData){
+        sourceId = linksData[uid]['source_node_uid'];
+        targetId = linksData[uid]['target_node_uid'];
+        if (sourceId in nodes && targetId in nodes && nodes[sourceId].parent == nodes[targetId].parent){
+            link = new Link(uid, sourceId, linksData[uid].source_gate_name, targetId, linksData[uid].target_slot_name, linksData[uid].weight, linksData[uid].certainty);
+            if(uid in links){
+                redrawLink(link);
             } else {
-                addLink(outsideLinks[index]);
+                addLink(link);
             }
+        } else if(sourceId in nodes || targetId in nodes){
+            link = new Link(uid, sourceId, linksData[uid].source_gate_name, targetId, linksData[uid].target_slot_name, linksData[uid].weight, linksData[uid].certainty);
+            if(targetId in nodes && nodes[targetId].linksFromOutside.indexOf(link.uid) < 0)
+                nodes[targetId].linksFromOutside.push(link.uid);
+            if(sourceId in nodes && nodes[sourceId].linksToOutside.indexOf(link.uid) < 0)
+                nodes[sourceId].linksToOutside.push(link.uid);
+            outsideLinks.push(link);
+        }
+    }
+    for(var index in outsideLinks){
+        if(outsideLinks[index].uid in links){
+            redrawLink(outsideLinks[index]);
+        } else {
+            addLink(outsideLinks[index]);
         }
+    }
+}
 
-        if(data.monitors){
-            monitors = data.monitors;
+// apply the changes since the last step that has been shown
+function applyNodespaceChanges(data){
+    nodenetscope.activate();
+    currentSimulationStep = data.step || 0;
+    $('#nodenet_step').val(currentSimulationStep);
+    nodenetRunning = data.is_active;
+    if('max_coords' in data){
+        max_coordinates = data['max_coords'];
+    }
+    var uid, i;
+    var deleted = data.deleted_nodes.concat(data.deleted_nodespaces);
+    for(i = 0; i < deleted.length; i++){
+        uid = deleted[i];
+        if(uid in nodes){
+            removeNode(nodes[uid]);
+            if (uid in selection) delete selection[uid];
         }
-        if(changed){
-            updateNodespaceForm();
+    }
+    for(i = 0; i < data.deleted_links.length; i++){
+        if(data.deleted_links[i] in links){
+            removeLink(links[data.deleted_links[i]]);
         }
     }
+    setNodeData(data.nodes, data.nodespaces);
+    setLinkData(data.links);
     updateViewSize();
 }
 
 function refreshNodespace(nodespace, coordinates, step, callback){
+    if(!nodespace && !coordinates && !step && !callback){
+        // nothing but the activations and the structure of the current view may have changed
+        if(nodespacePush.active){
+            // the changes are pushed anyway
+            return null;
+        }
+        return refreshNodespaceChanges();
+    }
     if(coordinates)
         loaded_coordinates = coordinates;
     nodespace = nodespace || currentNodeSpace;
@@ -411,12 +467,66 @@ function refreshNodespace(nodespace, coordinates, step, callback){
         if(callback){
             callback(data);
         }
-        if(nodenetRunning){
-            refreshNodespace();
-        }
+        subscribeNodespace();
     });
 }
 
+// subscribe to the changes of the current view, if it is not the one we have subscribed to already
+function subscribeNodespace(){
+    var topics = {
+        nodenet_uid: currentNodenet,
+        nodespace: currentNodeSpace,
+        x1: parseInt(loaded_coordinates.x[0]),
+        x2: parseInt(loaded_coordinates.x[1]),
+        y1: parseInt(loaded_coordinates.y[0]),
+        y2: parseInt(loaded_coordinates.y[1])
+    };
+    var view = JSON.stringify(topics);
+    if(view == subscribedView){
+        return;
+    }
+    subscribedView = view;
+    topics.since_step = currentSimulationStep;
+    nodespacePush.subscribe(topics);
+}
+
+// show the changes that have been pushed or polled
+function applyNodespaceUpdates(data){
+    if(data.full){
+        setNodespaceData(data, false);
+    } else {
+        applyNodespaceChanges(data);
+    }
+    nodenetRunning = data.is_active;
+}
+
+// fetch only the changes of the current view since the last step that has been shown
+function refreshNodespaceChanges(){
+    var nodespace = currentNodeSpace;
+    var since_step = currentSimulationStep;
+    api.call('get_nodespace_changes', {
+        nodenet_uid: currentNodenet,
+        nodespace: nodespace,
+        since_step: since_step,
+        x1: parseInt(loaded_coordinates.x[0]),
+        x2: parseInt(loaded_coordinates.x[1]),
+        y1: parseInt(loaded_coordinates.y[0]),
+        y2: parseInt(loaded_coordinates.y[1])
+    }, success=function(data){
+        if(nodespace != currentNodeSpace){
+            return null;
+        }
+        applyNodespaceUpdates(data);
+        // poll on only for as long as the changes are not pushed
+        if(nodenetRunning && !nodespacePush.active){
+            if(data.current_step > since_step){
+                refreshNodespace();
+            } else {
+                setTimeout(refreshNodespace, 100);
+            }
+        }
+    });
+}
 
 function refreshViewPortData(){
     var top = parseInt(canvas_container.scrollTop() / viewProperties.zoomFactor);
@@ -0,0 +1,45 @@
+"""
+Central initialization of fixtures for the server tests
+"""
+import os
+import json
+import urllib.request
+import pytest
+
+try:
+    os.makedirs('/tmp/micropsi_tests/nodenets')
+except OSError:
+    pass
+
+import configuration
+configuration.RESOURCE_PATH = '/tmp/micropsi_tests'
+
+from micropsi_core import runtime
+from micropsi_server import micropsi_app
+from micropsi_server.loadtest import start_server
+
+
+def call(port, command, **kwargs):
+    """Calls the given RPC on the server at the given port, and returns the decoded result"""
+    request = urllib.request.Request("http://127.0.0.1:%d/rpc/%s" % (port, command),
+                                     data=json.dumps(kwargs).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+@pytest.fixture(scope="module")
+def port(request):
+    """Serves the app on a threaded server, and returns its port"""
+    port, stop = start_server(micropsi_app.bottle.default_app(), "threaded", 2)
+    request.addfinalizer(stop)
+    return port
+
+
+@pytest.fixture
+def nodenet_uid(request):
+    """A nodenet with a single register in its root nodespace"""
+    success, uid = runtime.new_nodenet("Servernet", "Default", owner="Pytest User", uid="server_test_nodenet")
+    runtime.add_node(uid, "Register", (10, 10), "Root", name="Register", uid="register")
+    request.addfinalizer(lambda: runtime.delete_nodenet(uid))
+    return uid
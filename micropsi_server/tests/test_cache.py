@@ -0,0 +1,75 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the response cache of the read-only RPCs
+"""
+
+from micropsi_core import runtime
+from micropsi_server import cache, micropsi_app
+from micropsi_server.tests.conftest import call
+
+
+def test_response_cache_eviction():
+    responses = cache.ResponseCache(max_entries=2, max_bytes=10)
+    responses.put("a", "A", 4, responses.generation)
+    responses.put("b", "B", 4, responses.generation)
+    assert responses.get("a") == "A"
+    # the least recently used response is evicted first
+    responses.put("c", "C", 4, responses.generation)
+    assert responses.get("b") is None
+    assert responses.get("a") == "A"
+    # the size is bounded, too
+    responses.put("d", "D", 8, responses.generation)
+    assert list(responses.entries) == ["d"]
+    assert responses.size == 8
+    # responses computed before an invalidation are not stored
+    generation = responses.generation
+    responses.invalidate()
+    responses.put("e", "E", 1, generation)
+    assert responses.get("e") is None
+    assert responses.get_stats()['hits'] == 2
+
+
+def test_cached_rpc(port, nodenet_uid):
+    responses = micropsi_app.response_cache
+    responses.invalidate()
+    first = call(port, "get_nodespace", nodenet_uid=nodenet_uid, nodespace="Root", step=-1)
+    hits = responses.hits
+    assert call(port, "get_nodespace", nodenet_uid=nodenet_uid, nodespace="Root", step=-1) == first
+    assert responses.hits == hits + 1
+
+    # changes of the entities expire the response
+    runtime.set_node_name(nodenet_uid, "register", "Renamed")
+    data = call(port, "get_nodespace", nodenet_uid=nodenet_uid, nodespace="Root", step=-1)
+    assert data['nodes']['register']['name'] == "Renamed"
+
+    # as does a step
+    runtime.step_nodenet(nodenet_uid)
+    data = call(port, "get_nodespace", nodenet_uid=nodenet_uid, nodespace="Root", step=-1)
+    assert data['current_step'] == first['current_step'] + 1
+
+    # mutating calls invalidate the cache
+    call(port, "set_node_activation", nodenet_uid=nodenet_uid, node_uid="register", activation=0.5)
+    assert responses.get_stats()['entries'] == 0
+    data = call(port, "get_nodespace", nodenet_uid=nodenet_uid, nodespace="Root", step=-1)
+    assert data['nodes']['register']['sheaves']['default']['activation'] == 0.5
+
+    # read-only calls do not
+    call(port, "get_nodespace_changes", nodenet_uid=nodenet_uid, nodespace="Root", since_step=None)
+    assert responses.get_stats()['entries'] == 1
+
+
+def test_cached_rpc_survives_polls(port, nodenet_uid):
+    responses = micropsi_app.response_cache
+    responses.invalidate()
+    runtime.step_nodenet(nodenet_uid)
+    # the first poll records the activations of the step
+    call(port, "get_nodespace_changes", nodenet_uid=nodenet_uid, nodespace="Root", since_step=None)
+    call(port, "get_nodespace", nodenet_uid=nodenet_uid, nodespace="Root", step=-1)
+    step = runtime.nodenets[nodenet_uid].current_step
+    for i in range(3):
+        call(port, "get_nodespace_changes", nodenet_uid=nodenet_uid, nodespace="Root", since_step=step)
+    hits = responses.hits
+    call(port, "get_nodespace", nodenet_uid=nodenet_uid, nodespace="Root", step=-1)
+    assert responses.hits == hits + 1
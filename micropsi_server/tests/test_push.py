@@ -0,0 +1,131 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the push channel
+"""
+
+import time
+import logging
+import threading
+import pytest
+
+from micropsi_core import runtime
+from micropsi_server import micropsi_app, push
+from micropsi_server.loadtest import start_server
+from micropsi_server.tests.conftest import call
+
+
+def test_push_channel(nodenet_uid):
+    channel = push.PushChannel()
+    client_id = channel.subscribe(nodenet_uid=nodenet_uid, loggers=["nodenet"])
+
+    # the first batch contains the whole nodespace
+    updates = channel.get_updates(client_id)
+    assert updates['nodespace']['full']
+    assert "register" in updates['nodespace']['nodes']
+
+    # without anything new, the call blocks until the timeout
+    start = time.time()
+    updates = channel.get_updates(client_id, timeout=0.3)
+    assert time.time() - start >= 0.25
+    assert updates['logs']['logs'] == []
+
+    # the steps a slow client has missed are merged into one batch
+    for i in range(3):
+        runtime.step_nodenet(nodenet_uid)
+    updates = channel.get_updates(client_id)
+    assert updates['dropped_steps'] == 2
+
+    # a step wakes up waiting clients
+    threading.Timer(0.1, runtime.step_nodenet, [nodenet_uid]).start()
+    start = time.time()
+    updates = channel.get_updates(client_id, timeout=5)
+    assert time.time() - start < 2
+    assert updates['nodespace']['current_step'] == 4
+    assert not updates['nodespace']['full']
+
+    logging.getLogger("nodenet").warning("Pushed to the client")
+    updates = channel.get_updates(client_id, timeout=5)
+    assert [log['msg'] for log in updates['logs']['logs']] == ["Pushed to the client"]
+
+    channel.unsubscribe(client_id)
+    with pytest.raises(KeyError):
+        channel.get_updates(client_id)
+
+
+def test_push_edits_of_stopped_nodenet(nodenet_uid):
+    channel = push.PushChannel()
+    client_id = channel.subscribe(nodenet_uid=nodenet_uid)
+    channel.get_updates(client_id)
+    threading.Timer(0.1, runtime.set_node_name, [nodenet_uid, "register", "Renamed"]).start()
+    updates = channel.get_updates(client_id, timeout=5)
+    assert updates['nodespace']['nodes']['register']['name'] == "Renamed"
+    assert updates['nodespace']['current_step'] == 0
+
+
+def test_long_polls_leave_workers_free(nodenet_uid):
+    workers = 4
+    channel = micropsi_app.push_channel
+    max_polls = channel.max_polls
+    channel.max_polls = push.get_max_polls(workers)
+    port, stop = start_server(micropsi_app.bottle.default_app(), "threaded", workers)
+    try:
+        results = []
+        # a client for every worker, which has seen everything
+        client_ids = [call(port, "subscribe", nodenet_uid=nodenet_uid)['client_id'] for i in range(workers)]
+        for client_id in client_ids:
+            call(port, "get_updates", client_id=client_id)
+        polls = [threading.Thread(target=lambda uid: results.append(call(port, "get_updates", client_id=uid)),
+                                  args=(client_id,)) for client_id in client_ids]
+        for thread in polls:
+            thread.start()
+        # the polls beyond the limit return at once, the others wait for the next step
+        deadline = time.time() + 10
+        while (len(results) < workers - channel.max_polls or channel.polls < channel.max_polls) and \
+                time.time() < deadline:
+            time.sleep(0.01)
+        assert len(results) == workers - channel.max_polls
+        assert all(result['busy'] for result in results)
+        # the other workers still answer, while the polls are waiting
+        assert call(port, "get_available_nodenets", user_id="Pytest User")
+        assert channel.polls == channel.max_polls
+        runtime.step_nodenet(nodenet_uid)
+        for thread in polls:
+            thread.join()
+        assert len([result for result in results if 'nodespace' in result]) == channel.max_polls
+    finally:
+        stop()
+        channel.max_polls = max_polls
+
+
+def test_push_monitors_only(nodenet_uid):
+    runtime.add_gate_monitor(nodenet_uid, "register", "gen")
+    logging.getLogger("nodenet").warning("Seen before")
+    after = runtime.get_logger_messages(["nodenet"])['servertime'] + 1
+    channel = push.PushChannel()
+    client_id = channel.subscribe(nodenet_uid=nodenet_uid, nodespace=None, monitors=True, loggers=["nodenet"],
+                                  log_time=after)
+    updates = channel.get_updates(client_id)
+    assert 'nodespace' not in updates
+    assert len(updates['monitors']['monitors']) == 1
+    assert updates['logs']['logs'] == []
+
+    # once everything has been sent, the client waits for the next step
+    assert not channel.subscriptions[client_id].has_updates()
+    runtime.step_nodenet(nodenet_uid)
+    updates = channel.get_updates(client_id, timeout=5)
+    assert updates['monitors']['current_step'] == 1
+
+
+def test_push_since_step(nodenet_uid):
+    # the journal answers the first request with a snapshot, e.g. that of another client
+    runtime.get_nodespace_changes(nodenet_uid, "Root", None)
+    runtime.step_nodenet(nodenet_uid)
+    channel = push.PushChannel()
+    client_id = channel.subscribe(nodenet_uid=nodenet_uid, since_step=1)
+    runtime.add_node(nodenet_uid, "Concept", (20, 10), "Root", uid="added")
+    updates = channel.get_updates(client_id, timeout=5)
+    # only the changes since the step the client has loaded are sent
+    assert not updates['nodespace']['full']
+    assert list(updates['nodespace']['nodes'].keys()) == ["added"]
@@ -0,0 +1,79 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the argument parsing and response encoding of the rpc decorator
+"""
+
+import gzip
+import json
+import urllib.request
+import pytest
+
+from micropsi_core import runtime
+from micropsi_server import micropsi_app
+
+
+@pytest.fixture
+def large_nodenet_uid(nodenet_uid):
+    # the responses for this nodespace are large enough to be compressed
+    for i in range(30):
+        runtime.add_node(nodenet_uid, "Concept", (10 * i, 10), "Root", name="Concept %d" % i)
+    return nodenet_uid
+
+
+def fetch(port, path, headers=None):
+    with urllib.request.urlopen(urllib.request.Request("http://127.0.0.1:%d%s" % (port, path),
+                                                       headers=headers or {})) as response:
+        return response.read(), response.headers
+
+
+def test_parse_arguments():
+    assert micropsi_app.parse_arguments('a=1,b="x",c=[1, 2]') == {'a': 1, 'b': "x", 'c': [1, 2]}
+    assert micropsi_app.parse_arguments(' a = "1,b=2" , b = {"c": "d=e"} ') == {'a': "1,b=2", 'b': {'c': "d=e"}}
+    assert micropsi_app.parse_arguments('') == {}
+    for argument in ['a', 'a=', 'a=1 b=2', 'a=unquoted', 'a=1,,b=2']:
+        with pytest.raises(ValueError):
+            micropsi_app.parse_arguments(argument)
+
+
+def test_rpc_arguments_in_url(port):
+    body, headers = fetch(port, '/rpc/get_available_nodenets(user_id="Pytest%20User")')
+    assert isinstance(json.loads(body.decode('utf-8')), dict)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        fetch(port, '/rpc/get_available_nodenets(user_id="Pytest%20User",unknown="rejected")')
+    assert error.value.code == 400
+    assert "unknown" in json.loads(error.value.read().decode('utf-8'))['Error']
+    with pytest.raises(urllib.error.HTTPError) as error:
+        fetch(port, '/rpc/get_available_nodenets(user_id=Pytest%20User)')
+    assert error.value.code == 400
+
+
+def test_accepts():
+    assert micropsi_app.accepts('gzip, deflate', 'gzip')
+    assert not micropsi_app.accepts('gzip;q=0, deflate', 'gzip')
+    assert not micropsi_app.accepts('gzip; q=0.0', 'gzip', wildcard='*')
+    assert micropsi_app.accepts('deflate, *;q=0.5', 'gzip', wildcard='*')
+    assert not micropsi_app.accepts('*/*', 'application/x-msgpack')
+    assert micropsi_app.accepts('application/json, application/x-msgpack;q=0.9', 'application/x-msgpack')
+
+
+def test_rpc_gzip(port, large_nodenet_uid):
+    path = '/rpc/get_nodespace(nodenet_uid="%s",nodespace="Root",step=-1)' % large_nodenet_uid
+    plain, headers = fetch(port, path)
+    assert headers.get('Content-Encoding') is None
+    compressed, headers = fetch(port, path, {'Accept-Encoding': 'gzip'})
+    assert headers['Content-Encoding'] == 'gzip'
+    assert len(compressed) < len(plain)
+    assert json.loads(gzip.decompress(compressed).decode('utf-8')) == json.loads(plain.decode('utf-8'))
+    body, headers = fetch(port, path, {'Accept-Encoding': 'gzip;q=0'})
+    assert headers.get('Content-Encoding') is None
+
+
+def test_rpc_msgpack(port, large_nodenet_uid):
+    msgpack = pytest.importorskip("msgpack")
+    path = '/rpc/get_nodespace(nodenet_uid="%s",nodespace="Root",step=-1)' % large_nodenet_uid
+    plain, headers = fetch(port, path)
+    packed, headers = fetch(port, path, {'Accept': 'application/x-msgpack'})
+    assert headers['Content-Type'] == 'application/x-msgpack'
+    assert msgpack.unpackb(packed, raw=False) == json.loads(plain.decode('utf-8'))
@@ -0,0 +1,67 @@
+#!/usr/local/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the threaded server and the load test
+"""
+
+import threading
+import urllib.request
+
+from micropsi_core import runtime
+from micropsi_server import bottle, server
+from micropsi_server.loadtest import run_load_test
+
+
+def get(port, path):
+    with urllib.request.urlopen("http://127.0.0.1:%d%s" % (port, path), timeout=30) as response:
+        return response.read()
+
+
+def test_threaded_server():
+    started = threading.Semaphore(0)
+    release = threading.Event()
+
+    def slow():
+        started.release()
+        release.wait(30)
+        return "slow"
+
+    app = bottle.Bottle()
+    app.route("/slow", callback=slow)
+    app.route("/fast", callback=lambda: "fast")
+    adapter = server.ThreadedServer(host='127.0.0.1', port=0, workers=4)
+    thread = threading.Thread(target=adapter.run, args=(app,))
+    thread.start()
+    adapter.started.wait()
+
+    results = []
+    clients = [threading.Thread(target=lambda: results.append(get(adapter.port, "/slow"))) for i in range(2)]
+    clients[0].start()
+    assert started.acquire(timeout=30)
+    # a slow request does not block the others
+    assert get(adapter.port, "/fast") == b"fast"
+    assert not release.is_set() and clients[0].is_alive()
+
+    # shutting down waits for the running requests
+    clients[1].start()
+    assert started.acquire(timeout=30)
+    shutdown = threading.Thread(target=adapter.shutdown)
+    shutdown.start()
+    shutdown.join(0.2)
+    assert shutdown.is_alive()
+    release.set()
+    shutdown.join(30)
+    assert not shutdown.is_alive()
+    for client in clients:
+        client.join(30)
+    assert results == [b"slow", b"slow"]
+    thread.join(30)
+    assert not thread.is_alive()
+
+
+def test_load_test():
+    result = run_load_test(runtime, clients=3, slow_clients=1, requests=3, size=20)
+    assert result['requests'] == 6
+    assert result['throughput'] > 0
+    assert result['latency']['max'] >= result['latency']['mean']
@@ -8,17 +8,23 @@ Startup script for the MicroPsi service.
 __author__ = 'joscha'
 __date__ = '06.07.12'
 
-from configuration import DEFAULT_PORT, DEFAULT_HOST
+from configuration import DEFAULT_PORT, DEFAULT_HOST, DEFAULT_SERVER, SERVER_WORKERS, SERVER_SOCKET_TIMEOUT
 import micropsi_server.micropsi_app
 import argparse
 
 
-def main(host=DEFAULT_HOST, port=DEFAULT_PORT):
-    micropsi_server.micropsi_app.main(host, port)
+def main(host=DEFAULT_HOST, port=DEFAULT_PORT, server=DEFAULT_SERVER, workers=SERVER_WORKERS,
+         socket_timeout=SERVER_SOCKET_TIMEOUT):
+    micropsi_server.micropsi_app.main(host, port, server, workers, socket_timeout)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Start the MicroPsi server.")
     parser.add_argument('-d', '--host', type=str, default=DEFAULT_HOST)
     parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('-s', '--server', type=str, default=DEFAULT_SERVER, choices=["threaded", "wsgiref"])
+    parser.add_argument('-w', '--workers', type=int, default=SERVER_WORKERS)
+    parser.add_argument('-t', '--socket-timeout', type=float, default=SERVER_SOCKET_TIMEOUT,
+                        help="seconds a connection may stay silent while a request or response is transferred")
     args = parser.parse_args()
-    main(host=args.host, port=args.port)
+    main(host=args.host, port=args.port, server=args.server, workers=args.workers,
+         socket_timeout=args.socket_timeout)